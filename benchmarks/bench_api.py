@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+In-process API load test: every public route driven over ASGI
+
+Requests go through the full FastAPI stack (middleware, validation,
+micro-batching, database) without a network or server process, so the
+numbers isolate the application itself.
+
+Usage:
+    python benchmarks/bench_api.py --requests 200 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from common import print_results, result_document, summarize_ms, write_results
+
+SAMPLE_TEXTS = (
+    "I absolutely love this product, it works perfectly",
+    "Terrible service, I will never order again",
+    "The delivery was late but support was helpful",
+    "Not bad at all, better than I expected",
+)
+
+# (name, method, path, body); bodies with "{i}" get a unique value per request
+ROUTES = [
+    ("root", "GET", "/", None),
+    ("health", "GET", "/api/v1/health", None),
+    ("model_info", "GET", "/api/v1/model-info", None),
+    ("models", "GET", "/api/v1/models", None),
+    ("memory", "GET", "/api/v1/memory", None),
+    ("metrics", "GET", "/metrics", None),
+    ("analyze", "POST", "/api/v1/analyze", {"text": SAMPLE_TEXTS[0] + " {i}"}),
+    ("analyze[cached]", "POST", "/api/v1/analyze", {"text": SAMPLE_TEXTS[0]}),
+    ("batch_analyze[8]", "POST", "/api/v1/batch-analyze",
+     {"texts": [text + " {i}" for text in SAMPLE_TEXTS * 2]}),
+    ("history", "GET", "/api/v1/history?page=1&page_size=20", None),
+    ("stats", "GET", "/api/v1/stats", None),
+    ("stats_timeline", "GET", "/api/v1/stats/timeline?days=7", None),
+    ("search", "GET", "/api/v1/search?q=love&limit=20", None),
+]
+
+# Routes with side effects or admin access are left out on purpose
+SKIPPED_PREFIXES = ("/api/v1/admin", "/docs", "/redoc", "/openapi.json")
+
+
+def _fill(body: Any, i: int) -> Any:
+    if isinstance(body, str):
+        return body.replace("{i}", str(i))
+    if isinstance(body, list):
+        return [_fill(item, i) for item in body]
+    if isinstance(body, dict):
+        return {key: _fill(value, i) for key, value in body.items()}
+    return body
+
+
+def uncovered_routes(app) -> List[str]:
+    """Documented routes of the app that no benchmark exercises"""
+    covered = {(method, path.split("?")[0]) for _, method, path, _ in ROUTES}
+    missing = []
+    for path, operations in app.openapi()["paths"].items():
+        if path.startswith(SKIPPED_PREFIXES):
+            continue
+        for method in operations:
+            if (method.upper(), path) not in covered:
+                missing.append(f"{method.upper()} {path}")
+    return missing
+
+
+async def drive(client, method: str, path: str, body: Any, requests: int, concurrency: int) -> Dict[str, Any]:
+    """Send `requests` requests with `concurrency` workers (closed loop)"""
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+    
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=_fill(body, i))
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += failed
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    
+    result = summarize_ms(latencies)
+    result["rps"] = round(requests / elapsed, 2)
+    result["error_rate"] = round(errors / requests, 4)
+    return result
+
+
+async def run_async(requests: int, concurrency: int, warmup: int) -> List[Dict[str, Any]]:
+    import httpx
+    from api.main import app
+    
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    missing = uncovered_routes(app)
+    if missing:
+        print(f"Warning: routes without a benchmark: {', '.join(missing)}")
+    
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, method, path, body in ROUTES:
+                await drive(client, method, path, body, warmup, 1)
+                result = await drive(client, method, path, body, requests, concurrency)
+                result.update({
+                    "name": f"api.{name}",
+                    "params": {"method": method, "path": path, "concurrency": concurrency}
+                })
+                results.append(result)
+    return results
+
+
+def run(
+    requests: int = 200,
+    concurrency: int = 8,
+    warmup: int = 5,
+    database_url: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Load-test every route in-process
+    
+    The app is imported here, after DATABASE_URL points at a scratch
+    database, so benchmark rows never end up in the real one.
+    """
+    scratch_dir = None
+    if database_url is None:
+        scratch_dir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite:///{os.path.join(scratch_dir.name, 'bench_api.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    try:
+        return asyncio.run(run_async(requests, concurrency, warmup))
+    finally:
+        if scratch_dir is not None:
+            scratch_dir.cleanup()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--requests", type=int, default=200, help="Requests per route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--database-url", help="Database used by the app (default: scratch SQLite)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test every API route in-process")
+    add_arguments(parser)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    
+    results = run(requests=args.requests, concurrency=args.concurrency, database_url=args.database_url)
+    print_results("api", results)
+    if args.output:
+        write_results(args.output, result_document({"api": results}, vars(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""
+CRUD benchmarks on a seeded SQLite database
+
+The database is generated once with a fixed random seed (1M rows by
+default) and reused by later runs, so every run queries the same data.
+
+Usage:
+    python benchmarks/bench_crud.py --rows 1000000 --db-path benchmarks/.data/crud_1m.db
+"""
+
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from common import ROOT_DIR, measure, print_results, result_document, write_results
+
+DEFAULT_ROWS = 1_000_000
+SEED = 42
+SEED_CHUNK_SIZE = 50_000
+MODEL_NAMES = ("distilbert-base-uncased-finetuned-sst-2-english", "model-es")
+WORDS = (
+    "good", "bad", "great", "terrible", "movie", "service", "product", "really",
+    "not", "very", "love", "hate", "okay", "delivery", "support", "price"
+)
+
+
+def default_db_path(rows: int) -> str:
+    return os.path.join(ROOT_DIR, "benchmarks", ".data", f"crud_{rows}.db")
+
+
+def create_engine_for(db_path: str):
+    from sqlalchemy import create_engine
+    from database.database import migrate_inline_texts
+    from database.models import Base
+    
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    # Databases seeded before the text store are migrated once
+    migrate_inline_texts(engine)
+    return engine
+
+
+def seed_database(engine, rows: int, seed: int = SEED):
+    """Fill the analyses table with `rows` deterministic rows (skipped if already seeded)"""
+    from sqlalchemy import func, select
+    from sqlalchemy.dialects.sqlite import insert
+    from database.models import AnalyzedText, SentimentAnalysis, hash_text
+    
+    table = SentimentAnalysis.__table__
+    with engine.connect() as conn:
+        existing = conn.execute(select(func.count()).select_from(table)).scalar()
+    if existing == rows:
+        return
+    if existing:
+        raise RuntimeError(f"Database already holds {existing} rows, expected {rows}")
+    
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for offset in range(0, rows, SEED_CHUNK_SIZE):
+            chunk = []
+            texts = {}
+            for _ in range(min(SEED_CHUNK_SIZE, rows - offset)):
+                label = "POSITIVE" if rng.random() < 0.6 else "NEGATIVE"
+                text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 30)))
+                text_hash = texts.setdefault(text, hash_text(text))
+                chunk.append({
+                    "text_hash": text_hash,
+                    "label": label,
+                    "score": round(rng.uniform(0.5, 1.0), 4),
+                    "created_at": now - timedelta(seconds=rng.randint(0, 90 * 24 * 3600)),
+                    "processing_time_ms": round(rng.uniform(5, 80), 2),
+                    "model_name": rng.choice(MODEL_NAMES),
+                    "is_batch": rng.random() < 0.3
+                })
+            conn.execute(
+                insert(AnalyzedText).on_conflict_do_nothing(),
+                [{"hash": text_hash, "text": text} for text, text_hash in texts.items()]
+            )
+            conn.execute(table.insert(), chunk)
+    print(f"Seeded {rows} rows in {time.perf_counter() - start:.1f}s")
+
+
+def run(rows: int = DEFAULT_ROWS, db_path: str = None, repeats: int = 20, warmup: int = 2) -> List[Dict[str, Any]]:
+    """Seed (or reuse) the database and run the CRUD benchmarks"""
+    from sqlalchemy.orm import sessionmaker
+    from database import crud
+    from database.database import backfill_rollups
+    
+    db_path = db_path or default_db_path(rows)
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    engine = create_engine_for(db_path)
+    seed_database(engine, rows)
+    backfill_rollups(engine)
+    
+    db = sessionmaker(bind=engine)()
+    started = datetime.utcnow()
+    week_ago = started - timedelta(days=7)
+    # A batch of distinct texts, each analyzed twice, like a repeated batch request
+    bulk = [(f"benchmark bulk insert {i % 50}", "POSITIVE", 0.9) for i in range(100)]
+    lookup_texts = [text for text, _, _ in bulk[:50]] + [f"benchmark unseen {i}" for i in range(50)]
+    
+    def create():
+        crud.create_analysis(
+            db, text="benchmark insert", label="POSITIVE", score=0.9,
+            processing_time_ms=10.0, model_name=MODEL_NAMES[0]
+        )
+    
+    cases = [
+        ("crud.create_analysis", create),
+        ("crud.create_analyses_bulk[100]", lambda: crud.create_analyses_bulk(
+            db, bulk, processing_time_ms=10.0, model_name=MODEL_NAMES[0]
+        )),
+        ("crud.get_stored_results[100]", lambda: crud.get_stored_results(db, lookup_texts, MODEL_NAMES[0])),
+        ("crud.get_analysis_by_id", lambda: crud.get_analysis_by_id(db, rows // 2)),
+        ("crud.get_analyses[page]", lambda: crud.get_analyses(db, skip=0, limit=20)),
+        ("crud.get_analyses[deep_page]", lambda: crud.get_analyses(db, skip=rows // 2, limit=20)),
+        ("crud.get_analyses[label]", lambda: crud.get_analyses(db, limit=20, label="NEGATIVE")),
+        ("crud.get_analyses[min_score]", lambda: crud.get_analyses(db, limit=20, min_score=0.95)),
+        ("crud.get_analyses[model_name]", lambda: crud.get_analyses(db, limit=20, model_name=MODEL_NAMES[1])),
+        ("crud.get_total_analyses_count", lambda: crud.get_total_analyses_count(db)),
+        ("crud.get_statistics[all]", lambda: crud.get_statistics(db)),
+        ("crud.get_statistics[7d]", lambda: crud.get_statistics(db, start_date=week_ago)),
+        ("crud.get_recent_analyses", lambda: crud.get_recent_analyses(db, limit=10)),
+        ("crud.get_analyses_by_date_range[7d]", lambda: crud.get_analyses_by_date_range(db, days=7)),
+        ("crud.get_timeline[hour,7d]", lambda: crud.get_timeline(db, "hour", week_ago, started)),
+        ("crud.get_timeline[minute,1d,label]", lambda: crud.get_timeline(
+            db, "minute", started - timedelta(days=1), started, label="NEGATIVE"
+        )),
+        ("crud.get_score_histograms[7d]", lambda: crud.get_score_histograms(db, week_ago, started)),
+        ("crud.search_analyses", lambda: crud.search_analyses(db, search_term="terrible delivery", limit=50)),
+        ("crud.update_daily_stats", lambda: crud.update_daily_stats(db, datetime.utcnow())),
+    ]
+    
+    results = []
+    try:
+        for name, func in cases:
+            results.append(measure(name, func, repeats=repeats, warmup=warmup, rows=rows))
+    finally:
+        # Keep the seeded data identical for the next run
+        from database.models import AnalyzedText, SentimentAnalysis, hash_text
+        db.query(SentimentAnalysis).filter(SentimentAnalysis.id > rows).delete(synchronize_session=False)
+        benchmark_hashes = [hash_text(text) for text in ["benchmark insert"] + lookup_texts]
+        db.query(AnalyzedText).filter(AnalyzedText.hash.in_(benchmark_hashes)).delete(synchronize_session=False)
+        db.commit()
+        crud.rebuild_rollups(db, since=started)
+        db.close()
+        engine.dispose()
+    return results
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Rows in the seeded database")
+    parser.add_argument("--db-path", help="SQLite file (default: benchmarks/.data/crud_<rows>.db)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CRUD operations on a seeded database")
+    add_arguments(parser)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    
+    results = run(rows=args.rows, db_path=args.db_path, repeats=args.repeats)
+    print_results("crud", results)
+    if args.output:
+        write_results(args.output, result_document({"crud": results}, vars(args)))
+
+
+if __name__ == "__main__":
+    main()
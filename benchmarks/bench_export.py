@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+History export throughput and memory on the seeded CRUD database
+
+Streams the whole history in every available format, as
+/api/v1/history/export does, and records rows per second, output size and
+peak Python memory. The database is the one bench_crud.py seeds.
+
+Usage:
+    python benchmarks/bench_export.py --rows 1000000 --export-chunk-size 5000
+"""
+
+import argparse
+import tracemalloc
+from typing import Any, Dict, List
+
+import bench_crud
+from common import measure, print_results, result_document, write_results
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def export_once(engine, format: str, chunk_size: int) -> int:
+    """Stream one full export and return its size in bytes"""
+    from sqlalchemy.orm import Session
+    from database import export
+    
+    with Session(engine) as db:
+        return sum(len(data) for data in export.stream_export(db, format, chunk_size=chunk_size))
+
+
+def peak_memory_mb(engine, format: str, chunk_size: int) -> float:
+    """Peak memory allocated by Python during one export"""
+    tracemalloc.start()
+    try:
+        export_once(engine, format, chunk_size)
+        return round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+    finally:
+        tracemalloc.stop()
+
+
+def run(
+    rows: int = bench_crud.DEFAULT_ROWS,
+    db_path: str = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    repeats: int = 3,
+    warmup: int = 1
+) -> List[Dict[str, Any]]:
+    """Seed (or reuse) the CRUD database and time a full export per format"""
+    import os
+    from database import export
+    
+    db_path = db_path or bench_crud.default_db_path(rows)
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    engine = bench_crud.create_engine_for(db_path)
+    bench_crud.seed_database(engine, rows)
+    
+    results = []
+    try:
+        for format in export.available_formats():
+            results.append(measure(
+                f"export.history[{format}]",
+                lambda: export_once(engine, format, chunk_size),
+                repeats=repeats,
+                warmup=warmup,
+                items=rows,
+                rows=rows,
+                chunk_size=chunk_size,
+                bytes=export_once(engine, format, chunk_size),
+                peak_memory_mb=peak_memory_mb(engine, format, chunk_size)
+            ))
+    finally:
+        engine.dispose()
+    return results
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--export-chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Rows fetched and encoded at a time by the export benchmark")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming history export")
+    bench_crud.add_arguments(parser)
+    add_arguments(parser)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    
+    results = run(rows=args.rows, db_path=args.db_path, chunk_size=args.export_chunk_size, repeats=args.repeats)
+    print_results("export", results)
+    if args.output:
+        write_results(args.output, result_document({"export": results}, vars(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+gRPC versus REST latency at the same concurrency
+
+Starts the API with uvicorn and the in-process gRPC server on local ports
+(one registry, so both protocols use the same model and batchers) and
+drives the analyze and batch calls of each closed loop over real
+connections. Needs the optional gRPC packages.
+
+Usage:
+    python benchmarks/bench_grpc.py --requests 500 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from bench_api import SAMPLE_TEXTS, drive
+from common import print_results, result_document, summarize_ms, write_results
+
+BATCH_SIZE = 8
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def drive_calls(call: Callable[[int], Awaitable[Any]], requests: int, concurrency: int) -> Dict[str, Any]:
+    """Like bench_api.drive, for any coroutine call taking the request number"""
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+    
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                await call(i)
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    
+    result = summarize_ms(latencies)
+    result["rps"] = round(requests / elapsed, 2)
+    result["error_rate"] = round(errors / requests, 4)
+    return result
+
+
+async def run_async(requests: int, concurrency: int, warmup: int) -> List[Dict[str, Any]]:
+    import grpc
+    import httpx
+    import uvicorn
+    from api.config import settings
+    from api.main import app
+    from api.proto import sentiment_pb2, sentiment_pb2_grpc
+    
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    settings.GRPC_ENABLED = True
+    settings.GRPC_PORT = 0
+    
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.ensure_future(server.serve())
+    while not server.started:
+        if serving.done():
+            serving.result()
+        await asyncio.sleep(0.05)
+    
+    def texts(tag: str, i: int, count: int) -> List[str]:
+        return [f"{SAMPLE_TEXTS[j % len(SAMPLE_TEXTS)]} {tag} {i}" for j in range(count)]
+    
+    # Each case sends `count` requests whose texts carry `tag`, so the
+    # measured run never hits results cached during warmup
+    cases = [
+        ("rest.analyze", lambda count, tag: drive(
+            client, "POST", "/api/v1/analyze", {"text": texts(tag, "{i}", 1)[0]}, count, concurrency
+        )),
+        ("grpc.analyze", lambda count, tag: drive_calls(
+            lambda i: stub.Analyze(sentiment_pb2.AnalyzeRequest(text=texts(tag, i, 1)[0])),
+            count,
+            concurrency
+        )),
+        (f"rest.batch_analyze[{BATCH_SIZE}]", lambda count, tag: drive(
+            client, "POST", "/api/v1/batch-analyze", {"texts": texts(tag, "{i}", BATCH_SIZE)}, count, concurrency
+        )),
+        (f"grpc.batch_analyze[{BATCH_SIZE}]", lambda count, tag: drive_calls(
+            lambda i: stub.BatchAnalyze(sentiment_pb2.BatchAnalyzeRequest(texts=texts(tag, i, BATCH_SIZE))),
+            count,
+            concurrency
+        ))
+    ]
+    
+    results = []
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client, \
+                grpc.aio.insecure_channel(f"127.0.0.1:{app.state.grpc_server.port}") as channel:
+            stub = sentiment_pb2_grpc.SentimentServiceStub(channel)
+            for name, case in cases:
+                await case(warmup, "warmup")
+                result = await case(requests, "run")
+                result.update({"name": name, "params": {"concurrency": concurrency, "requests": requests}})
+                results.append(result)
+    finally:
+        server.should_exit = True
+        await serving
+    return results
+
+
+def run(
+    requests: int = 200,
+    concurrency: int = 8,
+    warmup: int = 20,
+    database_url: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Compare gRPC and REST latency; empty when the gRPC packages are missing
+    
+    REST requests also write their results to the history database (a
+    scratch one, as in bench_api) and gRPC calls do not, so the REST
+    numbers include that write.
+    """
+    try:
+        import grpc  # noqa: F401
+    except ImportError:
+        print("Skipping gRPC benchmark: grpcio is not installed (pip install .[grpc])")
+        return []
+    
+    scratch_dir = None
+    if database_url is None:
+        scratch_dir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite:///{os.path.join(scratch_dir.name, 'bench_grpc.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    try:
+        return asyncio.run(run_async(requests, concurrency, warmup))
+    finally:
+        if scratch_dir is not None:
+            scratch_dir.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare gRPC and REST latency")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per call type")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--database-url", help="Database used by the app (default: scratch SQLite)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    
+    results = run(requests=args.requests, concurrency=args.concurrency, database_url=args.database_url)
+    print_results("grpc", results)
+    if args.output:
+        write_results(args.output, result_document({"grpc": results}, vars(args)))
+
+
+if __name__ == "__main__":
+    main()
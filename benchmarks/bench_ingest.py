@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Batch request ingestion: decode and validate throughput of JSON (stdlib
+and orjson), MessagePack and Arrow IPC bodies (the last two when
+installed)
+
+Usage:
+    python benchmarks/bench_ingest.py --ingest-sizes 10 100
+"""
+
+import argparse
+import json
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from common import measure, print_results, result_document, write_results
+
+DEFAULT_SIZES = (10, 100)
+
+
+def make_texts(size: int) -> List[str]:
+    """`size` review-length texts, some with surrounding whitespace"""
+    return [
+        f"  The delivery was late but the support team was helpful and refunded the shipping, order {i}. " * 3
+        for i in range(size)
+    ]
+
+
+def encode_json(texts: List[str]) -> bytes:
+    return json.dumps({"texts": texts}).encode()
+
+
+def encode_msgpack(texts: List[str]) -> bytes:
+    import msgpack
+    return msgpack.packb({"texts": texts})
+
+
+def encode_arrow(texts: List[str]) -> bytes:
+    import pyarrow
+    
+    table = pyarrow.table({"texts": pyarrow.array(texts, type=pyarrow.string())})
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def parse_stdlib_json(body: bytes):
+    """What a FastAPI body parameter does: json.loads, then validation"""
+    from api.schemas import BatchAnalysisRequest
+    return BatchAnalysisRequest.model_validate(json.loads(body))
+
+
+def variants() -> List[Tuple[str, Callable[[List[str]], bytes], Callable[[bytes], Any]]]:
+    """(name, encoder, parser) for each format available here"""
+    from api import responses
+    from api.ingest import parse_batch_request
+    
+    def parser(content_type: str) -> Callable[[bytes], Any]:
+        return lambda body: parse_batch_request(body, content_type)
+    
+    paths = [
+        ("json-stdlib", encode_json, parse_stdlib_json),
+        ("json", encode_json, parser("application/json"))
+    ]
+    if responses.msgpack is not None:
+        paths.append(("msgpack", encode_msgpack, parser(responses.MSGPACK)))
+    if responses.pyarrow is not None:
+        paths.append(("arrow", encode_arrow, parser(responses.ARROW_STREAM)))
+    return paths
+
+
+def run(sizes: Sequence[int] = DEFAULT_SIZES, repeats: int = 200, warmup: int = 20) -> List[Dict[str, Any]]:
+    """Time decoding and validating a batch body in every available format"""
+    results = []
+    for size in sizes:
+        texts = make_texts(size)
+        for variant, encode, parse in variants():
+            body = encode(texts)
+            results.append(measure(
+                f"ingest.batch_request[{variant},n={size}]",
+                lambda: parse(body),
+                repeats=repeats,
+                warmup=warmup,
+                items=size,
+                batch_size=size,
+                bytes=len(body)
+            ))
+    return results
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--ingest-sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Texts per request for the ingestion benchmark (max 100)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch request parsing and validation")
+    add_arguments(parser)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    
+    results = run(sizes=args.ingest_sizes, repeats=args.repeats)
+    print_results("ingest", results)
+    if args.output:
+        write_results(args.output, result_document({"ingest": results}, vars(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Model micro-benchmarks: SentimentAnalyzer.analyze and analyze_batch
+across text lengths and batch sizes
+
+Usage:
+    python benchmarks/bench_model.py --seq-lengths 16 64 256 --batch-sizes 1 8 32
+"""
+
+import argparse
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from common import measure, print_results, result_document, write_results
+
+DEFAULT_SEQ_LENGTHS = (16, 64, 256)
+DEFAULT_BATCH_SIZES = (1, 8, 32)
+
+
+def make_text(seq_len: int) -> str:
+    """Text that tokenizes to roughly `seq_len` tokens"""
+    words = ["the", "movie", "was", "surprisingly", "good", "but", "too", "long"]
+    return " ".join(words[i % len(words)] for i in range(max(1, seq_len - 2)))
+
+
+def run(
+    model_name: Optional[str] = None,
+    artifact_dir: Optional[str] = None,
+    seq_lengths: Sequence[int] = DEFAULT_SEQ_LENGTHS,
+    batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES,
+    repeats: int = 20,
+    warmup: int = 3
+) -> List[Dict[str, Any]]:
+    """Run the model benchmarks and return their results"""
+    from models.sentiment_model import SentimentAnalyzer
+    
+    kwargs = {"artifact_dir": artifact_dir} if artifact_dir else {}
+    if model_name:
+        kwargs["model_name"] = model_name
+    analyzer = SentimentAnalyzer(**kwargs)
+    
+    results = []
+    for seq_len in seq_lengths:
+        text = make_text(seq_len)
+        results.append(measure(
+            f"model.analyze[seq={seq_len}]",
+            lambda: analyzer.analyze(text),
+            repeats=repeats,
+            warmup=warmup,
+            seq_len=seq_len
+        ))
+        for batch_size in batch_sizes:
+            texts = [text] * batch_size
+            results.append(measure(
+                f"model.analyze_batch[batch={batch_size},seq={seq_len}]",
+                lambda: analyzer.analyze_batch(texts, batch_size=batch_size),
+                repeats=repeats,
+                warmup=warmup,
+                items=batch_size,
+                seq_len=seq_len,
+                batch_size=batch_size
+            ))
+    return results
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--model-name", default=os.getenv("MODEL_NAME"))
+    parser.add_argument("--artifact-dir", default=os.getenv("MODEL_ARTIFACT_DIR"))
+    parser.add_argument("--seq-lengths", type=int, nargs="+", default=list(DEFAULT_SEQ_LENGTHS))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(DEFAULT_BATCH_SIZES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SentimentAnalyzer inference")
+    add_arguments(parser)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    
+    results = run(
+        model_name=args.model_name,
+        artifact_dir=args.artifact_dir,
+        seq_lengths=args.seq_lengths,
+        batch_sizes=args.batch_sizes,
+        repeats=args.repeats
+    )
+    print_results("model", results)
+    if args.output:
+        write_results(args.output, result_document({"model": results}, vars(args)))
+
+
+if __name__ == "__main__":
+    main()
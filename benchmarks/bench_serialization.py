@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""
+Batch response serialization: per-item Pydantic models revalidated
+through response_model versus the shared-timestamp orjson fast path and
+the compact columnar formats (MessagePack and Arrow when installed)
+
+Usage:
+    python benchmarks/bench_serialization.py --sizes 10 100
+"""
+
+import argparse
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from common import measure, print_results, result_document, write_results
+
+DEFAULT_SIZES = (10, 100)
+
+
+def make_results(size: int) -> List[Dict[str, Any]]:
+    """Analyzer output for `size` texts"""
+    return [
+        {
+            "text": f"The delivery was late but the support team was helpful, order {i}",
+            "label": "POSITIVE" if i % 3 else "NEGATIVE",
+            "score": 0.5 + (i % 50) / 100
+        }
+        for i in range(size)
+    ]
+
+
+def serialize_models(results: List[Dict[str, Any]]) -> bytes:
+    """Previous path: a model and utcnow() per item, revalidated and encoded by FastAPI"""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from api.schemas import BatchAnalysisResult, SentimentResult
+    
+    response = BatchAnalysisResult(
+        total_analyzed=len(results),
+        results=[
+            SentimentResult(
+                text=result["text"],
+                label=result["label"],
+                score=result["score"],
+                timestamp=datetime.utcnow()
+            )
+            for result in results
+        ],
+        processing_time_ms=12.34
+    )
+    # What FastAPI does with a response_model: validate again, then encode
+    validated = BatchAnalysisResult.model_validate(response.model_dump())
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def serialize_fast(results: List[Dict[str, Any]]) -> bytes:
+    """Current path: tuples, one timestamp, orjson"""
+    from api.responses import ORJSONResponse, batch_payload
+    
+    scored = [(result["text"], result["label"], result["score"]) for result in results]
+    return ORJSONResponse(batch_payload(scored, 12.34)).body
+
+
+def compact_serializer(media_type: str) -> Callable[[List[Dict[str, Any]]], bytes]:
+    """Compact response encoder for one media type"""
+    from api.responses import compact_batch_response
+    
+    def serialize(results: List[Dict[str, Any]]) -> bytes:
+        scored = [(result["text"], result["label"], result["score"]) for result in results]
+        return compact_batch_response(scored, 12.34, media_type).body
+    
+    return serialize
+
+
+def variants() -> List[Tuple[str, Callable[[List[Dict[str, Any]]], bytes]]]:
+    """Serialization paths available with the installed libraries"""
+    from api import responses
+    
+    paths = [("pydantic", serialize_models), ("orjson", serialize_fast)]
+    for name in ("compact", "msgpack", "arrow"):
+        media_type = responses.FORMATS[name]
+        if responses._available(media_type):
+            paths.append((name, compact_serializer(media_type)))
+    return paths
+
+
+def run(sizes: Sequence[int] = DEFAULT_SIZES, repeats: int = 200, warmup: int = 20) -> List[Dict[str, Any]]:
+    """Time every available serialization path for each batch size"""
+    results = []
+    for size in sizes:
+        batch = make_results(size)
+        for variant, func in variants():
+            results.append(measure(
+                f"serialize.batch_response[{variant},n={size}]",
+                lambda: func(batch),
+                repeats=repeats,
+                warmup=warmup,
+                items=size,
+                batch_size=size,
+                bytes=len(func(batch))
+            ))
+    return results
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Batch sizes for the serialization benchmark")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch response serialization")
+    add_arguments(parser)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    
+    results = run(sizes=args.sizes, repeats=args.repeats)
+    print_results("serialization", results)
+    if args.output:
+        write_results(args.output, result_document({"serialization": results}, vars(args)))
+
+
+if __name__ == "__main__":
+    main()
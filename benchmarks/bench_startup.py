@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Startup benchmark: HuggingFace hub cache vs. prepared model artifact
+
+Each measurement runs in a fresh Python process so import, load and the
+first prediction are timed exactly as a new worker would see them.
+
+Usage:
+    python prepare_model.py --output ./model-artifact
+    python benchmarks/bench_startup.py --artifact-dir ./model-artifact --repeats 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Runs inside the child process and prints one JSON line
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {src_dir!r})
+from models.sentiment_model import SentimentAnalyzer
+imported = time.perf_counter()
+analyzer = SentimentAnalyzer(model_name={model_name!r}, artifact_dir={artifact_dir!r})
+loaded = time.perf_counter()
+analyzer.analyze("The first request after startup")
+first = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "load_ms": (loaded - imported) * 1000,
+    "first_request_ms": (first - loaded) * 1000,
+    "total_ms": (first - start) * 1000
+}}))
+"""
+
+
+def run_once(model_name, artifact_dir, offline):
+    """Start one fresh interpreter and return its timings"""
+    env = dict(os.environ)
+    if offline:
+        env["HF_HUB_OFFLINE"] = "1"
+    script = CHILD_SCRIPT.format(src_dir=SRC_DIR, model_name=model_name, artifact_dir=artifact_dir)
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(runs):
+    """Median of every timing across runs"""
+    return {key: round(statistics.median(run[key] for run in runs), 2) for key in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cold-start time of hub and artifact loading")
+    parser.add_argument("--model-name", default=os.getenv("MODEL_NAME", "distilbert-base-uncased-finetuned-sst-2-english"))
+    parser.add_argument("--artifact-dir", default=os.getenv("MODEL_ARTIFACT_DIR", "./model-artifact"))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    
+    results = {}
+    for path, kwargs in (
+        ("hub", {"model_name": args.model_name, "artifact_dir": None, "offline": False}),
+        ("artifact", {"model_name": args.model_name, "artifact_dir": args.artifact_dir, "offline": True}),
+    ):
+        runs = [run_once(**kwargs) for _ in range(args.repeats)]
+        results[path] = summarize(runs)
+        print(f"{path:>8}: " + ", ".join(f"{k}={v}ms" for k, v in results[path].items()))
+    
+    speedup = results["hub"]["total_ms"] / results["artifact"]["total_ms"]
+    print(f"Artifact startup speedup: {speedup:.2f}x")
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
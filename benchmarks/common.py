@@ -0,0 +1,210 @@
+"""
+Shared helpers for the benchmark suite: timing, result files and comparison
+
+Every suite produces a list of results shaped like
+    {"name": "model.analyze[seq=64]", "median_ms": ..., "p95_ms": ..., ...}
+and results are saved in one JSON document per run, so any two runs
+(or a load-generator report) can be compared with `run.py compare`.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+RESULTS_VERSION = 1
+
+# Metrics where a larger value is better; everything else is a latency
+HIGHER_IS_BETTER = {"ops_per_s", "rps"}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile with linear interpolation (pct in 0-100)"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize_ms(samples_ms: List[float]) -> Dict[str, float]:
+    """Latency statistics of a list of samples in milliseconds"""
+    return {
+        "n": len(samples_ms),
+        "min_ms": round(min(samples_ms), 4),
+        "median_ms": round(statistics.median(samples_ms), 4),
+        "mean_ms": round(statistics.fmean(samples_ms), 4),
+        "p95_ms": round(percentile(samples_ms, 95), 4),
+        "p99_ms": round(percentile(samples_ms, 99), 4),
+        "max_ms": round(max(samples_ms), 4),
+        "stdev_ms": round(statistics.stdev(samples_ms), 4) if len(samples_ms) > 1 else 0.0
+    }
+
+
+def measure(
+    name: str,
+    func: Callable[[], Any],
+    repeats: int = 20,
+    warmup: int = 3,
+    items: int = 1,
+    **params
+) -> Dict[str, Any]:
+    """
+    Time a callable
+    
+    Args:
+        name: Result name
+        func: Callable run once per sample
+        repeats: Number of timed samples
+        warmup: Untimed calls before sampling
+        items: Work items per call (texts, rows), used for ops_per_s
+        **params: Parameters recorded with the result
+    
+    Returns:
+        Result dictionary with latency statistics
+    """
+    for _ in range(warmup):
+        func()
+    
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    
+    result = {"name": name, "params": params}
+    result.update(summarize_ms(samples))
+    result["ops_per_s"] = round(items * 1000 / result["median_ms"], 2) if result["median_ms"] else None
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    """Machine and library versions, stored with every result file"""
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": _git_commit()
+    }
+    try:
+        import torch
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+
+def result_document(suites: Dict[str, List[Dict[str, Any]]], config: Dict[str, Any]) -> Dict[str, Any]:
+    """Wrap suite results with run metadata"""
+    return {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": environment(),
+        "config": config,
+        "suites": suites
+    }
+
+
+def write_results(path: str, document: Dict[str, Any]):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+
+
+def load_results(path: str) -> Dict[str, Dict[str, Any]]:
+    """Load a result file as {suite/name: result}"""
+    with open(path, "r", encoding="utf-8") as f:
+        document = json.load(f)
+    return {
+        f"{suite}/{result['name']}": result
+        for suite, results in document["suites"].items()
+        for result in results
+    }
+
+
+def compare(
+    baseline: Dict[str, Dict[str, Any]],
+    current: Dict[str, Dict[str, Any]],
+    metric: str = "median_ms",
+    threshold_pct: float = 10.0
+) -> List[Dict[str, Any]]:
+    """
+    Compare two result sets on one metric
+    
+    Returns:
+        One row per benchmark with its status: 'regression', 'improved',
+        'ok', 'new' or 'missing'
+    """
+    higher_is_better = metric in HIGHER_IS_BETTER
+    rows = []
+    for name in sorted(set(baseline) | set(current)):
+        old = baseline.get(name, {}).get(metric)
+        new = current.get(name, {}).get(metric)
+        row = {"name": name, "baseline": old, "current": new, "change_pct": None}
+        if old is None or new is None:
+            row["status"] = "new" if old is None else "missing"
+        else:
+            change = (new - old) / old * 100 if old else 0.0
+            worse = -change if higher_is_better else change
+            row["change_pct"] = round(change, 2)
+            if worse > threshold_pct:
+                row["status"] = "regression"
+            elif worse < -threshold_pct:
+                row["status"] = "improved"
+            else:
+                row["status"] = "ok"
+        rows.append(row)
+    return rows
+
+
+def format_comparison(rows: List[Dict[str, Any]], metric: str) -> str:
+    """Render comparison rows as a text table"""
+    width = max([len(row["name"]) for row in rows] + [9])
+    lines = [f"{'benchmark':<{width}}  {'baseline':>12}  {'current':>12}  {'change':>9}  status"]
+    for row in rows:
+        old = f"{row['baseline']:.3f}" if row["baseline"] is not None else "-"
+        new = f"{row['current']:.3f}" if row["current"] is not None else "-"
+        change = f"{row['change_pct']:+.1f}%" if row["change_pct"] is not None else "-"
+        lines.append(f"{row['name']:<{width}}  {old:>12}  {new:>12}  {change:>9}  {row['status']}")
+    lines.append(f"(metric: {metric})")
+    return "\n".join(lines)
+
+
+def print_results(suite: str, results: List[Dict[str, Any]]):
+    for result in results:
+        extra = ""
+        if result.get("ops_per_s"):
+            extra = f", {result['ops_per_s']} ops/s"
+        elif result.get("rps"):
+            extra = f", {result['rps']} req/s, {result.get('error_rate', 0):.2%} errors"
+        print(
+            f"[{suite}] {result['name']}: median {result['median_ms']:.3f}ms, "
+            f"p95 {result['p95_ms']:.3f}ms{extra}"
+        )
@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+"""
+Load generator replaying a JSONL request corpus
+
+Each corpus line is one request:
+    {"method": "POST", "path": "/api/v1/analyze", "json": {...}}  explicit request
+    {"text": "..."}                                               POST /api/v1/analyze
+    {"texts": ["...", "..."]}                                     POST /api/v1/batch-analyze
+Any other JSONL file can be replayed as analyze requests with --text-field.
+
+Closed loop (--concurrency) keeps N requests in flight back to back.
+Open loop (--rps) sends requests on a fixed or Poisson schedule no matter
+how fast responses come back, and measures latency from the scheduled
+send time so a stalled server is not hidden (coordinated omission).
+
+Usage:
+    python benchmarks/loadgen.py corpus.jsonl --rps 50 --duration 30
+    python benchmarks/loadgen.py corpus.jsonl --concurrency 16 --url http://localhost:8000
+    python benchmarks/loadgen.py requests.jsonl --text-field body --rps 20 --output load.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from common import percentile, result_document, summarize_ms, write_results
+
+
+def load_corpus(path: str, text_field: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Read a JSONL corpus into request specs
+    
+    Raises:
+        ValueError: If a line cannot be turned into a request
+    """
+    requests = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "path" in record:
+                requests.append({
+                    "method": record.get("method", "GET").upper(),
+                    "path": record["path"],
+                    "json": record.get("json"),
+                    "headers": record.get("headers") or {}
+                })
+            elif text_field or "text" in record:
+                text = record.get(text_field or "text")
+                if not isinstance(text, str) or not text.strip():
+                    raise ValueError(f"Line {line_number}: no text in field '{text_field or 'text'}'")
+                requests.append({
+                    "method": "POST",
+                    "path": "/api/v1/analyze",
+                    "json": {"text": text[:5000]},
+                    "headers": {}
+                })
+            elif "texts" in record:
+                requests.append({
+                    "method": "POST",
+                    "path": "/api/v1/batch-analyze",
+                    "json": {"texts": record["texts"]},
+                    "headers": {}
+                })
+            else:
+                raise ValueError(f"Line {line_number}: expected 'path', 'text' or 'texts'")
+    if not requests:
+        raise ValueError(f"Corpus {path} is empty")
+    return requests
+
+
+class Recorder:
+    """Collects per-request outcomes"""
+    
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        # (completion offset in seconds, latency ms, status code or None)
+        self.samples = []
+    
+    def record(self, scheduled_at: float, status: Optional[int]):
+        now = time.perf_counter()
+        self.samples.append((now - self.started_at, (now - scheduled_at) * 1000, status))
+    
+    def report(self, name: str, params: Dict[str, Any], elapsed_s: float) -> Dict[str, Any]:
+        """Summary in the benchmark result format, plus a per-second timeline"""
+        latencies = [latency for _, latency, _ in self.samples]
+        statuses = Counter(str(status) if status is not None else "error" for _, _, status in self.samples)
+        errors = sum(1 for _, _, status in self.samples if status is None or status >= 400)
+        
+        result = {"name": name, "params": params}
+        result.update(summarize_ms(latencies) if latencies else {"n": 0})
+        result["p50_ms"] = round(percentile(latencies, 50), 4) if latencies else None
+        result["p90_ms"] = round(percentile(latencies, 90), 4) if latencies else None
+        result["rps"] = round(len(self.samples) / elapsed_s, 2) if elapsed_s else None
+        result["error_rate"] = round(errors / len(self.samples), 4) if self.samples else 0.0
+        result["status_codes"] = dict(statuses)
+        result["timeline"] = self._timeline()
+        return result
+    
+    def _timeline(self) -> List[Dict[str, Any]]:
+        buckets: Dict[int, List] = {}
+        for offset, latency, status in self.samples:
+            buckets.setdefault(int(offset), []).append((latency, status))
+        timeline = []
+        for second in range(max(buckets) + 1 if buckets else 0):
+            entries = buckets.get(second, [])
+            latencies = [latency for latency, _ in entries]
+            timeline.append({
+                "second": second,
+                "completed": len(entries),
+                "errors": sum(1 for _, status in entries if status is None or status >= 400),
+                "p50_ms": round(percentile(latencies, 50), 2) if latencies else None,
+                "p99_ms": round(percentile(latencies, 99), 2) if latencies else None
+            })
+        return timeline
+
+
+async def send(client, spec: Dict[str, Any], recorder: Recorder, scheduled_at: float, timeout: float):
+    try:
+        response = await asyncio.wait_for(
+            client.request(spec["method"], spec["path"], json=spec["json"], headers=spec["headers"]),
+            timeout
+        )
+        status = response.status_code
+    except Exception:
+        status = None
+    recorder.record(scheduled_at, status)
+
+
+async def closed_loop(
+    client,
+    corpus,
+    recorder,
+    concurrency: int,
+    deadline: float,
+    max_requests: Optional[int],
+    timeout: float
+):
+    """N workers, each sending its next request as soon as the last one finished"""
+    specs = itertools.cycle(corpus)
+    budget = itertools.count() if max_requests is None else iter(range(max_requests))
+    
+    async def worker():
+        for _ in budget:
+            if time.perf_counter() >= deadline:
+                return
+            await send(client, next(specs), recorder, time.perf_counter(), timeout)
+    
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def open_loop(
+    client,
+    corpus,
+    recorder,
+    rps: float,
+    deadline: float,
+    max_requests: Optional[int],
+    timeout: float,
+    poisson: bool,
+    max_outstanding: int,
+    seed: int
+):
+    """Send on a schedule; requests over max_outstanding count as errors"""
+    rng = random.Random(seed)
+    specs = itertools.cycle(corpus)
+    tasks = set()
+    next_send = time.perf_counter()
+    sent = 0
+    
+    while next_send < deadline and (max_requests is None or sent < max_requests):
+        delay = next_send - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(tasks) >= max_outstanding:
+            recorder.record(next_send, None)
+        else:
+            task = asyncio.ensure_future(send(client, next(specs), recorder, next_send, timeout))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        sent += 1
+        next_send += rng.expovariate(rps) if poisson else 1.0 / rps
+    
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def run_async(args, corpus) -> Dict[str, Any]:
+    import httpx
+    
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_outstanding))
+    
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout)
+        lifespan = None
+    else:
+        from api.main import app
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://loadgen",
+            timeout=args.timeout
+        )
+        lifespan = app.router.lifespan_context(app)
+    
+    if lifespan is not None:
+        await lifespan.__aenter__()
+    try:
+        async with client:
+            recorder = Recorder()
+            deadline = recorder.started_at + args.duration
+            if args.rps:
+                await open_loop(
+                    client, corpus, recorder, args.rps, deadline, args.requests, args.timeout,
+                    args.arrival == "poisson", args.max_outstanding, args.seed
+                )
+            else:
+                await closed_loop(
+                    client, corpus, recorder, args.concurrency, deadline, args.requests, args.timeout
+                )
+            elapsed = time.perf_counter() - recorder.started_at
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+    
+    mode = f"open[rps={args.rps},{args.arrival}]" if args.rps else f"closed[concurrency={args.concurrency}]"
+    params = {
+        "corpus": os.path.basename(args.corpus),
+        "target": args.url or "asgi",
+        "mode": "open" if args.rps else "closed",
+        "rps": args.rps,
+        "concurrency": None if args.rps else args.concurrency,
+        "duration_s": args.duration
+    }
+    return recorder.report(f"loadgen.{mode}", params, elapsed)
+
+
+def print_report(result: Dict[str, Any]):
+    print(f"{result['name']}: {result['n']} requests, {result['rps']} req/s, "
+          f"{result['error_rate']:.2%} errors")
+    if result["n"]:
+        print("  latency ms: " + ", ".join(
+            f"{key[:-3]}={result[key]:.1f}"
+            for key in ("p50_ms", "p90_ms", "p95_ms", "p99_ms", "max_ms")
+        ))
+    print(f"  status codes: {result['status_codes']}")
+    for bucket in result["timeline"]:
+        print(f"  t={bucket['second']:>3}s  {bucket['completed']:>5} done  "
+              f"{bucket['errors']:>4} errors  p99={bucket['p99_ms']}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a JSONL request corpus against the API")
+    parser.add_argument("corpus", help="JSONL file with one request per line")
+    parser.add_argument("--url", help="Base URL of a running server (default: in-process over ASGI)")
+    parser.add_argument("--text-field", help="Replay this field of each line as an analyze request")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--rps", type=float, help="Open loop: target requests per second")
+    mode.add_argument("--concurrency", type=int, default=8, help="Closed loop: requests in flight")
+    parser.add_argument("--arrival", choices=("uniform", "poisson"), default="uniform",
+                        help="Open-loop arrival process")
+    parser.add_argument("--max-outstanding", type=int, default=1000,
+                        help="Open loop: requests in flight before new ones count as dropped")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="Database for the in-process app (default: scratch SQLite)")
+    parser.add_argument("--output", help="Write results as JSON (readable by run.py compare)")
+    args = parser.parse_args()
+    
+    corpus = load_corpus(args.corpus, args.text_field)
+    
+    scratch_dir = None
+    if not args.url:
+        if args.database_url:
+            os.environ["DATABASE_URL"] = args.database_url
+        else:
+            scratch_dir = tempfile.TemporaryDirectory()
+            os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(scratch_dir.name, 'loadgen.db')}"
+    try:
+        result = asyncio.run(run_async(args, corpus))
+    finally:
+        if scratch_dir is not None:
+            scratch_dir.cleanup()
+    
+    print_report(result)
+    if args.output:
+        write_results(args.output, result_document({"loadgen": [result]}, vars(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Benchmark suite runner
+
+Usage:
+    python benchmarks/run.py run --suites model crud export api serialization ingest grpc --output benchmarks/results/baseline.json
+    python benchmarks/run.py run --quick --output benchmarks/results/current.json
+    python benchmarks/run.py compare benchmarks/results/baseline.json benchmarks/results/current.json
+
+`compare` exits with status 1 when any benchmark regressed by more than
+--threshold percent.
+"""
+
+import argparse
+import sys
+
+import bench_api
+import bench_crud
+import bench_export
+import bench_grpc
+import bench_ingest
+import bench_model
+import bench_serialization
+from common import compare, format_comparison, load_results, print_results, result_document, write_results
+
+SUITES = ("model", "crud", "export", "api", "serialization", "ingest", "grpc")
+
+# Defaults used with --quick, for a fast smoke run (CI, laptops)
+QUICK = {
+    "seq_lengths": [16, 128],
+    "batch_sizes": [1, 8],
+    "rows": 100_000,
+    "repeats": 5,
+    "requests": 50
+}
+
+
+def run_suites(args) -> int:
+    suites = {}
+    for suite in args.suites:
+        if suite == "model":
+            results = bench_model.run(
+                model_name=args.model_name,
+                artifact_dir=args.artifact_dir,
+                seq_lengths=args.seq_lengths,
+                batch_sizes=args.batch_sizes,
+                repeats=args.repeats
+            )
+        elif suite == "crud":
+            results = bench_crud.run(rows=args.rows, db_path=args.db_path, repeats=args.repeats)
+        elif suite == "export":
+            # Each sample exports the whole database
+            results = bench_export.run(
+                rows=args.rows,
+                db_path=args.db_path,
+                chunk_size=args.export_chunk_size,
+                repeats=max(1, args.repeats // 5)
+            )
+        elif suite == "serialization":
+            results = bench_serialization.run(sizes=args.sizes, repeats=args.repeats * 10)
+        elif suite == "ingest":
+            results = bench_ingest.run(sizes=args.ingest_sizes, repeats=args.repeats * 10)
+        elif suite == "grpc":
+            results = bench_grpc.run(
+                requests=args.requests,
+                concurrency=args.concurrency,
+                database_url=args.database_url
+            )
+        else:
+            results = bench_api.run(
+                requests=args.requests,
+                concurrency=args.concurrency,
+                database_url=args.database_url
+            )
+        print_results(suite, results)
+        suites[suite] = results
+    
+    config = {key: value for key, value in vars(args).items() if key != "func"}
+    write_results(args.output, result_document(suites, config))
+    print(f"Results written to {args.output}")
+    return 0
+
+
+def compare_results(args) -> int:
+    rows = compare(
+        load_results(args.baseline),
+        load_results(args.current),
+        metric=args.metric,
+        threshold_pct=args.threshold
+    )
+    print(format_comparison(rows, args.metric))
+    regressions = [row for row in rows if row["status"] == "regression"]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold}%")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run and compare performance benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    run_parser = subparsers.add_parser("run", help="Run benchmark suites")
+    run_parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES))
+    run_parser.add_argument("--output", default="benchmarks/results/latest.json")
+    run_parser.add_argument("--repeats", type=int, default=20)
+    run_parser.add_argument("--quick", action="store_true", help="Small sizes for a fast smoke run")
+    bench_model.add_arguments(run_parser)
+    bench_crud.add_arguments(run_parser)
+    bench_export.add_arguments(run_parser)
+    bench_api.add_arguments(run_parser)
+    bench_serialization.add_arguments(run_parser)
+    bench_ingest.add_arguments(run_parser)
+    run_parser.set_defaults(func=run_suites)
+    
+    compare_parser = subparsers.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--metric", default="median_ms", help="Metric compared (e.g. median_ms, p95_ms, rps)")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="Allowed slowdown in percent")
+    compare_parser.set_defaults(func=compare_results)
+    
+    args, _ = parser.parse_known_args()
+    if getattr(args, "quick", False):
+        # Quick sizes replace the defaults; explicit options still win
+        run_parser.set_defaults(**QUICK)
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
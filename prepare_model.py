@@ -0,0 +1,16 @@
+#!/usr/bin/env python
+"""
+Script to prepare a self-contained model artifact
+Run this at image build time so the API can start without network access
+"""
+
+import sys
+import os
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from models.artifact import main
+
+if __name__ == "__main__":
+    main()
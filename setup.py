@@ -34,6 +34,7 @@ setup(
         "fastapi>=0.104.0",
         "uvicorn[standard]>=0.24.0",
         "pydantic>=2.0.0",
+        "orjson>=3.8.3",
         "transformers>=4.35.0",
         "torch>=2.1.0",
         "sqlalchemy>=2.0.0",
@@ -52,10 +53,21 @@ setup(
             "flake8>=6.0.0",
             "mypy>=1.5.0",
         ],
+        "formats": [
+            "msgpack>=1.0.0",
+            "pyarrow>=14.0.0",
+        ],
+        "grpc": [
+            "grpcio>=1.84.0",
+            "grpcio-health-checking>=1.84.0",
+            "protobuf>=7.35.1",
+        ],
     },
     entry_points={
         "console_scripts": [
             "sentiment-api=api.main:app",
+            "prepare-model=models.artifact:main",
+            "sentiment-grpc=api.grpc_server:main",
         ],
     },
 )
@@ -39,23 +39,83 @@ class Settings(BaseSettings):
     # Model Configuration
     MODEL_NAME: str = "distilbert-base-uncased-finetuned-sst-2-english"
     MODEL_CACHE_DIR: str = "./models"
+    MODEL_ARTIFACT_DIR: Optional[str] = None  # Created by `prepare-model`, loads offline
+    MODEL_MMAP_WEIGHTS: bool = False  # File-backed weights shared between workers
+    MODEL_LOAD_RSS_CEILING_MB: int = 256  # Max RSS growth allowed while loading weights
     MAX_LENGTH: int = 512
     
+    # Model registry: alias -> model name or artifact dir, e.g. {"en": "...", "es": "..."}
+    # Empty means MODEL_NAME (or MODEL_ARTIFACT_DIR) is served as "default"
+    MODELS: dict = {}
+    DEFAULT_MODEL: Optional[str] = None
+    MODEL_MEMORY_BUDGET_MB: Optional[float] = None  # Unload idle models (never the default) above this
+    
+    # Micro-batching and result cache (per model)
+    BATCH_MAX_SIZE: int = 16
+    BATCH_MAX_WAIT_MS: float = 5.0
+    RESULT_CACHE_SIZE: int = 1024
+    RESULT_CACHE_PERSISTENT: bool = False  # Also serve results stored in the history (survives restarts)
+    # Priority class -> share of batch slots; /analyze defaults to interactive, /batch-analyze to bulk
+    BATCH_PRIORITY_WEIGHTS: dict = {"interactive": 8, "bulk": 1}
+    BATCH_BULK_CHUNK_SIZE: Optional[int] = None  # Texts queued at a time per bulk request, defaults to BATCH_MAX_SIZE
+    REQUEST_TIMEOUT_MS: Optional[int] = None  # Default inference deadline, None = no deadline
+    
+    # Model warmup (runs synthetic batches at startup)
+    MODEL_WARMUP_ENABLED: bool = True
+    MODEL_WARMUP_SEQ_LENGTHS: list = [16, 64, 128]
+    MODEL_WARMUP_BATCH_SIZES: list = [1, 8]
+    MODEL_COMPILE_MODE: str = "none"  # none, trace or compile
+    
     # Database Configuration (for Day 3)
     DATABASE_URL: str = "sqlite:///./sentiment_analysis.db"
     DB_ECHO: bool = False
+    DATABASE_READ_URL: Optional[str] = None  # Read replica for history, stats and search; None = use DATABASE_URL
+    DATABASE_READ_MAX_LAG_S: Optional[float] = 30.0  # Read from the primary while the replica lags more, None = never
+    DATABASE_READ_LAG_CHECK_S: float = 5.0  # Seconds between replica lag checks
+    
+    # History partitioning and retention
+    HISTORY_PARTITION_INTERVAL: Optional[str] = None  # monthly or daily; PostgreSQL partitions new tables by created_at
+    HISTORY_PARTITIONS_AHEAD: int = 2  # Future partitions created in advance
+    HISTORY_RETENTION_DAYS: Optional[int] = None  # Expire older analyses, None = keep forever
+    HISTORY_ARCHIVE_DIR: Optional[str] = None  # Export expired periods to Parquet here first (needs `pyarrow`)
+    HISTORY_MAINTENANCE_INTERVAL_S: int = 3600
     
     # API Security (optional)
     API_KEY: Optional[str] = None
     ENABLE_API_KEY: bool = False
+    ADMIN_API_KEY: Optional[str] = None  # Enables /api/v1/admin endpoints
     
-    # Rate Limiting
+    # Rate Limiting (token bucket per API key or client IP on inference routes)
     RATE_LIMIT_ENABLED: bool = False
-    RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_PER_MINUTE: int = 60  # Cost units refilled per minute
+    RATE_LIMIT_BURST: Optional[int] = None  # Bucket size, defaults to RATE_LIMIT_PER_MINUTE
+    RATE_LIMIT_TOKENS_PER_UNIT: int = 128  # Text tokens per cost unit, at least one unit per text
+    RATE_LIMIT_MAX_CONCURRENT_INFERENCE: int = 0  # Per worker, 0 = unlimited
+    RATE_LIMIT_REDIS_URL: Optional[str] = None  # Share buckets between workers (needs `redis`)
+    
+    # WebSocket streaming
+    WS_MAX_OUTSTANDING: int = 32  # Messages analyzed at once per connection; reading pauses at the limit
+    
+    # gRPC (needs `grpcio` and `grpcio-health-checking`)
+    GRPC_ENABLED: bool = False  # Serve gRPC from the API process as well
+    GRPC_PORT: int = 50051
+    GRPC_MAX_STREAM_OUTSTANDING: int = 64  # Texts analyzed at once per AnalyzeStream call
     
     # Logging
     LOG_LEVEL: str = "INFO"
     
+    # Metrics
+    METRICS_ENABLED: bool = True  # Serve Prometheus metrics at /metrics
+    
+    # Tracing
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATIO: float = 0.05  # Fraction of requests traced
+    TRACING_EXPORTER: str = "console"  # console, memory or none
+    
+    # Profiling (admin endpoints, requires ADMIN_API_KEY)
+    PROFILING_ENABLED: bool = False
+    PROFILING_MAX_SECONDS: int = 60
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,79 @@
+"""
+Request deadlines and client disconnect detection
+
+A request's deadline comes from its `timeout_ms` field, the
+X-Request-Timeout-Ms header or REQUEST_TIMEOUT_MS, in that order. The
+batcher drops texts whose deadline has passed before scoring them, and
+inference is cancelled when the client goes away.
+"""
+
+import asyncio
+import math
+import time
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi import Request
+
+from api.config import settings
+
+TIMEOUT_HEADER = "x-request-timeout-ms"
+
+# How often a slow request checks whether its client is still there
+DISCONNECT_POLL_INTERVAL_S = 0.05
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """The client closed the connection before the response was ready"""
+
+
+def request_deadline(request: Request, timeout_ms: Optional[int] = None) -> Optional[float]:
+    """
+    Deadline of a request as a time.perf_counter() value
+    
+    Raises:
+        ValueError: If the timeout header is not a positive, finite number
+    """
+    if timeout_ms is None:
+        header = request.headers.get(TIMEOUT_HEADER)
+        if header is not None:
+            try:
+                timeout_ms = float(header)
+            except ValueError:
+                raise ValueError(f"Invalid {TIMEOUT_HEADER} header: {header}")
+            # float() accepts "nan" and "inf", which would never expire
+            if not math.isfinite(timeout_ms):
+                raise ValueError(f"Invalid {TIMEOUT_HEADER} header: {header}")
+            if timeout_ms <= 0:
+                raise ValueError(f"{TIMEOUT_HEADER} must be positive")
+        else:
+            timeout_ms = settings.REQUEST_TIMEOUT_MS
+    if timeout_ms is None:
+        return None
+    return time.perf_counter() + timeout_ms / 1000
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """
+    Await while watching the client connection
+    
+    Requests that finish within one poll interval never check the
+    connection.
+    
+    Raises:
+        ClientDisconnected: If the client went away; the awaitable is
+            cancelled so queued inference for it is dropped
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL_S)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
@@ -0,0 +1,21 @@
+"""
+Shared dependencies for the API routes
+"""
+
+from fastapi import HTTPException
+from starlette.requests import HTTPConnection
+
+from models.registry import ModelRegistry
+
+
+def get_model_registry(conn: HTTPConnection) -> ModelRegistry:
+    """
+    The app's model registry, set up by the lifespan
+    
+    Requests that reach the app before startup has finished (or without
+    its lifespan at all) get a 503 instead of an error from app.state.
+    """
+    registry = getattr(conn.app.state, "registry", None)
+    if registry is None:
+        raise HTTPException(status_code=503, detail="Model registry is not ready")
+    return registry
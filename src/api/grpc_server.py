@@ -0,0 +1,293 @@
+"""
+gRPC inference service
+
+Serves the same model registry and micro-batchers as the REST API, either
+inside the API process (GRPC_ENABLED) or on its own (`sentiment-grpc`).
+Needs the optional `grpcio` and `grpcio-health-checking` packages.
+"""
+
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, List, Optional
+
+import grpc
+from grpc_health.v1 import health_pb2, health_pb2_grpc
+from grpc_health.v1.health import aio as health_aio
+
+from api.config import settings
+from api.proto import sentiment_pb2, sentiment_pb2_grpc
+from models.batcher import BULK, INTERACTIVE, DeadlineExceeded
+from models.registry import ModelRegistry, create_registry_from_settings
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = sentiment_pb2.DESCRIPTOR.services_by_name["SentimentService"].full_name
+
+# Same limits as the REST request schemas
+MAX_TEXT_LENGTH = 5000
+MAX_BATCH_TEXTS = 100
+
+
+def _deadline(timeout_ms: int, context: grpc.aio.ServicerContext) -> Optional[float]:
+    """Deadline as a time.perf_counter() value, from the request or the call"""
+    if timeout_ms:
+        return time.perf_counter() + timeout_ms / 1000
+    remaining = context.time_remaining()
+    if remaining is not None:
+        return time.perf_counter() + remaining
+    if settings.REQUEST_TIMEOUT_MS is not None:
+        return time.perf_counter() + settings.REQUEST_TIMEOUT_MS / 1000
+    return None
+
+
+def _check_length(text: str, index: Optional[int] = None):
+    if len(text) > MAX_TEXT_LENGTH:
+        where = "Text" if index is None else f"Text {index}"
+        raise ValueError(f"{where} is longer than {MAX_TEXT_LENGTH} characters")
+
+
+def _batch_texts(texts) -> List[str]:
+    """
+    Stripped texts of a batch request, within the limits of BatchAnalysisRequest
+    
+    Raises:
+        ValueError: For too many or too long texts, or if all are empty
+    """
+    if len(texts) > MAX_BATCH_TEXTS:
+        raise ValueError(f"At most {MAX_BATCH_TEXTS} texts per batch, got {len(texts)}")
+    for index, text in enumerate(texts):
+        _check_length(text, index)
+    texts = [text.strip() for text in texts]
+    if not any(texts):
+        raise ValueError("At least one text must be non-empty")
+    return texts
+
+
+def _to_response(result: dict, model_name: str, processing_time_ms: float, id: str = "") -> sentiment_pb2.AnalyzeResponse:
+    response = sentiment_pb2.AnalyzeResponse(
+        id=id,
+        text=result["text"],
+        model_name=model_name,
+        processing_time_ms=processing_time_ms
+    )
+    if "predictions" in result:
+        top = max(result["predictions"], key=lambda x: x["score"])
+        response.label = top["label"]
+        response.score = top["score"]
+        response.predictions.extend(
+            sentiment_pb2.LabelScore(label=p["label"], score=p["score"]) for p in result["predictions"]
+        )
+    else:
+        response.label = result["label"]
+        response.score = result["score"]
+    return response
+
+
+class SentimentServicer(sentiment_pb2_grpc.SentimentServiceServicer):
+    """
+    SentimentService backed by a model registry
+    
+    Errors map to status codes like the REST routes map them to HTTP:
+    invalid input or unknown models are INVALID_ARGUMENT, missed deadlines
+    DEADLINE_EXCEEDED, anything else INTERNAL.
+    """
+    
+    def __init__(self, registry: ModelRegistry, max_stream_outstanding: int = 64):
+        """
+        Args:
+            registry: Registry whose models and batchers serve the calls
+            max_stream_outstanding: Texts of one AnalyzeStream call being
+                analyzed at once; the stream is read no further until one
+                finishes
+        """
+        self.registry = registry
+        self.max_stream_outstanding = max_stream_outstanding
+    
+    async def _analyze(self, request: sentiment_pb2.AnalyzeRequest, deadline: Optional[float]) -> sentiment_pb2.AnalyzeResponse:
+        _check_length(request.text)
+        start_time = time.perf_counter()
+        async with self.registry.use(request.model or None) as entry:
+            result = await entry.batcher.submit(
+                request.text.strip(),
+                return_all_scores=request.return_all_scores,
+                priority=request.priority or INTERACTIVE,
+                deadline=deadline
+            )
+            model_name = entry.analyzer.model_name
+        processing_time = (time.perf_counter() - start_time) * 1000
+        return _to_response(result, model_name, processing_time, request.id)
+    
+    async def _abort(self, context: grpc.aio.ServicerContext, error: Exception):
+        """End the call with the status matching `error` (context.abort raises)"""
+        if isinstance(error, DeadlineExceeded):
+            logger.info(f"Request deadline exceeded: {str(error)}")
+            await context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, "Deadline exceeded")
+        elif isinstance(error, ValueError):
+            logger.warning(f"Validation error: {str(error)}")
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(error))
+        else:
+            logger.error(f"Error in gRPC call: {str(error)}", exc_info=error)
+            await context.abort(grpc.StatusCode.INTERNAL, "Error processing request")
+    
+    async def Analyze(self, request, context):
+        try:
+            return await self._analyze(request, _deadline(request.timeout_ms, context))
+        except Exception as e:
+            await self._abort(context, e)
+    
+    async def AnalyzeStream(self, request_iterator, context) -> AsyncIterator[sentiment_pb2.AnalyzeResponse]:
+        """Analyze streamed texts concurrently, yielding each result as it finishes"""
+        results: asyncio.Queue = asyncio.Queue()
+        slots = asyncio.Semaphore(self.max_stream_outstanding)
+        tasks = set()
+        # Texts read from the stream whose response has not been yielded yet
+        outstanding = 0
+        
+        async def analyze(request):
+            try:
+                response = await self._analyze(request, _deadline(request.timeout_ms, context))
+            except DeadlineExceeded:
+                response = sentiment_pb2.AnalyzeResponse(id=request.id, error="Deadline exceeded")
+            except ValueError as e:
+                response = sentiment_pb2.AnalyzeResponse(id=request.id, error=str(e))
+            except Exception as e:
+                logger.error(f"Error in gRPC stream: {str(e)}")
+                response = sentiment_pb2.AnalyzeResponse(id=request.id, error="Error processing request")
+            # The slot is held until the response has been yielded, so a
+            # client that stops reading stops the stream from being consumed
+            results.put_nowait(response)
+        
+        async def read():
+            nonlocal outstanding
+            requests = request_iterator.__aiter__()
+            while True:
+                await slots.acquire()
+                try:
+                    request = await requests.__anext__()
+                except StopAsyncIteration:
+                    slots.release()
+                    return
+                outstanding += 1
+                task = asyncio.ensure_future(analyze(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        
+        reader = asyncio.ensure_future(read())
+        try:
+            while True:
+                getter = asyncio.ensure_future(results.get())
+                await asyncio.wait({getter, reader}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    # Input is exhausted (or failed): drain what is still being analyzed
+                    reader.result()
+                    while outstanding:
+                        outstanding -= 1
+                        yield await results.get()
+                        slots.release()
+                    return
+                outstanding -= 1
+                yield getter.result()
+                slots.release()
+        finally:
+            # Client cancelled or went away: drop its queued texts
+            reader.cancel()
+            for task in list(tasks):
+                task.cancel()
+    
+    async def BatchAnalyze(self, request, context):
+        try:
+            texts = _batch_texts(request.texts)
+            start_time = time.perf_counter()
+            async with self.registry.use(request.model or None) as entry:
+                results = await entry.batcher.submit_many(
+                    texts,
+                    return_all_scores=request.return_all_scores,
+                    priority=request.priority or BULK,
+                    deadline=_deadline(request.timeout_ms, context)
+                )
+                model_name = entry.analyzer.model_name
+            processing_time = (time.perf_counter() - start_time) * 1000
+            return sentiment_pb2.BatchAnalyzeResponse(
+                results=[_to_response(result, model_name, processing_time) for result in results],
+                total_analyzed=len(results),
+                model_name=model_name,
+                processing_time_ms=processing_time
+            )
+        except Exception as e:
+            await self._abort(context, e)
+
+
+class GrpcServer:
+    """
+    gRPC server for a model registry, run on the current event loop
+    
+    Health is reported through grpc.health.v1, for the whole server and
+    for sentiment.v1.SentimentService.
+    """
+    
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        port: int,
+        host: str = "[::]",
+        max_stream_outstanding: int = 64
+    ):
+        """
+        Args:
+            registry: Registry serving the calls
+            port: Port to listen on, 0 for any free port
+            host: Interface to listen on
+            max_stream_outstanding: See SentimentServicer
+        """
+        self.server = grpc.aio.server()
+        sentiment_pb2_grpc.add_SentimentServiceServicer_to_server(
+            SentimentServicer(registry, max_stream_outstanding=max_stream_outstanding), self.server
+        )
+        self.health = health_aio.HealthServicer()
+        health_pb2_grpc.add_HealthServicer_to_server(self.health, self.server)
+        self.port = self.server.add_insecure_port(f"{host}:{port}")
+    
+    async def start(self):
+        await self.server.start()
+        for service in ("", SERVICE_NAME):
+            await self.health.set(service, health_pb2.HealthCheckResponse.SERVING)
+        logger.info(f"gRPC server listening on port {self.port}")
+    
+    async def stop(self, grace: float = 5.0):
+        """Report NOT_SERVING, then stop once in-flight calls finish or after `grace` seconds"""
+        await self.health.enter_graceful_shutdown()
+        await self.server.stop(grace)
+    
+    async def wait_for_termination(self):
+        await self.server.wait_for_termination()
+
+
+async def serve():
+    """Run a standalone gRPC server from application settings until stopped"""
+    registry = create_registry_from_settings(settings)
+    registry.get()
+    server = GrpcServer(
+        registry,
+        settings.GRPC_PORT,
+        max_stream_outstanding=settings.GRPC_MAX_STREAM_OUTSTANDING
+    )
+    await server.start()
+    try:
+        await server.wait_for_termination()
+    finally:
+        await server.stop()
+        registry.close()
+
+
+def main():
+    logging.basicConfig(
+        level=getattr(logging, settings.LOG_LEVEL),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Batch request bodies in JSON, MessagePack or Arrow IPC
+
+Every format is decoded straight into the fields of BatchAnalysisRequest
+and validated once by pydantic-core, which also strips the texts. Arrow
+streams carry the texts as a `texts` string column and the other fields
+as schema metadata. Streamed messages can come as Arrow too, one row each.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import orjson
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+
+from api.responses import ARROW_STREAM, MEDIA_TYPE_ALIASES, MSGPACK, msgpack, pyarrow
+from api.schemas import BatchAnalysisRequest
+
+# Request body schema for the OpenAPI docs of routes using read_batch_request
+BATCH_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "application/json": {"schema": BatchAnalysisRequest.model_json_schema()},
+        MSGPACK: {"schema": {"type": "string", "format": "binary"}},
+        ARROW_STREAM: {"schema": {"type": "string", "format": "binary"}}
+    }
+}
+
+
+def _media_type(content_type: Optional[str]) -> str:
+    media_type = (content_type or "application/json").split(";")[0].strip().lower()
+    return MEDIA_TYPE_ALIASES.get(media_type, media_type)
+
+
+def _decode_arrow(body: bytes) -> Dict[str, Any]:
+    table = pyarrow.ipc.open_stream(body).read_all()
+    if "texts" not in table.column_names:
+        raise ValueError("Arrow stream has no 'texts' column")
+    column = table.column("texts")
+    if not (pyarrow.types.is_string(column.type) or pyarrow.types.is_large_string(column.type)):
+        raise ValueError(f"Arrow 'texts' column must be strings, got {column.type}")
+    fields = {
+        key.decode(): value.decode()
+        for key, value in (table.schema.metadata or {}).items()
+    }
+    # Nulls become empty texts and are dropped with them
+    fields["texts"] = column.fill_null("").to_pylist()
+    return fields
+
+
+def decode_arrow_messages(body: bytes) -> List[Dict[str, Any]]:
+    """
+    Decode an Arrow IPC stream of messages, one row each, without validating them
+    
+    Raises:
+        ValueError: If pyarrow is not installed or the stream cannot be decoded
+    """
+    if pyarrow is None:
+        raise ValueError("Arrow is not available on this server")
+    try:
+        return pyarrow.ipc.open_stream(body).read_all().to_pylist()
+    except pyarrow.ArrowException as e:
+        raise ValueError(str(e)) from e
+
+
+def decode_batch_body(body: bytes, content_type: Optional[str]) -> Dict[str, Any]:
+    """
+    Decode a batch request body without validating it
+    
+    Raises:
+        HTTPException: 415 for an unsupported or unavailable media type
+        ValueError: If the body cannot be decoded
+    """
+    media_type = _media_type(content_type)
+    if media_type == "application/json" or media_type.endswith("+json"):
+        return orjson.loads(body)
+    if media_type == MSGPACK and msgpack is not None:
+        return msgpack.unpackb(body, raw=False)
+    if media_type == ARROW_STREAM and pyarrow is not None:
+        return _decode_arrow(body)
+    raise HTTPException(status_code=415, detail=f"Unsupported request media type: {media_type}")
+
+
+def parse_batch_request(body: bytes, content_type: Optional[str]) -> BatchAnalysisRequest:
+    """
+    Decode and validate a batch request body
+    
+    Raises:
+        HTTPException: 400 if the body cannot be decoded, 415 for an
+            unsupported media type
+        RequestValidationError: If the fields are invalid (422, as for
+            FastAPI body parameters)
+    """
+    try:
+        fields = decode_batch_body(body, content_type)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Malformed request body: {str(e)}")
+    if not isinstance(fields, dict):
+        raise HTTPException(status_code=400, detail="Request body must be an object")
+    
+    try:
+        return BatchAnalysisRequest.model_validate(fields)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)],
+            body=fields
+        )
+
+
+async def read_batch_request(request: Request) -> BatchAnalysisRequest:
+    """FastAPI dependency reading a BatchAnalysisRequest in any supported format"""
+    return parse_batch_request(await request.body(), request.headers.get("content-type"))
@@ -4,13 +4,19 @@ Main FastAPI application
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 import time
 
 from api.config import settings
-from models.sentiment_model import get_analyzer
+from api.rate_limit import create_rate_limiter
+from api.responses import ORJSONResponse
+from api.tracing import route_template
+from models.registry import create_registry_from_settings, set_registry
+from utils.metrics import HTTP_REQUESTS, HTTP_REQUEST_DURATION, metrics
+from utils.tracing import configure_tracing
 
 # Configure logging
 logging.basicConfig(
@@ -28,11 +34,37 @@ async def lifespan(app: FastAPI):
     # Startup: Load the model and initialize database
     logger.info("Starting up API...")
     
+    configure_tracing(
+        enabled=settings.TRACING_ENABLED,
+        sample_ratio=settings.TRACING_SAMPLE_RATIO,
+        exporter=settings.TRACING_EXPORTER
+    )
+    if settings.TRACING_ENABLED:
+        logger.info(
+            f"Tracing enabled: {settings.TRACING_EXPORTER} exporter, "
+            f"sample ratio {settings.TRACING_SAMPLE_RATIO}"
+        )
+    
+    if settings.RATE_LIMIT_ENABLED:
+        logger.info(
+            f"Rate limiting enabled: {settings.RATE_LIMIT_PER_MINUTE} units/minute per client"
+            + (" (shared via Redis)" if settings.RATE_LIMIT_REDIS_URL else "")
+        )
+    
     # Initialize database
+    app.state.history_maintenance = None
     try:
-        from database.database import init_db
+        from database.database import engine, init_db
+        from database.partitioning import create_history_maintenance
         init_db()
         logger.info("Database initialized successfully")
+        
+        # Partition creation and retention run in the background
+        maintenance = create_history_maintenance(settings, engine)
+        if maintenance is not None:
+            app.state.history_maintenance = asyncio.create_task(
+                maintenance.run_periodically(settings.HISTORY_MAINTENANCE_INTERVAL_S)
+            )
     except Exception as e:
         logger.error(f"Failed to initialize database: {str(e)}")
         # Continue anyway - API can work without database
@@ -43,24 +75,36 @@ async def lifespan(app: FastAPI):
         # Import memory optimization
         from utils.memory_optimization import optimize_memory
         
-        analyzer = get_analyzer(
-            model_name=settings.MODEL_NAME,
-            cache_dir=settings.MODEL_CACHE_DIR
-        )
+        # Other registered models are loaded on first use
+        registry = create_registry_from_settings(settings)
+        analyzer = registry.get().analyzer
         logger.info(f"Model loaded successfully: {analyzer.model_name}")
         logger.info(f"Using device: {analyzer.device}")
+        logger.info(f"Available models: {', '.join(registry.models)}")
         
         # Optimize memory after loading model
         optimize_memory()
         logger.info("Memory optimization applied")
         
-        # Store analyzer in app state
-        app.state.analyzer = analyzer
+        # Store the registry in app state; the default model is always loaded
+        set_registry(registry)
+        app.state.registry = registry
         
     except Exception as e:
         logger.error(f"Failed to load model: {str(e)}")
         raise
     
+    # gRPC shares the registry and batchers, so both protocols batch together
+    app.state.grpc_server = None
+    if settings.GRPC_ENABLED:
+        from api.grpc_server import GrpcServer
+        app.state.grpc_server = GrpcServer(
+            app.state.registry,
+            settings.GRPC_PORT,
+            max_stream_outstanding=settings.GRPC_MAX_STREAM_OUTSTANDING
+        )
+        await app.state.grpc_server.start()
+    
     logger.info("API startup complete!")
     
     yield
@@ -68,6 +112,14 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down API...")
     try:
+        if app.state.history_maintenance is not None:
+            app.state.history_maintenance.cancel()
+        if app.state.grpc_server is not None:
+            await app.state.grpc_server.stop()
+        app.state.registry.close()
+        app.state.registry = None
+        set_registry(None)
+        
         from database.database import close_db
         close_db()
     except Exception as e:
@@ -80,11 +132,16 @@ app = FastAPI(
     version=settings.API_VERSION,
     description=settings.API_DESCRIPTION,
     lifespan=lifespan,
+    # Every JSON response is rendered with orjson
+    default_response_class=ORJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/openapi.json"
 )
 
+# Shared by the inference routes; buckets live as long as the worker
+app.state.rate_limiter = create_rate_limiter(settings)
+
 
 # Add CORS middleware
 app.add_middleware(
@@ -99,11 +156,18 @@ app.add_middleware(
 # Add request timing middleware
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
-    """Add processing time to response headers"""
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = (time.time() - start_time) * 1000  # Convert to milliseconds
-    response.headers["X-Process-Time-Ms"] = str(round(process_time, 2))
+    """Add processing time to response headers and record request metrics"""
+    start_time = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start_time
+        route_path = route_template(request)
+        HTTP_REQUEST_DURATION.labels(request.method, route_path).observe(elapsed)
+        HTTP_REQUESTS.labels(request.method, route_path, str(status_code)).inc()
+    response.headers["X-Process-Time-Ms"] = str(round(elapsed * 1000, 2))
     return response
 
 
@@ -133,8 +197,19 @@ async def root():
     }
 
 
+# Prometheus metrics endpoint
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", tags=["Monitoring"], include_in_schema=False)
+    async def prometheus_metrics():
+        """Metrics in the Prometheus text exposition format"""
+        return PlainTextResponse(
+            metrics.render(),
+            media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+
 # Import and include routers
-from api.routes import sentiment
+from api.routes import sentiment, stream, admin, profiling
 
 app.include_router(
     sentiment.router,
@@ -142,6 +217,25 @@ app.include_router(
     tags=["Sentiment Analysis"]
 )
 
+app.include_router(
+    stream.router,
+    prefix="/api/v1",
+    tags=["Sentiment Analysis"]
+)
+
+app.include_router(
+    admin.router,
+    prefix="/api/v1/admin",
+    tags=["Admin"]
+)
+
+app.include_router(
+    profiling.router,
+    prefix="/api/v1/admin/profiling",
+    tags=["Admin"],
+    include_in_schema=settings.PROFILING_ENABLED
+)
+
 
 if __name__ == "__main__":
     import uvicorn
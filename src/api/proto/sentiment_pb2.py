@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: api/proto/sentiment.proto
+# Protobuf Python Version: 7.35.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    7,
+    35,
+    1,
+    '',
+    'api/proto/sentiment.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x19\x61pi/proto/sentiment.proto\x12\x0csentiment.v1\"*\n\nLabelScore\x12\r\n\x05label\x18\x01 \x01(\t\x12\r\n\x05score\x18\x02 \x01(\x02\"z\n\x0e\x41nalyzeRequest\x12\x0c\n\x04text\x18\x01 \x01(\t\x12\x19\n\x11return_all_scores\x18\x02 \x01(\x08\x12\r\n\x05model\x18\x03 \x01(\t\x12\x10\n\x08priority\x18\x04 \x01(\t\x12\x12\n\ntimeout_ms\x18\x05 \x01(\r\x12\n\n\x02id\x18\x06 \x01(\t\"\xb7\x01\n\x0f\x41nalyzeResponse\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04text\x18\x02 \x01(\t\x12\r\n\x05label\x18\x03 \x01(\t\x12\r\n\x05score\x18\x04 \x01(\x02\x12-\n\x0bpredictions\x18\x05 \x03(\x0b\x32\x18.sentiment.v1.LabelScore\x12\x12\n\nmodel_name\x18\x06 \x01(\t\x12\x1a\n\x12processing_time_ms\x18\x07 \x01(\x02\x12\r\n\x05\x65rror\x18\x08 \x01(\t\"t\n\x13\x42\x61tchAnalyzeRequest\x12\r\n\x05texts\x18\x01 \x03(\t\x12\x19\n\x11return_all_scores\x18\x02 \x01(\x08\x12\r\n\x05model\x18\x03 \x01(\t\x12\x10\n\x08priority\x18\x04 \x01(\t\x12\x12\n\ntimeout_ms\x18\x05 \x01(\r\"\x8e\x01\n\x14\x42\x61tchAnalyzeResponse\x12.\n\x07results\x18\x01 \x03(\x0b\x32\x1d.sentiment.v1.AnalyzeResponse\x12\x16\n\x0etotal_analyzed\x18\x02 \x01(\r\x12\x12\n\nmodel_name\x18\x03 \x01(\t\x12\x1a\n\x12processing_time_ms\x18\x04 \x01(\x02\x32\x83\x02\n\x10SentimentService\x12\x46\n\x07\x41nalyze\x12\x1c.sentiment.v1.AnalyzeRequest\x1a\x1d.sentiment.v1.AnalyzeResponse\x12P\n\rAnalyzeStream\x12\x1c.sentiment.v1.AnalyzeRequest\x1a\x1d.sentiment.v1.AnalyzeResponse(\x01\x30\x01\x12U\n\x0c\x42\x61tchAnalyze\x12!.sentiment.v1.BatchAnalyzeRequest\x1a\".sentiment.v1.BatchAnalyzeResponseb\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'api.proto.sentiment_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_LABELSCORE']._serialized_start=43
+  _globals['_LABELSCORE']._serialized_end=85
+  _globals['_ANALYZEREQUEST']._serialized_start=87
+  _globals['_ANALYZEREQUEST']._serialized_end=209
+  _globals['_ANALYZERESPONSE']._serialized_start=212
+  _globals['_ANALYZERESPONSE']._serialized_end=395
+  _globals['_BATCHANALYZEREQUEST']._serialized_start=397
+  _globals['_BATCHANALYZEREQUEST']._serialized_end=513
+  _globals['_BATCHANALYZERESPONSE']._serialized_start=516
+  _globals['_BATCHANALYZERESPONSE']._serialized_end=658
+  _globals['_SENTIMENTSERVICE']._serialized_start=661
+  _globals['_SENTIMENTSERVICE']._serialized_end=920
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,186 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+import warnings
+
+from api.proto import sentiment_pb2 as api_dot_proto_dot_sentiment__pb2
+
+GRPC_GENERATED_VERSION = '1.84.0'
+GRPC_VERSION = grpc.__version__
+_version_not_supported = False
+
+try:
+    from grpc._utilities import first_version_is_lower
+    _version_not_supported = first_version_is_lower(GRPC_VERSION, GRPC_GENERATED_VERSION)
+except ImportError:
+    _version_not_supported = True
+
+if _version_not_supported:
+    raise RuntimeError(
+        f'The grpc package installed is at version {GRPC_VERSION},'
+        + ' but the generated code in api/proto/sentiment_pb2_grpc.py depends on'
+        + f' grpcio>={GRPC_GENERATED_VERSION}.'
+        + f' Please upgrade your grpc module to grpcio>={GRPC_GENERATED_VERSION}'
+        + f' or downgrade your generated code using grpcio-tools<={GRPC_VERSION}.'
+    )
+
+
+class SentimentServiceStub:
+    """Missing associated documentation comment in .proto file."""
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.Analyze = channel.unary_unary(
+                '/sentiment.v1.SentimentService/Analyze',
+                request_serializer=api_dot_proto_dot_sentiment__pb2.AnalyzeRequest.SerializeToString,
+                response_deserializer=api_dot_proto_dot_sentiment__pb2.AnalyzeResponse.FromString,
+                _registered_method=True)
+        self.AnalyzeStream = channel.stream_stream(
+                '/sentiment.v1.SentimentService/AnalyzeStream',
+                request_serializer=api_dot_proto_dot_sentiment__pb2.AnalyzeRequest.SerializeToString,
+                response_deserializer=api_dot_proto_dot_sentiment__pb2.AnalyzeResponse.FromString,
+                _registered_method=True)
+        self.BatchAnalyze = channel.unary_unary(
+                '/sentiment.v1.SentimentService/BatchAnalyze',
+                request_serializer=api_dot_proto_dot_sentiment__pb2.BatchAnalyzeRequest.SerializeToString,
+                response_deserializer=api_dot_proto_dot_sentiment__pb2.BatchAnalyzeResponse.FromString,
+                _registered_method=True)
+
+
+class SentimentServiceServicer:
+    """Missing associated documentation comment in .proto file."""
+
+    def Analyze(self, request, context):
+        """Analyze one text
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def AnalyzeStream(self, request_iterator, context):
+        """Analyze a stream of texts; responses arrive as they finish, matched by id
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def BatchAnalyze(self, request, context):
+        """Analyze several texts; empty texts are skipped
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_SentimentServiceServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'Analyze': grpc.unary_unary_rpc_method_handler(
+                    servicer.Analyze,
+                    request_deserializer=api_dot_proto_dot_sentiment__pb2.AnalyzeRequest.FromString,
+                    response_serializer=api_dot_proto_dot_sentiment__pb2.AnalyzeResponse.SerializeToString,
+            ),
+            'AnalyzeStream': grpc.stream_stream_rpc_method_handler(
+                    servicer.AnalyzeStream,
+                    request_deserializer=api_dot_proto_dot_sentiment__pb2.AnalyzeRequest.FromString,
+                    response_serializer=api_dot_proto_dot_sentiment__pb2.AnalyzeResponse.SerializeToString,
+            ),
+            'BatchAnalyze': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchAnalyze,
+                    request_deserializer=api_dot_proto_dot_sentiment__pb2.BatchAnalyzeRequest.FromString,
+                    response_serializer=api_dot_proto_dot_sentiment__pb2.BatchAnalyzeResponse.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'sentiment.v1.SentimentService', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('sentiment.v1.SentimentService', rpc_method_handlers)
+
+
+ # This class is part of an EXPERIMENTAL API.
+class SentimentService:
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def Analyze(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/sentiment.v1.SentimentService/Analyze',
+            api_dot_proto_dot_sentiment__pb2.AnalyzeRequest.SerializeToString,
+            api_dot_proto_dot_sentiment__pb2.AnalyzeResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def AnalyzeStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/sentiment.v1.SentimentService/AnalyzeStream',
+            api_dot_proto_dot_sentiment__pb2.AnalyzeRequest.SerializeToString,
+            api_dot_proto_dot_sentiment__pb2.AnalyzeResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def BatchAnalyze(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/sentiment.v1.SentimentService/BatchAnalyze',
+            api_dot_proto_dot_sentiment__pb2.BatchAnalyzeRequest.SerializeToString,
+            api_dot_proto_dot_sentiment__pb2.BatchAnalyzeResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,241 @@
+"""
+Rate limiting for inference endpoints
+
+Each client (API key, or IP address without one) has a token bucket.
+Requests pay for the text they send: every text costs one unit per
+RATE_LIMIT_TOKENS_PER_UNIT estimated tokens, so a 100-text batch drains
+the bucket like 100 single requests. A per-worker cap on concurrent
+inference requests protects the model from bursts across all clients.
+"""
+
+import asyncio
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+import logging
+
+from fastapi import HTTPException, Request
+
+from utils.metrics import RATE_LIMITED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Rough characters per model token, good enough for pricing a request
+CHARS_PER_TOKEN = 4
+
+
+def estimate_cost(texts: List[str], tokens_per_unit: int = 128) -> int:
+    """
+    Cost of a request in rate-limit units
+    
+    Args:
+        texts: Texts in the request
+        tokens_per_unit: Estimated tokens covered by one unit
+    
+    Returns:
+        At least one unit per text
+    """
+    return sum(
+        max(1, math.ceil(len(text) / CHARS_PER_TOKEN / tokens_per_unit))
+        for text in texts
+    )
+
+
+class InMemoryBucketStore:
+    """Token buckets held in this process, least recently used ones dropped first"""
+    
+    def __init__(self, max_keys: int = 100_000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    async def consume(self, key: str, cost: float, capacity: float, refill_per_s: float) -> Tuple[bool, float]:
+        """
+        Take `cost` tokens from a bucket
+        
+        Returns:
+            (allowed, seconds until the request would be allowed)
+        """
+        now = self._clock()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_s)
+            if tokens >= cost:
+                tokens -= cost
+                retry_after = 0.0
+            else:
+                retry_after = (cost - tokens) / refill_per_s
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after == 0.0, retry_after
+
+
+# Atomic refill-and-take, timed by the Redis server so workers share a clock
+_REDIS_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retry = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry)
+"""
+
+
+class RedisBucketStore:
+    """Token buckets shared by all workers through Redis (needs the `redis` package)"""
+    
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis.asyncio as redis
+        
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_TOKEN_BUCKET)
+    
+    async def consume(self, key: str, cost: float, capacity: float, refill_per_s: float) -> Tuple[bool, float]:
+        retry_after = float(await self._script(keys=[self.prefix + key], args=[capacity, refill_per_s, cost]))
+        return retry_after == 0.0, retry_after
+
+
+class InferenceSlot:
+    """A place among the concurrent inference requests, released once"""
+    
+    __slots__ = ("_limiter", "_released")
+    
+    def __init__(self, limiter: Optional["RateLimiter"]):
+        self._limiter = limiter
+        self._released = limiter is None
+    
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter._in_flight -= 1
+
+
+class RateLimiter:
+    """Per-client token buckets plus a concurrency cap on inference"""
+    
+    def __init__(
+        self,
+        store=None,
+        enabled: bool = True,
+        per_minute: float = 60,
+        burst: Optional[float] = None,
+        tokens_per_unit: int = 128,
+        max_concurrent_inference: int = 0
+    ):
+        """
+        Initialize the limiter
+        
+        Args:
+            store: Bucket store (in-memory when omitted)
+            enabled: Apply the per-client token buckets
+            per_minute: Units refilled per minute per client
+            burst: Bucket size (defaults to per_minute)
+            tokens_per_unit: Estimated text tokens covered by one unit
+            max_concurrent_inference: Inference requests in flight in this
+                worker, 0 for no limit
+        """
+        self.store = store if store is not None else InMemoryBucketStore()
+        self.enabled = enabled
+        self.per_minute = per_minute
+        self.capacity = burst or per_minute
+        self.tokens_per_unit = tokens_per_unit
+        self.max_concurrent_inference = max_concurrent_inference
+        self._in_flight = 0
+    
+    @staticmethod
+    def client_key(request: Request) -> str:
+        """Bucket key: a hash of the API key if one is sent, else the client IP"""
+        api_key = request.headers.get("x-api-key")
+        if api_key:
+            return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:32]
+        return "ip:" + (request.client.host if request.client else "unknown")
+    
+    async def acquire(self, request: Request, texts: List[str]) -> InferenceSlot:
+        """
+        Admit an inference request or reject it with 429
+        
+        The concurrency check runs first so rejected requests are not
+        charged. A request costing more than the bucket size is charged
+        the full bucket.
+        
+        Raises:
+            HTTPException: 429 with a Retry-After header
+        """
+        slot = InferenceSlot(None)
+        if self.max_concurrent_inference:
+            if self._in_flight >= self.max_concurrent_inference:
+                RATE_LIMITED_REQUESTS.labels("concurrency").inc()
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many concurrent inference requests",
+                    headers={"Retry-After": "1"}
+                )
+            self._in_flight += 1
+            slot = InferenceSlot(self)
+        
+        if not self.enabled:
+            return slot
+        
+        cost = min(estimate_cost(texts, self.tokens_per_unit), self.capacity)
+        try:
+            allowed, retry_after = await self.store.consume(
+                self.client_key(request), cost, self.capacity, self.per_minute / 60
+            )
+        except asyncio.CancelledError:
+            slot.release()
+            raise
+        except Exception as e:
+            # A broken shared store should not take the API down with it
+            logger.warning(f"Rate limit store unavailable, allowing request: {str(e)}")
+            return slot
+        
+        if not allowed:
+            slot.release()
+            RATE_LIMITED_REQUESTS.labels("rate").inc()
+            raise HTTPException(
+                status_code=429,
+                detail="Rate limit exceeded",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+        return slot
+    
+    @property
+    def in_flight(self) -> int:
+        """Inference requests currently admitted"""
+        return self._in_flight
+
+
+def create_rate_limiter(settings) -> RateLimiter:
+    """Build the limiter from the RATE_LIMIT_* settings"""
+    store = None
+    if settings.RATE_LIMIT_ENABLED and settings.RATE_LIMIT_REDIS_URL:
+        try:
+            store = RedisBucketStore(settings.RATE_LIMIT_REDIS_URL)
+        except ImportError:
+            logger.warning("RATE_LIMIT_REDIS_URL is set but `redis` is not installed; limiting per worker")
+    return RateLimiter(
+        store=store,
+        enabled=settings.RATE_LIMIT_ENABLED,
+        per_minute=settings.RATE_LIMIT_PER_MINUTE,
+        burst=settings.RATE_LIMIT_BURST,
+        tokens_per_unit=settings.RATE_LIMIT_TOKENS_PER_UNIT,
+        max_concurrent_inference=settings.RATE_LIMIT_MAX_CONCURRENT_INFERENCE
+    )
@@ -0,0 +1,211 @@
+"""
+Fast JSON responses for payloads the API builds itself, and the compact
+columnar batch formats
+
+Compact responses carry parallel arrays instead of one object per text:
+a label dictionary, a label index per result and float32 scores, without
+echoing the input texts. They are chosen with the `format` query
+parameter or the Accept header:
+    
+    format=compact  application/vnd.sentiment.compact+json
+    format=msgpack  application/msgpack (needs `msgpack`)
+    format=arrow    application/vnd.apache.arrow.stream (needs `pyarrow`)
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+JSON = "application/json"
+COMPACT_JSON = "application/vnd.sentiment.compact+json"
+MSGPACK = "application/msgpack"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+# format query value -> media type
+FORMATS = {"full": JSON, "compact": COMPACT_JSON, "msgpack": MSGPACK, "arrow": ARROW_STREAM}
+MEDIA_TYPE_ALIASES = {"application/x-msgpack": MSGPACK}
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson
+    
+    The app's default response class. Routes also return it directly for
+    results assembled from the model's own output, which skips
+    response_model validation and encoding; the response_model is still
+    used for the OpenAPI schema.
+    """
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def batch_payload(
+    scored: List[Tuple[str, str, float]],
+    processing_time_ms: float,
+    timestamp: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Body of a BatchAnalysisResult
+    
+    Args:
+        scored: (text, label, score) per result
+        processing_time_ms: Time spent on the batch
+        timestamp: Analysis time shared by every result (defaults to now)
+    
+    Returns:
+        Dictionary matching the BatchAnalysisResult schema
+    """
+    stamp = (timestamp or datetime.utcnow()).isoformat()
+    return {
+        "total_analyzed": len(scored),
+        "results": [
+            {"text": text, "label": label, "score": score, "timestamp": stamp}
+            for text, label, score in scored
+        ],
+        "processing_time_ms": round(processing_time_ms, 2)
+    }
+
+
+def _available(media_type: str) -> bool:
+    if media_type == MSGPACK:
+        return msgpack is not None
+    if media_type == ARROW_STREAM:
+        return pyarrow is not None
+    return True
+
+
+def negotiate_batch_format(accept: Optional[str], format: Optional[str] = None) -> str:
+    """
+    Pick the batch response media type
+    
+    The `format` parameter wins over the Accept header. In Accept, the
+    highest-q supported type is used; anything else means full JSON.
+    
+    Raises:
+        HTTPException: 406 if the requested format is unknown or its
+            library is not installed
+    """
+    if format is not None:
+        media_type = FORMATS.get(format)
+        if media_type is None:
+            raise HTTPException(
+                status_code=406,
+                detail=f"Unknown format '{format}'. Available formats: {', '.join(FORMATS)}"
+            )
+        if not _available(media_type):
+            raise HTTPException(status_code=406, detail=f"Format '{format}' is not available on this server")
+        return media_type
+    
+    candidates = []
+    for position, part in enumerate((accept or "").split(",")):
+        media_type, _, params = part.strip().partition(";")
+        media_type = MEDIA_TYPE_ALIASES.get(media_type.strip().lower(), media_type.strip().lower())
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0 and media_type in FORMATS.values() and _available(media_type):
+            candidates.append((-q, position, media_type))
+    return min(candidates)[2] if candidates else JSON
+
+
+def compact_columns(scored: List[Tuple[str, str, float]]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Split results into a label dictionary, label indices and float32 scores
+    
+    Label indices are uint8 unless a model has more than 256 labels.
+    """
+    labels = sorted({label for _, label, _ in scored})
+    index = {label: i for i, label in enumerate(labels)}
+    dtype = np.uint8 if len(labels) <= 256 else np.uint16
+    label_ids = np.fromiter((index[label] for _, label, _ in scored), dtype=dtype, count=len(scored))
+    scores = np.fromiter((score for _, _, score in scored), dtype=np.float32, count=len(scored))
+    return labels, label_ids, scores
+
+
+def compact_batch_response(
+    scored: List[Tuple[str, str, float]],
+    processing_time_ms: float,
+    media_type: str,
+    timestamp: Optional[datetime] = None
+) -> Response:
+    """
+    Encode batch results in one of the compact formats
+    
+    JSON and MessagePack bodies hold total_analyzed, labels, label_ids,
+    scores, processing_time_ms and timestamp. In MessagePack, label_ids
+    and scores are raw little-endian buffers described by label_dtype and
+    score_dtype. Arrow
+    streams have a dictionary-encoded `label` and a float32 `score`
+    column, with the other fields in the schema metadata.
+    """
+    labels, label_ids, scores = compact_columns(scored)
+    stamp = (timestamp or datetime.utcnow()).isoformat()
+    processing_time_ms = round(processing_time_ms, 2)
+    
+    if media_type == COMPACT_JSON:
+        body = orjson.dumps({
+            "total_analyzed": len(scored),
+            "labels": labels,
+            "label_ids": label_ids,
+            "scores": scores,
+            "processing_time_ms": processing_time_ms,
+            "timestamp": stamp
+        }, option=orjson.OPT_SERIALIZE_NUMPY)
+    elif media_type == MSGPACK:
+        body = msgpack.packb({
+            "total_analyzed": len(scored),
+            "labels": labels,
+            "label_ids": label_ids.astype(label_ids.dtype.newbyteorder("<")).tobytes(),
+            "label_dtype": label_ids.dtype.newbyteorder("<").str,
+            "scores": scores.astype("<f4").tobytes(),
+            "score_dtype": "<f4",
+            "processing_time_ms": processing_time_ms,
+            "timestamp": stamp
+        })
+    elif media_type == ARROW_STREAM:
+        index_type = pyarrow.from_numpy_dtype(label_ids.dtype)
+        batch = pyarrow.RecordBatch.from_arrays(
+            [
+                pyarrow.DictionaryArray.from_arrays(
+                    pyarrow.array(label_ids, type=index_type),
+                    pyarrow.array(labels, type=pyarrow.string())
+                ),
+                pyarrow.array(scores, type=pyarrow.float32())
+            ],
+            schema=pyarrow.schema(
+                [("label", pyarrow.dictionary(index_type, pyarrow.string())), ("score", pyarrow.float32())],
+                metadata={
+                    "total_analyzed": str(len(scored)),
+                    "processing_time_ms": str(processing_time_ms),
+                    "timestamp": stamp
+                }
+            )
+        )
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        body = sink.getvalue().to_pybytes()
+    else:
+        raise ValueError(f"Not a compact format: {media_type}")
+    
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
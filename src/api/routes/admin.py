@@ -0,0 +1,86 @@
+"""
+Admin API routes (require X-Admin-Key)
+"""
+
+from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+import logging
+
+from api.dependencies import get_model_registry
+from api.schemas import ModelSwapRequest
+from api.security import require_admin_key
+from api.tracing import TracedRoute
+from models.registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=TracedRoute, dependencies=[Depends(require_admin_key)])
+
+
+@router.post(
+    "/models/{name}/swap",
+    summary="Hot-swap a model",
+    description="""
+    Load a new version of a model in the background, warm it up and swap it in
+    without dropping requests. In-flight requests finish on the old version,
+    which is freed afterwards. If the new version fails to load, the current
+    one keeps serving.
+    """
+)
+async def swap_model(
+    name: str,
+    request: ModelSwapRequest,
+    registry: ModelRegistry = Depends(get_model_registry)
+):
+    """
+    Hot-swap a model
+    
+    - **name**: Alias of the model to replace
+    - **model**: Model name or artifact directory of the new version
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        entry = await loop.run_in_executor(None, registry.swap, name, request.model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Model swap failed: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Model swap failed, the previous version is still serving"
+        )
+    
+    return {
+        "status": "swapped",
+        "model": entry.get_info(),
+        "previous_model": registry.get_info()["previous_models"].get(entry.name)
+    }
+
+
+@router.post(
+    "/models/{name}/rollback",
+    summary="Roll back a model",
+    description="Swap a model back to the version it had before the last swap"
+)
+async def rollback_model(name: str, registry: ModelRegistry = Depends(get_model_registry)):
+    """
+    Roll back a model to its previous version
+    
+    - **name**: Alias of the model to roll back
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        entry = await loop.run_in_executor(None, registry.rollback, name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Model rollback failed: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Model rollback failed, the current version is still serving"
+        )
+    
+    return {
+        "status": "rolled_back",
+        "model": entry.get_info()
+    }
@@ -0,0 +1,159 @@
+"""
+Profiling API routes (require PROFILING_ENABLED and X-Admin-Key)
+"""
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import PlainTextResponse
+import asyncio
+import cProfile
+import logging
+
+from api.config import settings
+from api.dependencies import get_model_registry
+from api.schemas import InferenceProfileRequest
+from api.security import require_admin_key, require_profiling_enabled
+from models.registry import ModelRegistry
+from utils.profiling import (
+    MemoryTracker,
+    format_collapsed,
+    format_pstats,
+    profile_inference,
+    sample_stacks
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(dependencies=[Depends(require_profiling_enabled), Depends(require_admin_key)])
+
+# One CPU profile at a time; they would skew each other
+_profile_running = False
+_memory_tracker = MemoryTracker()
+
+
+def _check_duration(seconds: float):
+    if seconds > settings.PROFILING_MAX_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must be at most {settings.PROFILING_MAX_SECONDS}"
+        )
+
+
+@router.get(
+    "/cpu",
+    response_class=PlainTextResponse,
+    summary="Profile the CPU for a few seconds",
+    description="""
+    Sample the stacks of every thread (`mode=sampling`) and return collapsed
+    stacks ready for flamegraph.pl or speedscope, or run cProfile on the event
+    loop thread (`mode=cprofile`) and return the pstats table.
+    """
+)
+async def profile_cpu(
+    seconds: float = Query(10.0, gt=0, description="Profiling duration"),
+    mode: str = Query("sampling", pattern="^(sampling|cprofile)$"),
+    interval_ms: float = Query(5.0, ge=1, le=1000, description="Sampling interval"),
+    include_idle: bool = Query(False, description="Keep samples of idle threads")
+):
+    """
+    Profile the running service
+    
+    - **seconds**: How long to profile
+    - **mode**: 'sampling' (all threads) or 'cprofile' (event loop thread)
+    """
+    global _profile_running
+    _check_duration(seconds)
+    if _profile_running:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    _profile_running = True
+    try:
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.disable()
+            return PlainTextResponse(format_pstats(profiler))
+        
+        loop = asyncio.get_running_loop()
+        counts = await loop.run_in_executor(
+            None, sample_stacks, seconds, interval_ms, include_idle
+        )
+        return PlainTextResponse(format_collapsed(counts))
+    finally:
+        _profile_running = False
+
+
+@router.post(
+    "/torch",
+    summary="Profile inference with torch.profiler",
+    description="""
+    Run one batch under torch.profiler on the model's inference thread and
+    return a Chrome trace (open it in chrome://tracing or Perfetto).
+    """
+)
+async def profile_torch(
+    request: InferenceProfileRequest,
+    registry: ModelRegistry = Depends(get_model_registry)
+):
+    """
+    Capture a torch.profiler trace of inference
+    
+    - **texts**: Texts to analyze (default: synthetic batch)
+    - **batch_size** / **seq_length**: Shape of the synthetic batch
+    - **repeat**: Number of runs captured
+    - **model**: Model to profile (optional)
+    """
+    texts = request.texts or [" ".join(["good"] * request.seq_length)] * request.batch_size
+    try:
+        async with registry.use(request.model) as entry:
+            return await entry.batcher.run_in_worker(
+                profile_inference, entry.analyzer, texts, request.repeat
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"torch.profiler capture failed: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Profiling failed")
+
+
+@router.post(
+    "/memory/start",
+    summary="Start tracing memory allocations",
+    description="Start tracemalloc and take the baseline snapshot for `/memory/diff`"
+)
+async def start_memory_tracing(frames: int = Query(10, ge=1, le=100)):
+    """Start tracemalloc with a new baseline"""
+    _memory_tracker.start(frames)
+    return {"status": "tracing", "frames": frames}
+
+
+@router.get(
+    "/memory/diff",
+    summary="Compare allocations with the baseline",
+    description="List the allocation sites that grew the most since the baseline snapshot"
+)
+async def memory_diff(
+    limit: int = Query(20, ge=1, le=200),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    reset: bool = Query(False, description="Make this snapshot the new baseline")
+):
+    """Diff the current tracemalloc snapshot against the baseline"""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            None, lambda: _memory_tracker.diff(limit=limit, group_by=group_by, reset=reset)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post(
+    "/memory/stop",
+    summary="Stop tracing memory allocations"
+)
+async def stop_memory_tracing():
+    """Stop tracemalloc"""
+    _memory_tracker.stop()
+    return {"status": "stopped"}
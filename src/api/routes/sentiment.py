@@ -3,9 +3,11 @@ Sentiment analysis API routes
 """
 
 from fastapi import APIRouter, HTTPException, Request, Depends, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional, List
+import asyncio
 import time
 import logging
 
@@ -20,13 +22,65 @@ from api.schemas import (
     StatsResponse,
     AnalysisHistoryResponse,
     AnalysisHistoryItem,
-    DateRangeStats
+    DateRangeStats,
+    DriftResponse
 )
-from database.database import get_db
+from api.config import settings
+from api.dependencies import get_model_registry
+from api.deadlines import ClientDisconnected, cancel_on_disconnect, request_deadline
+from api.ingest import BATCH_REQUEST_BODY, read_batch_request
+from api.responses import (
+    ARROW_STREAM,
+    COMPACT_JSON,
+    JSON,
+    MSGPACK,
+    ORJSONResponse,
+    batch_payload,
+    compact_batch_response,
+    negotiate_batch_format
+)
+from api.tracing import TracedRoute
+from database.database import get_db, get_read_db, read_session
+from models.batcher import BULK, INTERACTIVE, DeadlineExceeded
+from models.registry import ModelRegistry
+from utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
+
+
+def default_analyzer(registry: ModelRegistry = Depends(get_model_registry)):
+    """Analyzer of the default model, which the registry keeps loaded"""
+    return registry.get().analyzer
+
+
+async def restore_stored_results(db: Session, entry, texts: List[str]):
+    """
+    Load results stored in the history into a model's in-memory cache
+    
+    With RESULT_CACHE_PERSISTENT, texts the model scored before (even
+    before a restart) are then answered by the batcher's cache instead
+    of the model. Only top-label results are stored, so this applies to
+    requests without return_all_scores. The query runs on a worker
+    thread so it does not hold up the event loop the batcher runs on.
+    """
+    if not settings.RESULT_CACHE_PERSISTENT or entry.cache is None:
+        return
+    missing = [text for text in texts if (text, False) not in entry.cache]
+    if not missing:
+        return
+    try:
+        from database import crud
+        loop = asyncio.get_running_loop()
+        stored = await loop.run_in_executor(
+            None, crud.get_stored_results, db, missing, entry.analyzer.model_name
+        )
+    except Exception as e:
+        logger.warning(f"Failed to look up stored results: {str(e)}")
+        return
+    for text, (label, score) in stored.items():
+        entry.cache.put((text, False), {"text": text, "label": label, "score": score})
 
 
 @router.post(
@@ -48,34 +102,56 @@ router = APIRouter()
             "description": "Invalid input",
             "model": ErrorResponse
         },
+        429: {
+            "description": "Rate limit exceeded (see Retry-After)",
+            "model": ErrorResponse
+        },
         500: {
             "description": "Server error",
             "model": ErrorResponse
+        },
+        504: {
+            "description": "Deadline exceeded before the text was scored",
+            "model": ErrorResponse
         }
     }
 )
+@traced("analyze_sentiment")
 async def analyze_sentiment(
     request: TextAnalysisRequest,
     req: Request,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    registry: ModelRegistry = Depends(get_model_registry)
 ):
     """
     Analyze sentiment of a single text
     
     - **text**: Text to analyze (1-5000 characters)
     - **return_all_scores**: Return scores for all labels (optional, default: false)
+    - **model**: Model to use (optional, see `/models`)
+    - **priority**: Scheduling class (optional, default: interactive)
+    - **timeout_ms**: Deadline (optional, or the X-Request-Timeout-Ms header)
     """
+    # Over-limit requests get a 429 before any work is done
+    slot = await req.app.state.rate_limiter.acquire(req, [request.text])
     try:
-        analyzer = req.app.state.analyzer
-        
+        deadline = request_deadline(req, request.timeout_ms)
         # Start timing
         start_time = time.time()
         
-        # Perform analysis
-        result = analyzer.analyze(
-            text=request.text,
-            return_all_scores=request.return_all_scores
-        )
+        # Perform analysis (micro-batched with concurrent requests)
+        async with registry.use(request.model) as entry:
+            analyzer = entry.analyzer
+            if not request.return_all_scores:
+                await restore_stored_results(db, entry, [request.text])
+            # Queued work is dropped if the client goes away
+            result = await cancel_on_disconnect(req, entry.batcher.submit(
+                request.text,
+                return_all_scores=request.return_all_scores,
+                priority=request.priority or INTERACTIVE,
+                deadline=deadline
+            ))
+        slot.release()
         
         # Calculate processing time
         processing_time = (time.time() - start_time) * 1000
@@ -111,12 +187,20 @@ async def analyze_sentiment(
                 timestamp=datetime.utcnow()
             )
             
+    except DeadlineExceeded as e:
+        logger.info(f"Request deadline exceeded: {str(e)}")
+        raise HTTPException(status_code=504, detail="Deadline exceeded")
+    except ClientDisconnected:
+        logger.info("Client disconnected, inference cancelled")
+        raise HTTPException(status_code=499, detail="Client closed request")
     except ValueError as e:
         logger.warning(f"Validation error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in sentiment analysis: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Error processing request")
+    finally:
+        slot.release()
 
 
 @router.post(
@@ -127,111 +211,139 @@ async def analyze_sentiment(
     Analyze the sentiment of multiple texts in a single request.
     
     Supports up to 100 texts per request for efficient batch processing.
+    
+    The body can be JSON, MessagePack (`application/msgpack`) or an Arrow
+    IPC stream (`application/vnd.apache.arrow.stream`) with a `texts`
+    column. Clients that do not need the texts echoed back can ask for a
+    compact columnar body with `?format=compact|msgpack|arrow` or the
+    Accept header.
     """,
+    openapi_extra={"requestBody": BATCH_REQUEST_BODY},
     responses={
         200: {
             "description": "Successful batch analysis",
-            "model": BatchAnalysisResult
+            "model": BatchAnalysisResult,
+            "content": {
+                COMPACT_JSON: {},
+                MSGPACK: {},
+                ARROW_STREAM: {}
+            }
         },
         400: {
             "description": "Invalid input",
             "model": ErrorResponse
         },
+        406: {
+            "description": "Requested response format is not available",
+            "model": ErrorResponse
+        },
+        415: {
+            "description": "Unsupported request body format",
+            "model": ErrorResponse
+        },
+        429: {
+            "description": "Rate limit exceeded (see Retry-After)",
+            "model": ErrorResponse
+        },
         500: {
             "description": "Server error",
             "model": ErrorResponse
+        },
+        504: {
+            "description": "Deadline exceeded before the text was scored",
+            "model": ErrorResponse
         }
     }
 )
+@traced("batch_analyze_sentiment")
 async def batch_analyze_sentiment(
-    request: BatchAnalysisRequest,
     req: Request,
-    db: Session = Depends(get_db)
+    request: BatchAnalysisRequest = Depends(read_batch_request),
+    format: Optional[str] = Query(None, description="Response format: full, compact, msgpack or arrow"),
+    db: Session = Depends(get_db),
+    registry: ModelRegistry = Depends(get_model_registry)
 ):
     """
     Analyze sentiment of multiple texts
     
     - **texts**: List of texts to analyze (1-100 texts)
     - **return_all_scores**: Return scores for all labels (optional, default: false)
+    - **model**: Model to use (optional, see `/models`)
+    - **priority**: Scheduling class (optional, default: bulk)
+    - **timeout_ms**: Deadline (optional, or the X-Request-Timeout-Ms header)
+    - **format**: Response format (query, optional, default: full JSON or per Accept)
     """
+    # Rejected before any work is charged or done
+    media_type = negotiate_batch_format(req.headers.get("accept"), format)
+    
+    # Batches are charged per text, so they drain the bucket like many requests
+    slot = await req.app.state.rate_limiter.acquire(req, request.texts)
     try:
-        analyzer = req.app.state.analyzer
-        
+        deadline = request_deadline(req, request.timeout_ms)
         # Start timing
         start_time = time.time()
         
         # Perform batch analysis
-        results = analyzer.analyze_batch(
-            texts=request.texts,
-            batch_size=8,
-            return_all_scores=request.return_all_scores
-        )
+        async with registry.use(request.model) as entry:
+            analyzer = entry.analyzer
+            if not request.return_all_scores:
+                await restore_stored_results(db, entry, request.texts)
+            # Remaining chunks are dropped if the client goes away
+            results = await cancel_on_disconnect(req, entry.batcher.submit_many(
+                request.texts,
+                return_all_scores=request.return_all_scores,
+                priority=request.priority or BULK,
+                deadline=deadline
+            ))
+        slot.release()
         
         # Calculate processing time
         processing_time = (time.time() - start_time) * 1000  # Convert to ms
         avg_time_per_text = processing_time / len(results) if results else 0
         
+        # (text, label, score) per result; with all scores, the top prediction
+        scored = []
+        for result in results:
+            if request.return_all_scores:
+                top_pred = max(result["predictions"], key=lambda x: x["score"])
+                scored.append((result["text"], top_pred["label"], top_pred["score"]))
+            else:
+                scored.append((result["text"], result["label"], result["score"]))
+        
         # Save to database
         try:
             from database import crud
-            for result in results:
-                if request.return_all_scores:
-                    top_pred = max(result["predictions"], key=lambda x: x["score"])
-                    label = top_pred["label"]
-                    score = top_pred["score"]
-                else:
-                    label = result["label"]
-                    score = result["score"]
-                
-                crud.create_analysis(
-                    db=db,
-                    text=result["text"],
-                    label=label,
-                    score=score,
-                    processing_time_ms=avg_time_per_text,
-                    model_name=analyzer.model_name,
-                    is_batch=True
-                )
+            crud.create_analyses_bulk(
+                db=db,
+                results=scored,
+                processing_time_ms=avg_time_per_text,
+                model_name=analyzer.model_name,
+                is_batch=True
+            )
         except Exception as db_error:
             logger.warning(f"Failed to save batch to database: {str(db_error)}")
             # Continue anyway
         
-        # Format results
-        formatted_results = []
-        for result in results:
-            if request.return_all_scores:
-                # For now, just use the top prediction
-                top_pred = max(result["predictions"], key=lambda x: x["score"])
-                formatted_results.append(
-                    SentimentResult(
-                        text=result["text"],
-                        label=top_pred["label"],
-                        score=top_pred["score"],
-                        timestamp=datetime.utcnow()
-                    )
-                )
-            else:
-                formatted_results.append(
-                    SentimentResult(
-                        text=result["text"],
-                        label=result["label"],
-                        score=result["score"],
-                        timestamp=datetime.utcnow()
-                    )
-                )
-        
-        return BatchAnalysisResult(
-            total_analyzed=len(formatted_results),
-            results=formatted_results,
-            processing_time_ms=round(processing_time, 2)
-        )
+        if media_type != JSON:
+            return compact_batch_response(scored, processing_time, media_type)
+        
+        # Built from our own results, so it skips response_model revalidation
+        return ORJSONResponse(batch_payload(scored, processing_time), headers={"Vary": "Accept"})
         
+    except DeadlineExceeded as e:
+        logger.info(f"Request deadline exceeded: {str(e)}")
+        raise HTTPException(status_code=504, detail="Deadline exceeded")
+    except ClientDisconnected:
+        logger.info("Client disconnected, inference cancelled")
+        raise HTTPException(status_code=499, detail="Client closed request")
     except ValueError as e:
         logger.warning(f"Validation error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in batch analysis: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Error processing batch request")
+    finally:
+        slot.release()
 
 
 @router.get(
@@ -240,15 +352,14 @@ async def batch_analyze_sentiment(
     summary="Health check endpoint",
     description="Check the health status of the API and model availability"
 )
-async def health_check(req: Request):
+async def health_check(registry: ModelRegistry = Depends(get_model_registry)):
     """
     Health check endpoint
     
     Returns the status of the API and model information
     """
     try:
-        analyzer = req.app.state.analyzer
-        model_info = analyzer.get_model_info()
+        model_info = default_analyzer(registry).get_model_info()
         
         return HealthResponse(
             status="healthy",
@@ -271,15 +382,14 @@ async def health_check(req: Request):
     summary="Get model information",
     description="Get detailed information about the loaded sentiment analysis model"
 )
-async def get_model_info(req: Request):
+async def get_model_info(registry: ModelRegistry = Depends(get_model_registry)):
     """
     Get model information
     
     Returns detailed information about the sentiment analysis model
     """
     try:
-        analyzer = req.app.state.analyzer
-        info = analyzer.get_model_info()
+        info = default_analyzer(registry).get_model_info()
         
         return {
             "model": info,
@@ -299,6 +409,54 @@ async def get_model_info(req: Request):
         raise HTTPException(status_code=500, detail="Error retrieving model information")
 
 
+@router.get(
+    "/models",
+    summary="List available models",
+    description="List the models this API can serve and which of them are loaded"
+)
+async def list_models(registry: ModelRegistry = Depends(get_model_registry)):
+    """
+    List available and loaded models
+    
+    Models load on first use and idle ones are unloaded when the
+    memory budget is exceeded.
+    """
+    try:
+        return registry.get_info()
+    except Exception as e:
+        logger.error(f"Error listing models: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error retrieving models")
+
+
+@router.get(
+    "/memory",
+    summary="Get process memory usage",
+    description="Get RSS, PSS and shared/private memory of this worker process"
+)
+async def get_memory(registry: ModelRegistry = Depends(get_model_registry)):
+    """
+    Get memory usage of this worker
+    
+    PSS divides pages shared between workers (such as memory-mapped
+    model weights) by the number of processes mapping them.
+    """
+    try:
+        from utils.memory_optimization import get_memory_usage
+        
+        info = default_analyzer(registry).get_model_info()
+        
+        return {
+            "process": get_memory_usage(),
+            "model": {
+                "mmap_weights": info["mmap_weights"],
+                "weights_mb": info["weights_mb"]
+            }
+        }
+    except Exception as e:
+        logger.error(f"Error getting memory usage: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error retrieving memory usage")
+
+
 @router.get(
     "/history",
     response_model=AnalysisHistoryResponse,
@@ -306,11 +464,12 @@ async def get_model_info(req: Request):
     description="Retrieve history of sentiment analyses with pagination and filtering"
 )
 async def get_history(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     page: int = Query(1, ge=1, description="Page number (starts at 1)"),
     page_size: int = Query(20, ge=1, le=100, description="Items per page (max 100)"),
     label: Optional[str] = Query(None, description="Filter by label (POSITIVE/NEGATIVE)"),
-    min_score: Optional[float] = Query(None, ge=0, le=1, description="Filter by minimum score")
+    min_score: Optional[float] = Query(None, ge=0, le=1, description="Filter by minimum score"),
+    model_name: Optional[str] = Query(None, description="Filter by the model that produced the analysis")
 ):
     """
     Get paginated history of analyses
@@ -319,6 +478,7 @@ async def get_history(
     - **page_size**: Number of items per page (max 100)
     - **label**: Filter by sentiment label (optional)
     - **min_score**: Filter by minimum confidence score (optional)
+    - **model_name**: Filter by model name (optional)
     """
     try:
         from database import crud
@@ -332,7 +492,8 @@ async def get_history(
             skip=skip,
             limit=page_size,
             label=label,
-            min_score=min_score
+            min_score=min_score,
+            model_name=model_name
         )
         
         # Get total count
@@ -356,6 +517,55 @@ async def get_history(
         raise HTTPException(status_code=500, detail="Error retrieving history")
 
 
+@router.get(
+    "/history/export",
+    summary="Export analysis history",
+    description="Stream the whole filtered history as CSV, NDJSON or Parquet",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"text/csv": {}, "application/x-ndjson": {}, "application/vnd.apache.parquet": {}}},
+        406: {"description": "Format not available on this server", "model": ErrorResponse}
+    }
+)
+async def export_history(
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$", description="csv, ndjson or parquet"),
+    label: Optional[str] = Query(None, description="Filter by label (POSITIVE/NEGATIVE)"),
+    min_score: Optional[float] = Query(None, ge=0, le=1, description="Filter by minimum score"),
+    model_name: Optional[str] = Query(None, description="Filter by the model that produced the analysis")
+):
+    """
+    Export analysis history
+    
+    Streams every matching analysis, oldest first, straight from a
+    database cursor; memory use stays constant however many rows are
+    exported. The stream opens and closes its own read session: one from
+    a dependency may be closed before the response body is sent. Parquet
+    needs `pyarrow` on the server.
+    
+    - **format**: Output format (default: csv)
+    - **label**: Filter by sentiment label (optional)
+    - **min_score**: Filter by minimum confidence score (optional)
+    - **model_name**: Filter by model name (optional)
+    """
+    from database import export
+    
+    if format not in export.available_formats():
+        raise HTTPException(status_code=406, detail=f"Format '{format}' is not available on this server")
+    
+    def stream():
+        db = read_session()
+        try:
+            yield from export.stream_export(db, format, label=label, min_score=min_score, model_name=model_name)
+        finally:
+            db.close()
+    
+    return StreamingResponse(
+        stream(),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="analyses.{format}"'}
+    )
+
+
 @router.get(
     "/stats",
     response_model=StatsResponse,
@@ -363,7 +573,7 @@ async def get_history(
     description="Get aggregated statistics about sentiment analyses"
 )
 async def get_stats(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     days: Optional[int] = Query(None, ge=1, le=365, description="Limit stats to last N days")
 ):
     """
@@ -388,38 +598,108 @@ async def get_stats(
         raise HTTPException(status_code=500, detail="Error retrieving statistics")
 
 
+# Most buckets a single timeline may return (a week of minutes)
+MAX_TIMELINE_BUCKETS = 7 * 24 * 60
+
+
 @router.get(
     "/stats/timeline",
     response_model=DateRangeStats,
     summary="Get timeline statistics",
-    description="Get count of analyses per day for a date range"
+    description="Get count of analyses per minute, hour or day for a time range"
 )
 async def get_timeline_stats(
-    db: Session = Depends(get_db),
-    days: int = Query(7, ge=1, le=90, description="Number of days to include")
+    db: Session = Depends(get_read_db),
+    days: int = Query(7, ge=1, le=90, description="Number of days to include"),
+    hours: Optional[int] = Query(None, ge=1, le=90 * 24, description="Number of hours to include, instead of days"),
+    granularity: str = Query("day", pattern="^(minute|hour|day)$", description="Bucket size: minute, hour or day"),
+    label: Optional[str] = Query(None, description="Only count this label (POSITIVE/NEGATIVE)")
 ):
     """
     Get timeline of analyses
     
-    Returns count of analyses for each day in the specified range
+    Returns count of analyses for each bucket in the specified range,
+    read from rollups maintained on write
     
     - **days**: Number of days to look back (default: 7, max: 90)
+    - **hours**: Number of hours to look back, overrides days (optional)
+    - **granularity**: Bucket size (default: day)
+    - **label**: Only count this label (optional)
     """
     try:
         from database import crud
         
-        data = crud.get_analyses_by_date_range(db=db, days=days)
+        end = datetime.utcnow()
+        span = timedelta(hours=hours) if hours else timedelta(days=days)
+        if span / crud.BUCKET_STEPS[granularity] > MAX_TIMELINE_BUCKETS:
+            raise ValueError(f"Range too long for {granularity} buckets (at most {MAX_TIMELINE_BUCKETS} buckets)")
+        
+        data = crud.get_timeline(db=db, granularity=granularity, start=end - span, end=end, label=label)
         
         return DateRangeStats(
             dates=data,
-            total=sum(data.values())
+            total=sum(data.values()),
+            granularity=granularity,
+            label=label
         )
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting timeline stats: {str(e)}")
         raise HTTPException(status_code=500, detail="Error retrieving timeline")
 
 
+@router.get(
+    "/stats/drift",
+    response_model=DriftResponse,
+    summary="Get score drift statistics",
+    description="Compare label mix and confidence score distributions of a recent window with a baseline window"
+)
+async def get_drift_stats(
+    db: Session = Depends(get_read_db),
+    hours: int = Query(24, ge=1, le=90 * 24, description="Length of the current window in hours"),
+    baseline_hours: int = Query(7 * 24, ge=1, le=90 * 24, description="Length of the baseline window, just before it"),
+    model_name: Optional[str] = Query(None, description="Only compare analyses of this model"),
+    low_confidence: float = Query(0.6, ge=0, le=1, description="Scores below this count as low confidence")
+):
+    """
+    Get drift of the label mix and confidence scores
+    
+    The current window is the last `hours` hours (including the current
+    one) and the baseline the `baseline_hours` hours before it. Both are
+    read from score histograms maintained on write, with scores resolved
+    to 0.01.
+    
+    - **hours**: Current window length (default: 24)
+    - **baseline_hours**: Baseline window length (default: 168)
+    - **model_name**: Only compare this model's analyses (optional)
+    - **low_confidence**: Low-confidence threshold (default: 0.6)
+    """
+    try:
+        from database import crud
+        from utils import drift
+        
+        end = crud.bucket_start(datetime.utcnow(), "hour") + timedelta(hours=1)
+        split = end - timedelta(hours=hours)
+        start = split - timedelta(hours=baseline_hours)
+        
+        current = crud.get_score_histograms(db, split, end, model_name=model_name)
+        baseline = crud.get_score_histograms(db, start, split, model_name=model_name)
+        
+        return DriftResponse(
+            current={"start": split, "end": end, **drift.describe(current, low_confidence)},
+            baseline={"start": start, "end": split, **drift.describe(baseline, low_confidence)},
+            **drift.compare_windows(current, baseline, low_confidence),
+            low_confidence_threshold=low_confidence,
+            model_name=model_name
+        )
+    
+    except Exception as e:
+        logger.error(f"Error getting drift stats: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error retrieving drift statistics")
+
+
 @router.get(
     "/search",
     response_model=List[AnalysisHistoryItem],
@@ -427,7 +707,7 @@ async def get_timeline_stats(
     description="Search through analysis history by text content"
 )
 async def search_analyses(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     q: str = Query(..., min_length=1, description="Search query"),
     limit: int = Query(50, ge=1, le=100, description="Maximum number of results")
 ):
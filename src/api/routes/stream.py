@@ -0,0 +1,222 @@
+"""
+WebSocket streaming sentiment analysis
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional, Union
+
+import orjson
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+
+from api.config import settings
+from api.dependencies import get_model_registry
+from api.ingest import decode_arrow_messages
+from api.responses import msgpack
+from api.schemas import StreamAnalysisMessage
+from models.batcher import INTERACTIVE, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Subprotocol under which binary frames are Arrow IPC streams instead of MessagePack
+ARROW_SUBPROTOCOL = "arrow"
+
+
+def _error(id: Optional[Union[str, int]], code: int, detail: Any, **fields) -> Dict[str, Any]:
+    """Error reply; codes follow the HTTP status the REST routes would use"""
+    return {"type": "error", "id": id, "code": code, "detail": detail, **fields}
+
+
+def _message_id(data: Any) -> Optional[Union[str, int]]:
+    """ID of a message that failed validation (JSON text, or decoded MessagePack or Arrow), if it has one"""
+    if isinstance(data, str):
+        try:
+            data = orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return None
+    return data.get("id") if isinstance(data, dict) else None
+
+
+def _encode(reply: Dict[str, Any], binary: bool) -> Union[str, bytes]:
+    """A reply as a JSON text frame, or a MessagePack binary frame"""
+    if binary:
+        return msgpack.packb(reply)
+    return orjson.dumps(reply).decode()
+
+
+@router.websocket("/ws/analyze")
+async def analyze_stream(websocket: WebSocket, model: Optional[str] = None, priority: Optional[str] = None):
+    """
+    Analyze a stream of texts over one connection
+    
+    Clients send JSON messages `{"id": ..., "text": ...}` (optionally
+    `return_all_scores` and `timeout_ms`) and receive `{"type": "result",
+    "id": ...}` or `{"type": "error", "id": ..., "code": ...}` replies as
+    each text is scored, in completion order. Messages sent as binary
+    frames are MessagePack (needs `msgpack`) and are answered in
+    MessagePack binary frames. Clients connecting with the `arrow`
+    subprotocol send binary frames as Arrow IPC streams instead (needs
+    `pyarrow`), one message per row, and get JSON replies. The first
+    message from the server is `{"type": "hello", "max_outstanding": ...}`,
+    as JSON.
+    
+    At most WS_MAX_OUTSTANDING messages per connection are in progress at
+    once, from being read until their reply is sent; beyond that the
+    server stops reading, so fast senders (or clients that do not read
+    their replies) are slowed down by the socket instead of queueing
+    without bound. Every message is charged to the rate limiter
+    like a one-text request. Closing the connection cancels the texts
+    still queued.
+    
+    - **model**: Model for the whole connection (query, optional, see `/models`)
+    - **priority**: Scheduling class (query, optional, default: interactive)
+    """
+    arrow = ARROW_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=ARROW_SUBPROTOCOL if arrow else None)
+    limiter = websocket.app.state.rate_limiter
+    try:
+        registry = get_model_registry(websocket)
+        model = registry.resolve(model)
+    except HTTPException as e:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason=e.detail)
+        return
+    except ValueError as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e)[:120])
+        return
+    
+    max_outstanding = settings.WS_MAX_OUTSTANDING
+    slots = asyncio.Semaphore(max_outstanding)
+    # Each queued reply holds its message's slot until sent, so the outbox is bounded too
+    outbox: asyncio.Queue = asyncio.Queue()
+    tasks = set()
+    
+    async def analyze(message: StreamAnalysisMessage, binary: bool):
+        try:
+            start_time = time.perf_counter()
+            deadline_ms = message.timeout_ms or settings.REQUEST_TIMEOUT_MS
+            slot = await limiter.acquire(websocket, [message.text])
+            try:
+                async with registry.use(model) as entry:
+                    result = await entry.batcher.submit(
+                        message.text,
+                        return_all_scores=message.return_all_scores,
+                        priority=priority or INTERACTIVE,
+                        deadline=start_time + deadline_ms / 1000 if deadline_ms else None
+                    )
+                    model_name = entry.analyzer.model_name
+            finally:
+                slot.release()
+            
+            reply = {"type": "result", "id": message.id, "text": result["text"]}
+            if message.return_all_scores:
+                top_pred = max(result["predictions"], key=lambda x: x["score"])
+                reply.update(label=top_pred["label"], score=top_pred["score"], predictions=result["predictions"])
+            else:
+                reply.update(label=result["label"], score=result["score"])
+            reply.update(
+                model_name=model_name,
+                processing_time_ms=round((time.perf_counter() - start_time) * 1000, 2)
+            )
+        except HTTPException as e:
+            # Rate limited: the client should wait retry_after seconds
+            retry_after = (e.headers or {}).get("Retry-After")
+            reply = _error(message.id, e.status_code, e.detail)
+            if retry_after:
+                reply["retry_after"] = int(retry_after)
+        except DeadlineExceeded:
+            reply = _error(message.id, 504, "Deadline exceeded")
+        except ValueError as e:
+            reply = _error(message.id, 400, str(e))
+        except Exception as e:
+            logger.error(f"Error in streaming analysis: {str(e)}", exc_info=True)
+            reply = _error(message.id, 500, "Error processing message")
+        outbox.put_nowait((reply, binary, True))
+    
+    async def write():
+        # One writer, so replies from concurrent tasks never interleave
+        while True:
+            reply, binary, holds_slot = await outbox.get()
+            if binary:
+                await websocket.send_bytes(_encode(reply, binary))
+            else:
+                await websocket.send_text(_encode(reply, binary))
+            if holds_slot:
+                slots.release()
+    
+    def dispatch(data: Any, binary: bool):
+        """Validate a decoded message and start analyzing it; it holds a slot either way"""
+        try:
+            if isinstance(data, str):
+                message = StreamAnalysisMessage.model_validate_json(data)
+            else:
+                message = StreamAnalysisMessage.model_validate(data)
+        except ValidationError as e:
+            error = _error(_message_id(data), 422, e.errors(include_url=False, include_context=False))
+            outbox.put_nowait((error, binary, True))
+            return
+        task = asyncio.ensure_future(analyze(message, binary))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    
+    async def read():
+        while True:
+            # Flow control: nothing more is read while the connection is at its limit
+            await slots.acquire()
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", status.WS_1000_NORMAL_CLOSURE))
+            if frame.get("text") is not None:
+                dispatch(frame["text"], False)
+            elif arrow:
+                try:
+                    messages = decode_arrow_messages(frame.get("bytes") or b"")
+                except ValueError as e:
+                    outbox.put_nowait((_error(None, 400, f"Invalid Arrow message: {str(e)}"), False, True))
+                    continue
+                if not messages:
+                    slots.release()
+                    continue
+                # Every row is a message and holds a slot of its own
+                for i, data in enumerate(messages):
+                    if i:
+                        await slots.acquire()
+                    dispatch(data, False)
+            else:
+                try:
+                    if msgpack is None:
+                        raise ValueError("MessagePack is not available on this server")
+                    data = msgpack.unpackb(frame.get("bytes") or b"", raw=False)
+                except Exception as e:
+                    error = _error(None, 400, f"Invalid MessagePack message: {str(e)}")
+                    # Answered in MessagePack too, unless it is not installed
+                    outbox.put_nowait((error, msgpack is not None, True))
+                    continue
+                dispatch(data, True)
+    
+    outbox.put_nowait(({"type": "hello", "model": model, "max_outstanding": max_outstanding}, False, False))
+    writer = asyncio.ensure_future(write())
+    reader = asyncio.ensure_future(read())
+    try:
+        await asyncio.wait({reader, writer}, return_when=asyncio.FIRST_COMPLETED)
+        if writer.done():
+            # Replies can no longer be sent, so stop taking messages
+            logger.warning(f"WebSocket writer failed, closing the connection: {writer.exception()!r}")
+            reader.cancel()
+            try:
+                await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+            except Exception:
+                pass
+        else:
+            reader.result()
+    except WebSocketDisconnect:
+        logger.info(f"WebSocket client disconnected, {len(tasks)} messages cancelled")
+    finally:
+        # Queued texts of a closed connection are dropped by the batcher
+        for task in list(tasks):
+            task.cancel()
+        reader.cancel()
+        writer.cancel()
@@ -2,8 +2,8 @@
 Pydantic schemas for API request/response validation
 """
 
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field, validator
+from typing import List, Optional, Dict, Any, Union
+from pydantic import BaseModel, Field, constr, validator
 from datetime import datetime
 
 
@@ -21,6 +21,20 @@ class TextAnalysisRequest(BaseModel):
         default=False,
         description="Return scores for all labels (POSITIVE and NEGATIVE)"
     )
+    model: Optional[str] = Field(
+        default=None,
+        description="Model alias or name to use (see /models); defaults to the default model"
+    )
+    priority: Optional[str] = Field(
+        default=None,
+        description="Scheduling class ('interactive' or 'bulk'); defaults to interactive for this endpoint"
+    )
+    timeout_ms: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=600000,
+        description="Deadline in milliseconds; texts not scored by then are dropped and the request fails with 504"
+    )
     
     @validator('text')
     def text_not_empty(cls, v):
@@ -32,7 +46,8 @@ class TextAnalysisRequest(BaseModel):
 
 class BatchAnalysisRequest(BaseModel):
     """Request schema for batch text analysis"""
-    texts: List[str] = Field(
+    # Stripped by pydantic-core while the list is validated
+    texts: List[constr(strip_whitespace=True)] = Field(
         ...,
         min_items=1,
         max_items=100,
@@ -47,14 +62,85 @@ class BatchAnalysisRequest(BaseModel):
         default=False,
         description="Return scores for all labels"
     )
+    model: Optional[str] = Field(
+        default=None,
+        description="Model alias or name to use (see /models); defaults to the default model"
+    )
+    priority: Optional[str] = Field(
+        default=None,
+        description="Scheduling class ('interactive' or 'bulk'); defaults to bulk for this endpoint"
+    )
+    timeout_ms: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=600000,
+        description="Deadline in milliseconds; texts not scored by then are dropped and the request fails with 504"
+    )
     
     @validator('texts')
     def validate_texts(cls, v):
-        """Validate that at least one text is non-empty"""
-        valid_texts = [t for t in v if t and t.strip()]
+        """Drop empty texts and check that at least one is left"""
+        valid_texts = [t for t in v if t]
         if not valid_texts:
             raise ValueError('At least one text must be non-empty')
-        return [t.strip() if t else t for t in v]
+        return valid_texts
+
+
+class StreamAnalysisMessage(BaseModel):
+    """Message sent by clients on the /ws/analyze WebSocket"""
+    id: Union[str, int] = Field(
+        ...,
+        description="Client-chosen ID, echoed in the result",
+        example="msg-1"
+    )
+    text: str = Field(
+        ...,
+        min_length=1,
+        max_length=5000,
+        description="Text to analyze for sentiment",
+        example="This chat is great!"
+    )
+    return_all_scores: bool = Field(
+        default=False,
+        description="Also return scores for all labels"
+    )
+    timeout_ms: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=600000,
+        description="Deadline in milliseconds; the result is an error with code 504 if the text is not scored by then"
+    )
+    
+    @validator('text')
+    def text_not_empty(cls, v):
+        """Validate that text is not just whitespace"""
+        if not v.strip():
+            raise ValueError('Text cannot be empty or only whitespace')
+        return v.strip()
+
+
+class ModelSwapRequest(BaseModel):
+    """Request schema for hot-swapping a model"""
+    model: str = Field(
+        ...,
+        min_length=1,
+        description="Model name or prepared artifact directory of the new version",
+        example="distilbert-base-uncased-finetuned-sst-2-english"
+    )
+
+
+class InferenceProfileRequest(BaseModel):
+    """Request schema for profiling a batch with torch.profiler"""
+    texts: Optional[List[str]] = Field(
+        None,
+        min_length=1,
+        max_length=64,
+        description="Texts to profile (default: synthetic texts of seq_length tokens)"
+    )
+    batch_size: int = Field(8, ge=1, le=64, description="Number of synthetic texts")
+    seq_length: int = Field(128, ge=1, le=512, description="Tokens per synthetic text")
+    repeat: int = Field(1, ge=1, le=10, description="Number of times the batch is run")
+    model: Optional[str] = Field(None, description="Model alias or name (default model if omitted)")
 
 
 # Response Schemas
@@ -136,7 +222,7 @@ class HealthResponse(BaseModel):
     """Health check response"""
     status: str = Field(..., description="API status")
     model_loaded: bool = Field(..., description="Whether model is loaded")
-    model_info: Dict[str, str] = Field(..., description="Model information")
+    model_info: Dict[str, Any] = Field(..., description="Model information")
     timestamp: datetime = Field(
         default_factory=datetime.utcnow,
         description="Health check timestamp"
@@ -198,5 +284,43 @@ class AnalysisHistoryResponse(BaseModel):
 
 class DateRangeStats(BaseModel):
     """Statistics for a date range"""
-    dates: Dict[str, int] = Field(..., description="Count of analyses per date")
+    dates: Dict[str, int] = Field(..., description="Count of analyses per time bucket, keyed by bucket start")
     total: int = Field(..., description="Total analyses in range")
+    granularity: str = Field("day", description="Bucket size (minute, hour or day)")
+    label: Optional[str] = Field(None, description="Label counted, all labels if not set")
+
+
+class ScoreSummary(BaseModel):
+    """Confidence score distribution of a set of analyses"""
+    count: int = Field(..., description="Number of analyses")
+    quantiles: Dict[str, float] = Field(..., description="Score quantiles (p05, p25, p50, p75, p95), empty without analyses")
+    low_confidence_rate: float = Field(..., description="Fraction of analyses scored below the low-confidence threshold")
+
+
+class ScoreShift(BaseModel):
+    """Change of a score distribution between two windows"""
+    median_shift: Optional[float] = Field(None, description="Current median score minus the baseline median")
+    low_confidence_rate_change: float = Field(..., description="Current low-confidence rate minus the baseline rate")
+    psi: Optional[float] = Field(None, description="Population stability index (above ~0.2 is a significant shift)")
+    ks: Optional[float] = Field(None, description="Largest gap between the cumulative distributions")
+
+
+class DriftWindow(BaseModel):
+    """Label mix and score distributions of one time window"""
+    start: datetime = Field(..., description="Window start (UTC)")
+    end: datetime = Field(..., description="Window end, exclusive (UTC)")
+    total: int = Field(..., description="Analyses in the window")
+    label_mix: Dict[str, float] = Field(..., description="Fraction of analyses per label")
+    scores: ScoreSummary = Field(..., description="Scores of all labels")
+    labels: Dict[str, ScoreSummary] = Field(..., description="Scores per label")
+
+
+class DriftResponse(BaseModel):
+    """Comparison of the current window with a baseline window"""
+    current: DriftWindow
+    baseline: DriftWindow
+    label_mix_change: Dict[str, float] = Field(..., description="Current minus baseline fraction per label")
+    scores: ScoreShift = Field(..., description="Shift of the scores of all labels")
+    labels: Dict[str, ScoreShift] = Field(..., description="Shift of the scores per label")
+    low_confidence_threshold: float
+    model_name: Optional[str] = Field(None, description="Model compared, all models if not set")
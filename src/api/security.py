@@ -0,0 +1,28 @@
+"""
+Authentication dependencies for protected endpoints
+"""
+
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from api.config import settings
+
+
+async def require_admin_key(x_admin_key: Optional[str] = Header(None)):
+    """
+    Require the admin API key in the X-Admin-Key header
+    
+    Admin endpoints are disabled unless ADMIN_API_KEY is configured.
+    """
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not x_admin_key or not secrets.compare_digest(x_admin_key, settings.ADMIN_API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+
+async def require_profiling_enabled():
+    """Hide the profiling endpoints unless PROFILING_ENABLED is set"""
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
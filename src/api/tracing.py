@@ -0,0 +1,71 @@
+"""
+Request tracing for API routes
+"""
+
+import time
+from typing import Callable
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from utils.tracing import format_traceparent, get_tracer, parse_traceparent
+
+
+def route_template(request: Request) -> str:
+    """
+    Route template of a matched request, e.g. /api/v1/admin/models/{name}/swap
+    
+    Labelling by template rather than raw path keeps the number of metric
+    series and span names bounded.
+    """
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    # Newer FastAPI versions keep an included router's routes without its
+    # prefix and record the full template in the effective route context
+    context = (request.scope.get("fastapi") or {}).get("effective_route_context")
+    return getattr(context, "path", None) or getattr(route, "path", None) or request.scope["path"]
+
+
+class TracedRoute(APIRoute):
+    """
+    API route that handles each request in a server span
+    
+    Continues the caller's trace from a W3C `traceparent` header and returns
+    the trace context in the response. Time before the endpoint's first span
+    is recorded as `request.validate` (body parsing and pydantic validation)
+    and time after its last span as `response.serialize`.
+    """
+    
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        
+        async def traced_handler(request: Request) -> Response:
+            tracer = get_tracer()
+            if not tracer.enabled:
+                return await handler(request)
+            
+            route = route_template(request)
+            attributes = {"http.request.method": request.method, "http.route": route}
+            parent = parse_traceparent(request.headers.get("traceparent"))
+            with tracer.start_span(f"{request.method} {route}", attributes, parent=parent) as span:
+                response = await handler(request)
+                span.set_attribute("http.response.status_code", response.status_code)
+                if span.recording and span.first_child_start_ns is not None:
+                    tracer.record_span(
+                        "request.validate",
+                        span.start_time_ns,
+                        span.first_child_start_ns,
+                        parent=span
+                    )
+                    tracer.record_span(
+                        "response.serialize",
+                        span.last_child_end_ns or span.first_child_start_ns,
+                        time.time_ns(),
+                        parent=span
+                    )
+                if span.context is not None:
+                    response.headers["traceparent"] = format_traceparent(span.context)
+            return response
+        
+        return traced_handler
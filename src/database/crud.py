@@ -2,21 +2,346 @@
 CRUD operations for sentiment analysis database
 """
 
+import time
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from sqlalchemy import and_, func, desc, delete, insert, or_, select, text, update
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Dict, Any, Iterable, Tuple
 
-from database.models import SentimentAnalysis, AnalysisStats
+from database.models import (
+    SentimentAnalysis,
+    AnalysisStats,
+    AnalysisRollup,
+    AnalyzedText,
+    ScoreHistogram,
+    SCORE_BINS,
+    hash_text,
+    score_bin
+)
+from utils.metrics import DB_WRITE_DURATION
+from utils.tracing import traced
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# ============================================================================
+# TEXT STORE
+# ============================================================================
+
+# Advisory lock between text writers and the orphan text sweep on PostgreSQL
+TEXT_STORE_LOCK_KEY = 0x5E472
+
+
+def lock_text_store(db: Session, exclusive: bool = False):
+    """
+    Hold the text store lock until the session's transaction ends (PostgreSQL only)
+    
+    Writers take it shared before storing texts, so until their analyses
+    are committed the orphan sweep, which takes it exclusively, cannot
+    delete a text that ON CONFLICT DO NOTHING found already stored. On
+    SQLite the database write lock already serializes the two.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    function = "pg_advisory_xact_lock" if exclusive else "pg_advisory_xact_lock_shared"
+    db.execute(text(f"SELECT {function}(:key)"), {"key": TEXT_STORE_LOCK_KEY})
+
+
+def _upsert_for(db: Session):
+    """The dialect's INSERT supporting ON CONFLICT (PostgreSQL, SQLite), or None"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+
+def _insert_texts(db: Session, texts_by_hash: Dict[bytes, str]):
+    """
+    Store texts that are not stored yet, in the session's transaction
+    
+    Uses INSERT ... ON CONFLICT DO NOTHING on PostgreSQL and SQLite, so
+    concurrent writers of the same text never fail; rows are inserted in
+    hash order to keep lock order stable between transactions.
+    """
+    if not texts_by_hash:
+        return
+    lock_text_store(db)
+    rows = [{"hash": key, "text": texts_by_hash[key]} for key in sorted(texts_by_hash)]
+    dialect_insert = _upsert_for(db)
+    if dialect_insert is None:
+        existing = set(db.execute(
+            select(AnalyzedText.hash).where(AnalyzedText.hash.in_([row["hash"] for row in rows]))
+        ).scalars())
+        rows = [row for row in rows if row["hash"] not in existing]
+        if rows:
+            db.execute(insert(AnalyzedText), rows)
+        return
+    db.execute(dialect_insert(AnalyzedText).on_conflict_do_nothing(index_elements=["hash"]), rows)
+
+
+@traced("db.get_stored_results")
+def get_stored_results(
+    db: Session,
+    texts: Iterable[str],
+    model_name: str
+) -> Dict[str, Tuple[str, float]]:
+    """
+    Latest stored result of each text for a model
+    
+    Lets the history act as a result cache that survives restarts. One
+    query, using the (text_hash, model_name) index.
+    
+    Args:
+        db: Database session
+        texts: Texts to look up
+        model_name: Model that must have produced the result
+    
+    Returns:
+        Dictionary of text to (label, score) for the texts found
+    """
+    by_hash = {hash_text(text): text for text in texts}
+    if not by_hash:
+        return {}
+    latest = select(func.max(SentimentAnalysis.id)).where(
+        SentimentAnalysis.text_hash.in_(list(by_hash)),
+        SentimentAnalysis.model_name == model_name
+    ).group_by(SentimentAnalysis.text_hash)
+    rows = db.execute(
+        select(SentimentAnalysis.text_hash, SentimentAnalysis.label, SentimentAnalysis.score)
+        .where(SentimentAnalysis.id.in_(latest))
+    )
+    return {by_hash[row.text_hash]: (row.label, row.score) for row in rows}
+
+
+# ============================================================================
+# TIMELINE ROLLUPS
+# ============================================================================
+
+ROLLUP_GRANULARITIES = ("minute", "hour", "day")
+
+# Score histograms are kept at coarser buckets only
+HISTOGRAM_GRANULARITIES = ("hour", "day")
+
+BUCKET_STEPS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1)
+}
+
+_BUCKET_FORMATS = {
+    "minute": "%Y-%m-%dT%H:%M",
+    "hour": "%Y-%m-%dT%H:00",
+    "day": "%Y-%m-%d"
+}
+
+
+def naive_utc(moment: datetime) -> datetime:
+    """`moment` as a naive UTC datetime (naive datetimes are taken to be UTC already)"""
+    if moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Start of the `granularity` bucket containing `moment`, as naive UTC"""
+    moment = naive_utc(moment)
+    if granularity == "minute":
+        return moment.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_counts(db: Session, model, keys: Tuple[str, ...], totals: Dict[tuple, Dict[str, Any]]):
+    """
+    Add `totals` (key tuple -> column increments) to a rollup table
+    
+    Rows are upserted with ON CONFLICT DO UPDATE on PostgreSQL and SQLite,
+    in key order so concurrent writers lock buckets in the same order.
+    """
+    if not totals:
+        return
+    rows = [{**dict(zip(keys, key)), **totals[key]} for key in sorted(totals)]
+    columns = list(rows[0].keys() - set(keys))
+    dialect_insert = _upsert_for(db)
+    if dialect_insert is None:
+        for row in rows:
+            updated = db.execute(
+                update(model)
+                .where(*(getattr(model, key) == row[key] for key in keys))
+                .values({column: getattr(model, column) + row[column] for column in columns})
+            ).rowcount
+            if not updated:
+                db.execute(insert(model), row)
+        return
+    stmt = dialect_insert(model)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: getattr(model, column) + stmt.excluded[column] for column in columns}
+    ), rows)
+
+
+def _add_to_rollups(db: Session, analyses: Iterable[Tuple[datetime, str, float, Optional[str]]], sign: int = 1):
+    """
+    Count analyses into the timeline rollups and score histograms, in the session's transaction
+    
+    Analyses are (created_at, label, score, model_name) tuples; `sign=-1`
+    takes deleted analyses out again.
+    """
+    rollups: Dict[tuple, Dict[str, Any]] = {}
+    histograms: Dict[tuple, Dict[str, Any]] = {}
+    for created_at, label, score, model_name in analyses:
+        for granularity in ROLLUP_GRANULARITIES:
+            bucket = bucket_start(created_at, granularity)
+            total = rollups.setdefault((granularity, bucket, label), {"count": 0, "score_sum": 0.0})
+            total["count"] += sign
+            total["score_sum"] += sign * score
+            if granularity in HISTOGRAM_GRANULARITIES:
+                key = (granularity, bucket, model_name or "", label, score_bin(score))
+                histograms.setdefault(key, {"count": 0})["count"] += sign
+    _add_counts(db, AnalysisRollup, ("granularity", "bucket", "label"), rollups)
+    _add_counts(db, ScoreHistogram, ("granularity", "bucket", "model_name", "label", "bin"), histograms)
+
+
+@traced("db.rebuild_rollups")
+def rebuild_rollups(db: Session, since: Optional[datetime] = None, chunk_size: int = 50_000) -> int:
+    """
+    Recompute timeline rollups and score histograms from the analyses
+    
+    Used to backfill histories written before rollups existed, and to
+    repair them after analyses are deleted directly.
+    
+    Args:
+        db: Database session
+        since: Rebuild the days from this one on (default: everything)
+        chunk_size: Analyses read at a time
+    
+    Returns:
+        Number of analyses counted
+    """
+    try:
+        query = select(
+            SentimentAnalysis.created_at, SentimentAnalysis.label,
+            SentimentAnalysis.score, SentimentAnalysis.model_name
+        )
+        if since is not None:
+            first_day = bucket_start(since, "day")
+            query = query.where(SentimentAnalysis.created_at >= first_day)
+        for model in (AnalysisRollup, ScoreHistogram):
+            clear = delete(model)
+            if since is not None:
+                clear = clear.where(model.bucket >= first_day)
+            db.execute(clear)
+        counted = 0
+        for chunk in db.execute(query.execution_options(yield_per=chunk_size)).partitions():
+            _add_to_rollups(db, chunk)
+            counted += len(chunk)
+        db.commit()
+        logger.info(f"Rebuilt timeline rollups from {counted} analyses")
+        return counted
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error rebuilding rollups: {str(e)}")
+        raise
+
+
+@traced("db.get_timeline")
+def get_timeline(
+    db: Session,
+    granularity: str,
+    start: datetime,
+    end: datetime,
+    label: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Count analyses per time bucket from the rollups
+    
+    Args:
+        db: Database session
+        granularity: Bucket size (minute, hour or day)
+        start: First moment to include (its whole bucket is counted)
+        end: Last moment to include
+        label: Only count analyses with this label
+    
+    Returns:
+        Dictionary of bucket start to count, with every bucket in range
+    
+    Raises:
+        ValueError: If the granularity is unknown
+    """
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}'")
+    first, last = bucket_start(start, granularity), bucket_start(end, granularity)
+    query = select(AnalysisRollup.bucket, func.sum(AnalysisRollup.count)).where(
+        AnalysisRollup.granularity == granularity,
+        AnalysisRollup.bucket >= first,
+        AnalysisRollup.bucket <= last
+    ).group_by(AnalysisRollup.bucket)
+    if label:
+        query = query.where(AnalysisRollup.label == label)
+    counts = {bucket: count for bucket, count in db.execute(query)}
+    
+    # Fill in empty buckets with 0
+    data = {}
+    step, bucket_format = BUCKET_STEPS[granularity], _BUCKET_FORMATS[granularity]
+    bucket = first
+    while bucket <= last:
+        data[bucket.strftime(bucket_format)] = int(counts.get(bucket, 0))
+        bucket += step
+    return data
+
+
+@traced("db.get_score_histograms")
+def get_score_histograms(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    model_name: Optional[str] = None
+) -> Dict[str, List[int]]:
+    """
+    Merged score histograms of a time window, per label
+    
+    Whole days inside the window are read from day buckets and the
+    remaining hours from hour buckets, so the cost depends on the window's
+    length in buckets, not on the number of analyses.
+    
+    Args:
+        db: Database session
+        start: Window start, rounded down to the hour
+        end: Window end (exclusive), rounded down to the hour
+        model_name: Only count analyses of this model
+    
+    Returns:
+        Dictionary of label to SCORE_BINS bin counts
+    """
+    start, end = bucket_start(start, "hour"), bucket_start(end, "hour")
+    first_day = bucket_start(start + BUCKET_STEPS["day"] - BUCKET_STEPS["hour"], "day")
+    last_day = max(bucket_start(end, "day"), first_day)
+    buckets = or_(
+        and_(ScoreHistogram.granularity == "day", ScoreHistogram.bucket >= first_day, ScoreHistogram.bucket < last_day),
+        and_(ScoreHistogram.granularity == "hour", ScoreHistogram.bucket >= start, ScoreHistogram.bucket < min(first_day, end)),
+        and_(ScoreHistogram.granularity == "hour", ScoreHistogram.bucket >= max(last_day, start), ScoreHistogram.bucket < end)
+    )
+    query = select(ScoreHistogram.label, ScoreHistogram.bin, func.sum(ScoreHistogram.count)).where(buckets)
+    if model_name is not None:
+        query = query.where(ScoreHistogram.model_name == model_name)
+    histograms: Dict[str, List[int]] = {}
+    for label, score_bin_, count in db.execute(query.group_by(ScoreHistogram.label, ScoreHistogram.bin)):
+        if count:
+            histograms.setdefault(label, [0] * SCORE_BINS)[score_bin_] = int(count)
+    return histograms
+
+
 # ============================================================================
 # SENTIMENT ANALYSIS CRUD
 # ============================================================================
 
+@traced("db.create_analysis")
 def create_analysis(
     db: Session,
     text: str,
@@ -42,17 +367,26 @@ def create_analysis(
         Created SentimentAnalysis object
     """
     try:
+        text_hash = hash_text(text)
+        # Set here rather than by the database, so rollups use the same time;
+        # timezone-aware, so it is stored as UTC whatever the session time zone
+        created_at = datetime.now(timezone.utc)
         analysis = SentimentAnalysis(
-            text=text,
+            text_hash=text_hash,
+            created_at=created_at,
             label=label,
             score=score,
             processing_time_ms=processing_time_ms,
             model_name=model_name,
             is_batch=is_batch
         )
+        start_time = time.perf_counter()
+        _insert_texts(db, {text_hash: text})
         db.add(analysis)
+        _add_to_rollups(db, [(created_at, label, score, model_name)])
         db.commit()
         db.refresh(analysis)
+        DB_WRITE_DURATION.labels("create_analysis").observe(time.perf_counter() - start_time)
         logger.debug(f"Created analysis: {analysis.id}")
         return analysis
     except Exception as e:
@@ -61,6 +395,61 @@ def create_analysis(
         raise
 
 
+@traced("db.create_analyses_bulk")
+def create_analyses_bulk(
+    db: Session,
+    results: List[Tuple[str, str, float]],
+    processing_time_ms: Optional[float] = None,
+    model_name: Optional[str] = None,
+    is_batch: bool = True
+) -> int:
+    """
+    Create analysis records for many results in one transaction
+    
+    Each distinct text is stored once; the rows are inserted with one
+    executemany and are not loaded back.
+    
+    Args:
+        db: Database session
+        results: (text, label, score) per analysis
+        processing_time_ms: Time taken per text
+        model_name: Name of the model used
+        is_batch: Whether the results came from a batch analysis
+    
+    Returns:
+        Number of analyses created
+    """
+    if not results:
+        return 0
+    try:
+        start_time = time.perf_counter()
+        created_at = datetime.now(timezone.utc)
+        hashes = {text: hash_text(text) for text in {text for text, _, _ in results}}
+        _insert_texts(db, {text_hash: text for text, text_hash in hashes.items()})
+        db.execute(insert(SentimentAnalysis), [
+            {
+                "text_hash": hashes[text],
+                "created_at": created_at,
+                "label": label,
+                "score": score,
+                "processing_time_ms": processing_time_ms,
+                "model_name": model_name,
+                "is_batch": is_batch
+            }
+            for text, label, score in results
+        ])
+        _add_to_rollups(db, [(created_at, label, score, model_name) for _, label, score in results])
+        db.commit()
+        DB_WRITE_DURATION.labels("create_analyses_bulk").observe(time.perf_counter() - start_time)
+        logger.debug(f"Created {len(results)} analyses")
+        return len(results)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error creating analyses: {str(e)}")
+        raise
+
+
+@traced("db.get_analysis_by_id")
 def get_analysis_by_id(db: Session, analysis_id: int) -> Optional[SentimentAnalysis]:
     """
     Get a specific analysis by ID
@@ -68,6 +457,7 @@ def get_analysis_by_id(db: Session, analysis_id: int) -> Optional[SentimentAnaly
     return db.query(SentimentAnalysis).filter(SentimentAnalysis.id == analysis_id).first()
 
 
+@traced("db.get_analyses")
 def get_analyses(
     db: Session,
     skip: int = 0,
@@ -75,7 +465,8 @@ def get_analyses(
     label: Optional[str] = None,
     min_score: Optional[float] = None,
     start_date: Optional[datetime] = None,
-    end_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None,
+    model_name: Optional[str] = None
 ) -> List[SentimentAnalysis]:
     """
     Get list of analyses with optional filters
@@ -88,6 +479,7 @@ def get_analyses(
         min_score: Filter by minimum confidence score
         start_date: Filter by start date
         end_date: Filter by end date
+        model_name: Filter by the model that produced the analysis
     
     Returns:
         List of SentimentAnalysis objects
@@ -107,6 +499,9 @@ def get_analyses(
     if end_date:
         query = query.filter(SentimentAnalysis.created_at <= end_date)
     
+    if model_name:
+        query = query.filter(SentimentAnalysis.model_name == model_name)
+    
     # Order by most recent first
     query = query.order_by(desc(SentimentAnalysis.created_at))
     
@@ -114,11 +509,13 @@ def get_analyses(
     return query.offset(skip).limit(limit).all()
 
 
+@traced("db.get_total_analyses_count")
 def get_total_analyses_count(db: Session) -> int:
     """Get total number of analyses in database"""
     return db.query(SentimentAnalysis).count()
 
 
+@traced("db.delete_analysis")
 def delete_analysis(db: Session, analysis_id: int) -> bool:
     """
     Delete an analysis by ID
@@ -129,8 +526,13 @@ def delete_analysis(db: Session, analysis_id: int) -> bool:
     try:
         analysis = get_analysis_by_id(db, analysis_id)
         if analysis:
+            start_time = time.perf_counter()
+            _add_to_rollups(
+                db, [(analysis.created_at, analysis.label, analysis.score, analysis.model_name)], sign=-1
+            )
             db.delete(analysis)
             db.commit()
+            DB_WRITE_DURATION.labels("delete_analysis").observe(time.perf_counter() - start_time)
             logger.debug(f"Deleted analysis: {analysis_id}")
             return True
         return False
@@ -144,6 +546,7 @@ def delete_analysis(db: Session, analysis_id: int) -> bool:
 # STATISTICS AND AGGREGATIONS
 # ============================================================================
 
+@traced("db.get_statistics")
 def get_statistics(
     db: Session,
     start_date: Optional[datetime] = None,
@@ -194,6 +597,7 @@ def get_statistics(
     }
 
 
+@traced("db.get_recent_analyses")
 def get_recent_analyses(db: Session, limit: int = 10) -> List[SentimentAnalysis]:
     """
     Get most recent analyses
@@ -210,6 +614,7 @@ def get_recent_analyses(db: Session, limit: int = 10) -> List[SentimentAnalysis]
     ).limit(limit).all()
 
 
+@traced("db.get_analyses_by_date_range")
 def get_analyses_by_date_range(
     db: Session,
     days: int = 7
@@ -225,32 +630,10 @@ def get_analyses_by_date_range(
         Dictionary with date as key and count as value
     """
     end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=days)
-    
-    # Query to get analyses grouped by date
-    results = db.query(
-        func.date(SentimentAnalysis.created_at).label('date'),
-        func.count(SentimentAnalysis.id).label('count')
-    ).filter(
-        SentimentAnalysis.created_at >= start_date
-    ).group_by(
-        func.date(SentimentAnalysis.created_at)
-    ).all()
-    
-    # Convert to dictionary
-    data = {str(result.date): result.count for result in results}
-    
-    # Fill in missing dates with 0
-    current_date = start_date.date()
-    while current_date <= end_date.date():
-        date_str = str(current_date)
-        if date_str not in data:
-            data[date_str] = 0
-        current_date += timedelta(days=1)
-    
-    return dict(sorted(data.items()))
+    return get_timeline(db, "day", end_date - timedelta(days=days), end_date)
 
 
+@traced("db.search_analyses")
 def search_analyses(
     db: Session,
     search_term: str,
@@ -267,8 +650,8 @@ def search_analyses(
     Returns:
         List of matching SentimentAnalysis objects
     """
-    return db.query(SentimentAnalysis).filter(
-        SentimentAnalysis.text.ilike(f"%{search_term}%")
+    return db.query(SentimentAnalysis).join(SentimentAnalysis.text_ref).filter(
+        AnalyzedText.text.ilike(f"%{search_term}%")
     ).order_by(
         desc(SentimentAnalysis.created_at)
     ).limit(limit).all()
@@ -278,6 +661,7 @@ def search_analyses(
 # DAILY STATS (for efficient dashboard queries)
 # ============================================================================
 
+@traced("db.update_daily_stats")
 def update_daily_stats(db: Session, date: datetime):
     """
     Update or create daily statistics for a given date
@@ -2,36 +2,130 @@
 Database configuration and session management
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import LargeBinary, bindparam, create_engine, func, inspect, select, text, update
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
-from typing import Generator
+from typing import Generator, Optional
 import logging
+import math
+import threading
+import time
 
-from database.models import Base
+from database.models import AnalysisRollup, Base, ScoreHistogram, SentimentAnalysis, hash_text
+from database.partitioning import create_history_maintenance
 from api.config import settings
+from utils.metrics import DB_READ_SESSIONS, metrics
 
 logger = logging.getLogger(__name__)
 
-# Create engine
-# For SQLite (development/testing)
-if settings.DATABASE_URL and settings.DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        settings.DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-        echo=settings.DB_ECHO
-    )
-# For PostgreSQL (production)
-else:
-    engine = create_engine(
-        settings.DATABASE_URL or "sqlite:///./sentiment_analysis.db",
+def create_engine_for(url: str):
+    """Engine and connection pool for a database URL"""
+    # For SQLite (development/testing)
+    if url.startswith("sqlite"):
+        return create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+            echo=settings.DB_ECHO
+        )
+    # For PostgreSQL (production)
+    return create_engine(
+        url,
         pool_pre_ping=True,  # Verify connections before using
         echo=settings.DB_ECHO
     )
 
+
+def replica_lag(primary, replica) -> float:
+    """
+    Seconds by which the replica's newest analysis trails the primary's
+    
+    Measured on the history itself, so it works with any replication
+    setup (and with two plain databases in tests). A replica without any
+    analyses while the primary has some lags infinitely.
+    """
+    newest = select(func.max(SentimentAnalysis.created_at))
+    with primary.connect() as conn:
+        primary_newest = conn.scalar(newest)
+    if primary_newest is None:
+        return 0.0
+    with replica.connect() as conn:
+        replica_newest = conn.scalar(newest)
+    if replica_newest is None:
+        return math.inf
+    return max((primary_newest - replica_newest).total_seconds(), 0.0)
+
+
+class ReplicaLagGuard:
+    """
+    Decides whether reads may go to the replica
+    
+    The lag is measured at most every `check_interval_s` seconds, by one
+    caller at a time; the others use the last verdict. A replica that
+    lags more than `max_lag_s` or cannot be reached is skipped until a
+    later check finds it caught up.
+    """
+    
+    def __init__(self, primary, replica, max_lag_s: float, check_interval_s: float = 5.0):
+        self.primary = primary
+        self.replica = replica
+        self.max_lag_s = max_lag_s
+        self.check_interval_s = check_interval_s
+        self.lag_s: Optional[float] = None
+        self.healthy = True
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    def check(self) -> bool:
+        """Measure the lag now and update the verdict"""
+        try:
+            self.lag_s = replica_lag(self.primary, self.replica)
+            healthy = self.lag_s <= self.max_lag_s
+        except Exception as e:
+            logger.warning(f"Could not measure read replica lag: {str(e)}")
+            self.lag_s = None
+            healthy = False
+        if healthy != self.healthy:
+            if healthy:
+                logger.info("Read replica caught up, routing reads to it again")
+            else:
+                logger.warning(f"Read replica lag {self.lag_s}s over {self.max_lag_s}s, reading from the primary")
+        self.healthy = healthy
+        return healthy
+    
+    def use_replica(self) -> bool:
+        """Whether reads should go to the replica, re-checking the lag when due"""
+        now = time.monotonic()
+        due = self._checked_at is None or now - self._checked_at >= self.check_interval_s
+        if due and self._lock.acquire(blocking=False):
+            try:
+                self._checked_at = now
+                self.check()
+            finally:
+                self._lock.release()
+        return self.healthy
+
+
+# Create engine
+engine = create_engine_for(settings.DATABASE_URL or "sqlite:///./sentiment_analysis.db")
+
+# Read-only endpoints use a replica, with its own pool, when one is configured
+read_engine = create_engine_for(settings.DATABASE_READ_URL) if settings.DATABASE_READ_URL else engine
+
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+read_guard: Optional[ReplicaLagGuard] = None
+if read_engine is not engine and settings.DATABASE_READ_MAX_LAG_S is not None:
+    read_guard = ReplicaLagGuard(
+        engine, read_engine, settings.DATABASE_READ_MAX_LAG_S, settings.DATABASE_READ_LAG_CHECK_S
+    )
+    metrics.gauge(
+        "db_read_replica_lag_seconds",
+        "Lag of the read replica behind the primary at the last check",
+        lambda: read_guard.lag_s
+    )
 
 
 def init_db():
@@ -41,13 +135,98 @@ def init_db():
     """
     try:
         logger.info("Initializing database...")
+        maintenance = create_history_maintenance(settings, engine)
+        if maintenance is not None:
+            maintenance.create_table()
         Base.metadata.create_all(bind=engine)
+        migrate_inline_texts(engine)
+        backfill_rollups(engine)
+        # Indexes added to existing tables
+        for index in SentimentAnalysis.__table__.indexes:
+            index.create(engine, checkfirst=True)
+        if maintenance is not None:
+            maintenance.ensure_partitions()
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Error initializing database: {str(e)}")
         raise
 
 
+def migrate_inline_texts(bind, chunk_size: int = 5000) -> int:
+    """
+    Move texts stored in sentiment_analyses rows into analyzed_texts
+    
+    Databases created before the text store keep a `text` column on every
+    analysis. The column is replaced by `text_hash`, filled in chunks,
+    with each distinct text stored once; does nothing on new databases.
+    
+    Args:
+        bind: Engine of the database to migrate
+        chunk_size: Rows migrated per transaction
+    
+    Returns:
+        Number of analyses migrated
+    """
+    from database.crud import _insert_texts
+    
+    columns = {column["name"] for column in inspect(bind).get_columns(SentimentAnalysis.__tablename__)}
+    if "text" not in columns:
+        return 0
+    
+    table = SentimentAnalysis.__tablename__
+    logger.info("Moving analysis texts to the analyzed_texts table...")
+    with bind.begin() as conn:
+        if "text_hash" not in columns:
+            hash_type = LargeBinary(32).compile(dialect=bind.dialect)
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN text_hash {hash_type}"))
+    
+    legacy = SentimentAnalysis.__table__.c
+    set_hash = update(SentimentAnalysis.__table__).where(legacy.id == bindparam("row_id")).values(
+        text_hash=bindparam("row_hash")
+    )
+    migrated = 0
+    with Session(bind) as db:
+        while True:
+            rows = db.execute(
+                select(legacy.id, text("text")).select_from(SentimentAnalysis.__table__)
+                .where(legacy.text_hash.is_(None)).limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            hashes = [(row[0], hash_text(row[1])) for row in rows]
+            _insert_texts(db, {row_hash: row[1] for row, (_, row_hash) in zip(rows, hashes)})
+            db.execute(set_hash, [{"row_id": row_id, "row_hash": row_hash} for row_id, row_hash in hashes])
+            db.commit()
+            migrated += len(rows)
+    
+    with bind.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table} DROP COLUMN text"))
+    for index in SentimentAnalysis.__table__.indexes:
+        index.create(bind, checkfirst=True)
+    logger.info(f"Moved the texts of {migrated} analyses")
+    return migrated
+
+
+def backfill_rollups(bind) -> int:
+    """
+    Build timeline rollups and score histograms for a history written before they existed
+    
+    Does nothing once both exist; they are maintained on write.
+    
+    Returns:
+        Number of analyses counted
+    """
+    from database.crud import rebuild_rollups
+    
+    with Session(bind) as db:
+        if all(db.scalar(select(model.bucket).limit(1)) is not None for model in (AnalysisRollup, ScoreHistogram)):
+            return 0
+        if db.scalar(select(SentimentAnalysis.id).limit(1)) is None:
+            return 0
+        logger.info("Building timeline rollups from the analysis history...")
+        return rebuild_rollups(db)
+
+
 def get_db() -> Generator[Session, None, None]:
     """
     Dependency for getting database session
@@ -66,6 +245,32 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+def read_session() -> Session:
+    """
+    New session for reads, on the replica unless it lags (see get_read_db)
+    
+    The caller closes it.
+    """
+    use_replica = read_engine is not engine and (read_guard is None or read_guard.use_replica())
+    DB_READ_SESSIONS.labels("replica" if use_replica else "primary").inc()
+    return (ReadSessionLocal if use_replica else SessionLocal)()
+
+
+def get_read_db() -> Generator[Session, None, None]:
+    """
+    Dependency for read-only endpoints (history, statistics, search)
+    
+    Sessions use the read replica (DATABASE_READ_URL) unless it lags the
+    primary by more than DATABASE_READ_MAX_LAG_S; without a replica this
+    is the same as get_db. Never write through these sessions.
+    """
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 def close_db():
     """
     Close database connections
@@ -74,6 +279,8 @@ def close_db():
     try:
         logger.info("Closing database connections...")
         engine.dispose()
+        if read_engine is not engine:
+            read_engine.dispose()
         logger.info("Database connections closed")
     except Exception as e:
         logger.error(f"Error closing database: {str(e)}")
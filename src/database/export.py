@@ -0,0 +1,205 @@
+"""
+Streaming export of the analysis history
+
+Rows are read from the database with yield_per (a server-side cursor on
+PostgreSQL) and encoded chunk by chunk, so memory use does not grow with
+the number of rows exported. Parquet needs the optional `pyarrow` package.
+"""
+
+import csv
+import io
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import orjson
+from sqlalchemy import Row, Select, select
+from sqlalchemy.orm import Session
+
+from database.models import AnalyzedText, SentimentAnalysis
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Optional: only needed for Parquet
+    pyarrow = None
+
+COLUMNS = (
+    "id", "text", "label", "score", "created_at", "processing_time_ms", "model_name", "is_batch"
+)
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+# Rows fetched from the database and encoded at a time
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def export_query(
+    label: Optional[str] = None,
+    min_score: Optional[float] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    model_name: Optional[str] = None
+) -> Select:
+    """
+    Analyses with their texts, oldest first, with the /history filters
+    
+    Start dates are inclusive and end dates exclusive.
+    """
+    query = select(
+        SentimentAnalysis.id, AnalyzedText.text, SentimentAnalysis.label, SentimentAnalysis.score,
+        SentimentAnalysis.created_at, SentimentAnalysis.processing_time_ms,
+        SentimentAnalysis.model_name, SentimentAnalysis.is_batch
+    ).join(AnalyzedText, SentimentAnalysis.text_hash == AnalyzedText.hash)
+    if label:
+        query = query.where(SentimentAnalysis.label == label)
+    if min_score is not None:
+        query = query.where(SentimentAnalysis.score >= min_score)
+    if start_date:
+        query = query.where(SentimentAnalysis.created_at >= start_date)
+    if end_date:
+        query = query.where(SentimentAnalysis.created_at < end_date)
+    if model_name:
+        query = query.where(SentimentAnalysis.model_name == model_name)
+    return query.order_by(SentimentAnalysis.id)
+
+
+def iter_chunks(db: Session, query: Select, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Row]]:
+    """Rows of `query` in chunks of `chunk_size`, without loading the whole result"""
+    # Executed on the connection, as plain rows without ORM loading
+    result = db.connection().execute(query.execution_options(yield_per=chunk_size))
+    for chunk in result.partitions():
+        yield chunk
+
+
+def encode_csv(chunks: Iterable[Sequence[Row]]) -> Iterator[bytes]:
+    """CSV with a header row; timestamps in ISO 8601"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for chunk in chunks:
+        writer.writerows(
+            (id, text, label, score, created_at.isoformat(), processing_time_ms, model_name, is_batch)
+            for id, text, label, score, created_at, processing_time_ms, model_name, is_batch in chunk
+        )
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def encode_ndjson(chunks: Iterable[Sequence[Row]]) -> Iterator[bytes]:
+    """One JSON object per line"""
+    for chunk in chunks:
+        yield b"".join(orjson.dumps(dict(zip(COLUMNS, row)), option=orjson.OPT_APPEND_NEWLINE) for row in chunk)
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file collecting what a writer produced since the last drain
+    
+    tell() keeps counting across drains, as Parquet footers record the
+    file offsets of row groups.
+    """
+    
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self.position
+    
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def parquet_schema():
+    """Arrow schema of exported and archived analyses, in COLUMNS order"""
+    return pyarrow.schema([
+        ("id", pyarrow.int64()),
+        ("text", pyarrow.string()),
+        ("label", pyarrow.string()),
+        ("score", pyarrow.float64()),
+        ("created_at", pyarrow.timestamp("us", tz="UTC")),
+        ("processing_time_ms", pyarrow.float64()),
+        ("model_name", pyarrow.string()),
+        ("is_batch", pyarrow.bool_())
+    ])
+
+
+def _record_batch(chunk: Sequence[Row], schema):
+    return pyarrow.RecordBatch.from_arrays(
+        [pyarrow.array(column, type=field.type) for column, field in zip(zip(*chunk), schema)],
+        schema=schema
+    )
+
+
+def write_parquet(chunks: Iterable[Sequence[Row]], sink) -> int:
+    """
+    Write zstd-compressed Parquet to a path or file, one row group per chunk
+    
+    Returns:
+        Number of rows written
+    """
+    schema = parquet_schema()
+    rows = 0
+    with pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for chunk in chunks:
+            writer.write_batch(_record_batch(chunk, schema))
+            rows += len(chunk)
+    return rows
+
+
+def encode_parquet(chunks: Iterable[Sequence[Row]]) -> Iterator[bytes]:
+    """Parquet file bytes, yielded as each row group is written"""
+    sink = _ChunkSink()
+    schema = parquet_schema()
+    with pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for chunk in chunks:
+            writer.write_batch(_record_batch(chunk, schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+ENCODERS = {
+    "csv": encode_csv,
+    "ndjson": encode_ndjson,
+    "parquet": encode_parquet
+}
+
+
+def available_formats() -> List[str]:
+    """Export formats usable with the installed packages"""
+    return [name for name in ENCODERS if name != "parquet" or pyarrow is not None]
+
+
+def stream_export(db: Session, format: str, chunk_size: int = DEFAULT_CHUNK_SIZE, **filters) -> Iterator[bytes]:
+    """
+    Encoded history export, as a byte stream
+    
+    Args:
+        db: Database session, kept open while the stream is consumed
+        format: csv, ndjson or parquet
+        chunk_size: Rows fetched and encoded at a time
+        **filters: Filters of export_query
+    
+    Raises:
+        ValueError: If the format is unknown or not available
+    """
+    if format not in available_formats():
+        raise ValueError(f"Export format '{format}' is not available")
+    return ENCODERS[format](iter_chunks(db, export_query(**filters), chunk_size))
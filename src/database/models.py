@@ -2,25 +2,64 @@
 Database models for sentiment analysis
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text
+import hashlib
+
+from sqlalchemy import Column, Integer, SmallInteger, String, Float, DateTime, Boolean, Text, LargeBinary, ForeignKey, Index
+from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
 
 Base = declarative_base()
 
+# Score histogram resolution: bins of width 1 / SCORE_BINS over [0, 1]
+SCORE_BINS = 100
+
+
+def hash_text(text: str) -> bytes:
+    """Content hash identifying a text in the analyzed_texts table"""
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def score_bin(score: float) -> int:
+    """Histogram bin of a confidence score"""
+    return min(max(int(score * SCORE_BINS), 0), SCORE_BINS - 1)
+
+
+class AnalyzedText(Base):
+    """
+    Each distinct analyzed text, stored once and keyed by its content hash
+    """
+    __tablename__ = "analyzed_texts"
+    
+    hash = Column(LargeBinary(32), primary_key=True)  # hash_text(text)
+    text = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    def __repr__(self):
+        return f"<AnalyzedText(hash={self.hash.hex()[:12]}, length={len(self.text)})>"
+
 
 class SentimentAnalysis(Base):
     """
     Model for storing sentiment analysis results
     """
     __tablename__ = "sentiment_analyses"
+    __table_args__ = (
+        # Stored result lookups by text and model (see crud.get_stored_results)
+        Index("ix_sentiment_analyses_text_hash_model_name", "text_hash", "model_name"),
+        # Time-window queries and retention
+        Index("ix_sentiment_analyses_created_at", "created_at"),
+    )
     
     # Primary key
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     
-    # Analysis data
-    text = Column(Text, nullable=False)
+    # Analysis data; the text itself lives in analyzed_texts
+    text_hash = Column(LargeBinary(32), ForeignKey("analyzed_texts.hash"), nullable=False)
+    text_ref = relationship(AnalyzedText, lazy="joined", innerjoin=True)
+    text = association_proxy("text_ref", "text")
     label = Column(String(20), nullable=False)  # POSITIVE or NEGATIVE
     score = Column(Float, nullable=False)  # Confidence score (0-1)
     
@@ -29,7 +68,7 @@ class SentimentAnalysis(Base):
     processing_time_ms = Column(Float, nullable=True)  # Time taken to analyze
     
     # Optional fields
-    model_name = Column(String(100), nullable=True)
+    model_name = Column(String(100), nullable=True, index=True)  # Model that produced the result
     is_batch = Column(Boolean, default=False, nullable=False)
     
     def __repr__(self):
@@ -49,6 +88,47 @@ class SentimentAnalysis(Base):
         }
 
 
+class AnalysisRollup(Base):
+    """
+    Analysis counts per time bucket and label, maintained on write
+    
+    One row per (granularity, bucket, label) for minute, hour and day
+    buckets, so timelines are read in time proportional to the number of
+    buckets instead of the number of analyses.
+    """
+    __tablename__ = "analysis_rollups"
+    
+    granularity = Column(String(8), primary_key=True)  # minute, hour or day
+    bucket = Column(DateTime, primary_key=True)  # Bucket start (UTC)
+    label = Column(String(20), primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+    score_sum = Column(Float, default=0.0, nullable=False)
+    
+    def __repr__(self):
+        return f"<AnalysisRollup({self.granularity} {self.bucket} {self.label}: {self.count})>"
+
+
+class ScoreHistogram(Base):
+    """
+    Confidence score histograms per time bucket, model and label, maintained on write
+    
+    One row per non-empty bin. Histograms of any set of buckets merge by
+    adding counts, so score distributions of arbitrary windows are read
+    without scanning analyses.
+    """
+    __tablename__ = "score_histograms"
+    
+    granularity = Column(String(8), primary_key=True)  # hour or day
+    bucket = Column(DateTime, primary_key=True)  # Bucket start (UTC)
+    model_name = Column(String(100), primary_key=True)  # "" when not recorded
+    label = Column(String(20), primary_key=True)
+    bin = Column(SmallInteger, primary_key=True)  # score_bin(score)
+    count = Column(Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f"<ScoreHistogram({self.granularity} {self.bucket} {self.label} bin {self.bin}: {self.count})>"
+
+
 class AnalysisStats(Base):
     """
     Model for storing aggregated statistics
@@ -0,0 +1,388 @@
+"""
+Time partitioning, retention and archival of the analysis history
+
+On PostgreSQL, a new sentiment_analyses table can be range-partitioned by
+created_at (monthly or daily): partitions are created ahead of time and
+expired ones are dropped whole. Other databases get the same retention by
+deleting expired periods in chunks. Expired periods can be exported to
+Parquet first (needs the optional `pyarrow` package).
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import MetaData, PrimaryKeyConstraint, delete, func, inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from database import crud, export
+from database.models import AnalysisRollup, AnalyzedText, ScoreHistogram, SentimentAnalysis
+
+logger = logging.getLogger(__name__)
+
+INTERVALS = ("monthly", "daily")
+
+TABLE = SentimentAnalysis.__tablename__
+
+# Any fixed key works; it only has to be the same in every worker
+_ADVISORY_LOCK_KEY = 0x5E471
+
+
+def period_start(moment: datetime, interval: str) -> datetime:
+    """Start of the period containing `moment`"""
+    if interval == "monthly":
+        return datetime(moment.year, moment.month, 1)
+    return datetime(moment.year, moment.month, moment.day)
+
+
+def next_period(start: datetime, interval: str) -> datetime:
+    """Start of the period after the one starting at `start`"""
+    if interval == "monthly":
+        return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+
+def period_name(start: datetime, interval: str) -> str:
+    """Suffix naming a period's partition and archive file, e.g. p202610 or p20261019"""
+    return start.strftime("p%Y%m" if interval == "monthly" else "p%Y%m%d")
+
+
+def utc(moment: datetime) -> datetime:
+    """Mark a naive UTC period boundary as UTC, so timestamptz comparisons ignore the session time zone"""
+    return moment.replace(tzinfo=timezone.utc)
+
+
+def partitioned_table():
+    """
+    sentiment_analyses as a PostgreSQL table range-partitioned by created_at
+    
+    A copy of the model's table: PostgreSQL requires the partition key in
+    the primary key, which becomes (id, created_at). Rows keep unique ids.
+    """
+    metadata = MetaData()
+    AnalyzedText.__table__.to_metadata(metadata)
+    table = SentimentAnalysis.__table__.to_metadata(metadata)
+    table.c.created_at.primary_key = True
+    table.append_constraint(PrimaryKeyConstraint(table.c.id, table.c.created_at))
+    table.dialect_kwargs["postgresql_partition_by"] = "RANGE (created_at)"
+    return table
+
+
+class HistoryMaintenance:
+    """
+    Creates history partitions and expires old analyses
+    
+    Periods are expired whole: an analysis is removed once the period
+    (month or day) it belongs to ended more than `retention_days` ago.
+    """
+    
+    def __init__(
+        self,
+        bind: Engine,
+        interval: Optional[str] = None,
+        partitions_ahead: int = 2,
+        retention_days: Optional[int] = None,
+        archive_dir: Optional[str] = None,
+        chunk_size: int = 5000
+    ):
+        """
+        Args:
+            bind: Engine of the history database
+            interval: "monthly" or "daily" partitions; without one, retention
+                expires whole days
+            partitions_ahead: Future partitions kept ready (PostgreSQL)
+            retention_days: Age after which analyses expire, None keeps all
+            archive_dir: Directory receiving a Parquet file per expired period
+            chunk_size: Rows deleted or exported at a time
+        
+        Raises:
+            ValueError: If the interval is unknown
+            RuntimeError: If archival is requested without pyarrow installed
+        """
+        if interval is not None and interval not in INTERVALS:
+            raise ValueError(f"Unknown partition interval '{interval}', expected one of {', '.join(INTERVALS)}")
+        if archive_dir and "parquet" not in export.available_formats():
+            raise RuntimeError("History archival needs the `pyarrow` package")
+        self.bind = bind
+        self.interval = interval
+        self.partitions_ahead = partitions_ahead
+        self.retention_days = retention_days
+        self.archive_dir = archive_dir
+        self.chunk_size = chunk_size
+    
+    @property
+    def partitioned(self) -> bool:
+        """Whether the history uses native partitions (PostgreSQL only)"""
+        return self.interval is not None and self.bind.dialect.name == "postgresql"
+    
+    def create_table(self) -> bool:
+        """
+        Create sentiment_analyses as a partitioned table if it does not exist
+        
+        Call before Base.metadata.create_all. An existing unpartitioned
+        table is left as is (converting it means copying every row) and is
+        expired with chunked deletes instead.
+        
+        Returns:
+            Whether the partitioned table was created
+        """
+        if not self.partitioned:
+            return False
+        if inspect(self.bind).has_table(TABLE):
+            if not self._is_partitioned():
+                logger.warning(f"{TABLE} is not partitioned; recreate it to use {self.interval} partitions")
+            return False
+        table = partitioned_table()
+        table.metadata.create_all(self.bind)
+        logger.info(f"Created {TABLE} with {self.interval} partitions")
+        return True
+    
+    def _is_partitioned(self) -> bool:
+        with self.bind.connect() as conn:
+            return bool(conn.scalar(text(
+                "SELECT count(*) FROM pg_partitioned_table t JOIN pg_class c ON c.oid = t.partrelid "
+                "WHERE c.relname = :table"
+            ), {"table": TABLE}))
+    
+    def _partitions(self) -> List[str]:
+        """Names of the partitions of sentiment_analyses"""
+        with self.bind.connect() as conn:
+            return list(conn.execute(text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = :table"
+            ), {"table": TABLE}).scalars())
+    
+    def ensure_partitions(self, now: Optional[datetime] = None) -> List[str]:
+        """
+        Create the partitions of the current and the next few periods
+        
+        A DEFAULT partition catches rows outside every range, so inserts
+        never fail when maintenance falls behind. Each partition is created
+        in its own transaction.
+        
+        Returns:
+            Names of the partitions created
+        """
+        if not self.partitioned:
+            return []
+        if not self._is_partitioned():
+            # An existing unpartitioned table (see create_table)
+            return []
+        existing = self._partitions()
+        created = []
+        start = period_start(now or datetime.utcnow(), self.interval)
+        if f"{TABLE}_default" not in existing:
+            with self.bind.begin() as conn:
+                conn.execute(text(f"CREATE TABLE IF NOT EXISTS {TABLE}_default PARTITION OF {TABLE} DEFAULT"))
+        for _ in range(self.partitions_ahead + 1):
+            end = next_period(start, self.interval)
+            name = f"{TABLE}_{period_name(start, self.interval)}"
+            if name not in existing:
+                self._create_partition(name, start, end)
+                created.append(name)
+            start = end
+        if created:
+            logger.info(f"Created history partitions: {', '.join(created)}")
+        return created
+    
+    def _create_partition(self, name: str, start: datetime, end: datetime):
+        """
+        Create the partition of one period
+        
+        Rows of the period may already be in the DEFAULT partition (written
+        while maintenance was behind), which makes CREATE ... PARTITION OF
+        fail. Those are moved into the new table before it is attached.
+        """
+        bounds = f"FROM ('{start.isoformat()}+00') TO ('{end.isoformat()}+00')"
+        default = f"{TABLE}_default"
+        with self.bind.begin() as conn:
+            # Keeps writers from adding rows of the period until it is attached
+            conn.execute(text(f"LOCK TABLE {default} IN ACCESS EXCLUSIVE MODE"))
+            in_default = conn.scalar(text(
+                f"SELECT EXISTS (SELECT 1 FROM {default} WHERE created_at >= :start AND created_at < :end)"
+            ), {"start": utc(start), "end": utc(end)})
+            if not in_default:
+                conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} FOR VALUES {bounds}"))
+                return
+            conn.execute(text(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+            moved = conn.execute(text(
+                f"WITH moved AS (DELETE FROM {default} WHERE created_at >= :start AND created_at < :end RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ), {"start": utc(start), "end": utc(end)})
+            conn.execute(text(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+        logger.info(f"Moved {moved.rowcount} analyses from {default} to {name}")
+    
+    def expire(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Archive and remove the periods older than the retention window
+        
+        Native partitions are dropped in constant time; rows elsewhere (the
+        DEFAULT partition, unpartitioned tables, SQLite) are deleted in
+        chunks. Texts no analysis refers to anymore are removed as well.
+        
+        Returns:
+            Number of analyses removed per expired period (for dropped
+            partitions, the number archived)
+        """
+        if self.retention_days is None:
+            return {}
+        interval = self.interval or "daily"
+        expire_before = period_start((now or datetime.utcnow()) - timedelta(days=self.retention_days), interval)
+        expired = {}
+        
+        if self.partitioned:
+            for partition in sorted(self._partitions()):
+                name = partition[len(TABLE) + 1:]
+                try:
+                    start = datetime.strptime(name, "p%Y%m" if interval == "monthly" else "p%Y%m%d")
+                except ValueError:
+                    # The DEFAULT partition, or one of another interval
+                    continue
+                end = next_period(start, interval)
+                if end > expire_before:
+                    continue
+                rows = self._archive(start, end, name)
+                with self.bind.begin() as conn:
+                    conn.execute(text(f"DROP TABLE IF EXISTS {partition}"))
+                expired[name] = rows
+                logger.info(f"Dropped history partition {partition}")
+        
+        # Rows outside native partitions, oldest period first
+        oldest = select(func.min(SentimentAnalysis.created_at)).where(SentimentAnalysis.created_at < utc(expire_before))
+        while True:
+            with Session(self.bind) as db:
+                moment = db.scalar(oldest)
+            if moment is None:
+                break
+            start = period_start(crud.naive_utc(moment), interval)
+            end = next_period(start, interval)
+            name = period_name(start, interval)
+            self._archive(start, end, name)
+            rows = self._delete_period(start, end)
+            expired[name] = expired.get(name, 0) + rows
+            logger.info(f"Expired {rows} analyses of {name}")
+        
+        if expired:
+            self._delete_orphan_texts(expire_before)
+        # Timelines and score histograms cover the same window as the history
+        with self.bind.begin() as conn:
+            for model in (AnalysisRollup, ScoreHistogram):
+                conn.execute(delete(model).where(model.bucket < expire_before))
+        return expired
+    
+    def _period_filter(self, start: datetime, end: datetime):
+        return (SentimentAnalysis.created_at >= utc(start), SentimentAnalysis.created_at < utc(end))
+    
+    def _delete_period(self, start: datetime, end: datetime) -> int:
+        """Delete one period's analyses, a chunk per transaction"""
+        deleted = 0
+        chunk = select(SentimentAnalysis.id).where(*self._period_filter(start, end)).limit(self.chunk_size)
+        with Session(self.bind) as db:
+            while True:
+                rows = db.execute(
+                    delete(SentimentAnalysis).where(SentimentAnalysis.id.in_(chunk.scalar_subquery()))
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                db.commit()
+                deleted += rows
+                if rows < self.chunk_size:
+                    return deleted
+    
+    def _delete_orphan_texts(self, before: datetime) -> int:
+        """
+        Delete texts first seen before `before` that no analysis refers to
+        
+        Each chunk holds the text store lock exclusively, so writers that
+        reuse a stored text have either committed their analyses (and the
+        reference is seen) or not started storing yet (and store it again).
+        """
+        referenced = select(SentimentAnalysis.id).where(SentimentAnalysis.text_hash == AnalyzedText.hash).exists()
+        chunk = (
+            select(AnalyzedText.hash).where(AnalyzedText.created_at < utc(before), ~referenced).limit(self.chunk_size)
+        )
+        deleted = 0
+        with Session(self.bind) as db:
+            while True:
+                crud.lock_text_store(db, exclusive=True)
+                rows = db.execute(
+                    delete(AnalyzedText).where(AnalyzedText.hash.in_(chunk.scalar_subquery()), ~referenced)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                db.commit()
+                deleted += rows
+                if rows < self.chunk_size:
+                    break
+        if deleted:
+            logger.info(f"Deleted {deleted} texts no longer referenced")
+        return deleted
+    
+    def _archive(self, start: datetime, end: datetime, name: str) -> int:
+        """
+        Export one period's analyses to {archive_dir}/sentiment_analyses_{name}.parquet
+        
+        Rows are streamed in chunks into a zstd-compressed file, written
+        under a temporary name and renamed once complete, so a period is
+        only dropped after its archive exists.
+        
+        Returns:
+            Number of analyses exported (0 without an archive directory)
+        """
+        if not self.archive_dir:
+            return 0
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"{TABLE}_{name}.parquet")
+        with Session(self.bind) as db:
+            query = export.export_query(start_date=utc(start), end_date=utc(end))
+            chunks = export.iter_chunks(db, query, self.chunk_size)
+            rows = export.write_parquet(chunks, f"{path}.tmp")
+        if rows:
+            os.replace(f"{path}.tmp", path)
+            logger.info(f"Archived {rows} analyses to {path}")
+        else:
+            os.remove(f"{path}.tmp")
+        return rows
+    
+    def run(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Create upcoming partitions, then expire old periods
+        
+        On PostgreSQL, workers take turns through an advisory lock; a
+        worker that finds maintenance already running skips this round.
+        """
+        if self.bind.dialect.name != "postgresql":
+            self.ensure_partitions(now)
+            return self.expire(now)
+        with self.bind.connect() as conn:
+            if not conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY}):
+                return {}
+            try:
+                self.ensure_partitions(now)
+                return self.expire(now)
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+    
+    async def run_periodically(self, interval_s: float):
+        """Run maintenance every `interval_s` seconds, off the event loop, until cancelled"""
+        while True:
+            try:
+                await asyncio.to_thread(self.run)
+            except Exception as e:
+                logger.error(f"History maintenance failed: {str(e)}")
+            await asyncio.sleep(interval_s)
+
+
+def create_history_maintenance(settings, bind: Engine) -> Optional[HistoryMaintenance]:
+    """Build history maintenance from application settings, None when not configured"""
+    if not settings.HISTORY_PARTITION_INTERVAL and settings.HISTORY_RETENTION_DAYS is None:
+        return None
+    return HistoryMaintenance(
+        bind,
+        interval=settings.HISTORY_PARTITION_INTERVAL,
+        partitions_ahead=settings.HISTORY_PARTITIONS_AHEAD,
+        retention_days=settings.HISTORY_RETENTION_DAYS,
+        archive_dir=settings.HISTORY_ARCHIVE_DIR
+    )
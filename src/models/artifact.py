@@ -0,0 +1,139 @@
+"""
+Self-contained model artifacts
+Saves the tokenizer and weights in safetensors format so the API can start
+without contacting the HuggingFace hub
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Manifest written next to the weights, marks a directory as a prepared artifact
+MANIFEST_FILE = "artifact.json"
+
+ARTIFACT_DTYPES = ("float32", "float16", "bfloat16")
+QUANTIZE_MODES = ("none", "dynamic-int8")
+
+
+def is_model_artifact(path: Optional[str]) -> bool:
+    """Check whether a directory contains a prepared model artifact"""
+    return bool(path) and os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    """
+    Read the manifest of a prepared model artifact
+    
+    Raises:
+        FileNotFoundError: If the directory is not a prepared artifact
+    """
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.isfile(manifest_path):
+        raise FileNotFoundError(f"No model artifact manifest found at {manifest_path}")
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def prepare_model_artifact(
+    model_name: str,
+    output_dir: str,
+    cache_dir: Optional[str] = None,
+    dtype: str = "float32",
+    quantize: str = "none"
+) -> Dict[str, Any]:
+    """
+    Download a model once and save it as a self-contained artifact
+    
+    Args:
+        model_name: Name of the pre-trained model from HuggingFace
+        output_dir: Directory to write the artifact to
+        cache_dir: HuggingFace cache directory used for the download
+        dtype: Storage dtype of the weights ('float32', 'float16', 'bfloat16').
+            Reduced precision halves the artifact size; weights are upcast
+            to float32 again when loaded on CPU.
+        quantize: 'none' or 'dynamic-int8'. Dynamically quantized weights
+            cannot be stored in safetensors, so the mode is recorded in the
+            manifest and applied when the artifact is loaded.
+    
+    Returns:
+        The manifest written to the artifact directory
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    
+    if dtype not in ARTIFACT_DTYPES:
+        raise ValueError(f"Invalid dtype '{dtype}', expected one of {ARTIFACT_DTYPES}")
+    if quantize not in QUANTIZE_MODES:
+        raise ValueError(f"Invalid quantize mode '{quantize}', expected one of {QUANTIZE_MODES}")
+    
+    logger.info(f"Preparing model artifact for {model_name} in {output_dir}")
+    os.makedirs(output_dir, exist_ok=True)
+    
+    tokenizer = AutoTokenizer.from_pretrained(model_name, cache_dir=cache_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(
+        model_name,
+        cache_dir=cache_dir,
+        low_cpu_mem_usage=True
+    )
+    model = model.to(getattr(torch, dtype))
+    
+    tokenizer.save_pretrained(output_dir)
+    model.save_pretrained(output_dir, safe_serialization=True)
+    
+    manifest = {
+        "model_name": model_name,
+        "format": "safetensors",
+        "dtype": dtype,
+        "quantize": quantize,
+        "created_at": datetime.utcnow().isoformat(),
+        "files": sorted(os.listdir(output_dir))
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    
+    logger.info(f"Model artifact written to {output_dir}")
+    return manifest
+
+
+def main(argv=None):
+    """Command line entry point: prepare-model"""
+    parser = argparse.ArgumentParser(
+        description="Save a sentiment model as a self-contained, offline-loadable artifact"
+    )
+    parser.add_argument(
+        "--model-name",
+        default=os.getenv("MODEL_NAME", "distilbert-base-uncased-finetuned-sst-2-english"),
+        help="HuggingFace model to package"
+    )
+    parser.add_argument(
+        "--output",
+        default=os.getenv("MODEL_ARTIFACT_DIR", "./model-artifact"),
+        help="Directory to write the artifact to"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.getenv("MODEL_CACHE_DIR", "./models"),
+        help="HuggingFace cache directory used for the download"
+    )
+    parser.add_argument("--dtype", choices=ARTIFACT_DTYPES, default="float32")
+    parser.add_argument("--quantize", choices=QUANTIZE_MODES, default="none")
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    manifest = prepare_model_artifact(
+        model_name=args.model_name,
+        output_dir=args.output,
+        cache_dir=args.cache_dir,
+        dtype=args.dtype,
+        quantize=args.quantize
+    )
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,504 @@
+"""
+Micro-batching of concurrent inference requests
+Requests arriving within a short window are scored in one model call,
+and identical texts in flight at the same time are scored only once
+"""
+
+import asyncio
+import contextvars
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
+import logging
+
+from models.cache import ResultCache
+from utils.metrics import INFERENCE_BATCH_SIZE, INFERENCE_COALESCED, INFERENCE_QUEUE_WAIT, INFERENCE_SKIPPED
+from utils.tracing import clear_current_span, get_tracer
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Share of batch slots per priority class when both have work queued
+DEFAULT_PRIORITY_WEIGHTS = {INTERACTIVE: 8.0, BULK: 1.0}
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before its texts were scored"""
+
+
+class _PendingItem:
+    """A text waiting in the batcher queue"""
+    
+    __slots__ = (
+        "text", "return_all_scores", "future", "enqueued_at", "span_context", "priority", "deadline"
+    )
+    
+    def __init__(
+        self,
+        text: str,
+        return_all_scores: bool,
+        future: asyncio.Future,
+        span_context=None,
+        priority: str = INTERACTIVE,
+        deadline: Optional[float] = None
+    ):
+        self.text = text
+        self.return_all_scores = return_all_scores
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        # Trace of the request, carried across the batch boundary
+        self.span_context = span_context
+        self.priority = priority
+        # time.perf_counter() after which nobody wants the result
+        self.deadline = deadline
+
+
+class _Lane:
+    """Queue of one priority class"""
+    
+    __slots__ = ("weight", "items", "virtual_time", "queue_wait_histogram")
+    
+    def __init__(self, weight: float, queue_wait_histogram):
+        self.weight = weight
+        self.items = deque()
+        # Virtual start time of the next item (start-time fair queuing)
+        self.virtual_time = 0.0
+        self.queue_wait_histogram = queue_wait_histogram
+
+
+class _Flight:
+    """A queued text and the requests waiting for its result"""
+    
+    __slots__ = ("item", "waiters")
+    
+    def __init__(self, item: _PendingItem):
+        self.item = item
+        self.waiters = 0
+    
+    @property
+    def future(self) -> asyncio.Future:
+        return self.item.future
+    
+    def extend_deadline(self, deadline: Optional[float]):
+        """Keep the text wanted until the latest deadline of its waiters"""
+        if self.item.deadline is not None:
+            self.item.deadline = None if deadline is None else max(self.item.deadline, deadline)
+    
+    async def wait(self, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Wait for the shared result
+        
+        One waiter going away does not cancel the others; the inference
+        is only dropped once nobody is left waiting for it.
+        
+        Raises:
+            DeadlineExceeded: If the deadline passes first
+        """
+        self.waiters += 1
+        try:
+            timeout = None if deadline is None else deadline - time.perf_counter()
+            return await asyncio.wait_for(asyncio.shield(self.future), timeout)
+        except asyncio.TimeoutError:
+            # Left queued: the batcher drops it as expired once every waiter's deadline passed
+            raise DeadlineExceeded("Deadline exceeded while waiting for inference")
+        except asyncio.CancelledError:
+            if self.waiters == 1 and not self.future.done():
+                self.future.cancel()
+            raise
+        finally:
+            self.waiters -= 1
+
+
+class MicroBatcher:
+    """
+    Collect concurrent requests for one model into batches
+    
+    Inference runs on a dedicated worker thread so the event loop stays
+    responsive, and results are cached per model.
+    
+    Each priority class has its own queue. Batches are filled by weighted
+    fair queuing, so interactive requests overtake queued bulk work while
+    bulk work still gets its share of every batch.
+    """
+    
+    def __init__(
+        self,
+        analyzer,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        cache: Optional[ResultCache] = None,
+        name: str = "default",
+        priority_weights: Optional[Dict[str, float]] = None,
+        bulk_chunk_size: Optional[int] = None
+    ):
+        """
+        Initialize the batcher
+        
+        Args:
+            analyzer: SentimentAnalyzer used for inference
+            max_batch_size: Maximum number of texts per model call
+            max_wait_ms: How long to wait for more requests before running
+                a partial batch
+            cache: Result cache checked before queueing (optional)
+            name: Model name used as the metrics label
+            priority_weights: Priority class -> relative share of batch
+                slots (defaults to interactive 8, bulk 1)
+            bulk_chunk_size: Texts of a submit_many call queued at a time,
+                so other requests can go ahead between chunks (defaults
+                to max_batch_size)
+        
+        Raises:
+            ValueError: If a priority weight is not positive
+        """
+        self.analyzer = analyzer
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.cache = cache
+        self.name = name
+        self._batch_size_histogram = INFERENCE_BATCH_SIZE.labels(name)
+        self._in_flight_coalesced = INFERENCE_COALESCED.labels(name, "in_flight")
+        self._batch_coalesced = INFERENCE_COALESCED.labels(name, "batch")
+        self._skipped_cancelled = INFERENCE_SKIPPED.labels(name, "cancelled")
+        self._skipped_expired = INFERENCE_SKIPPED.labels(name, "expired")
+        # (text, return_all_scores) -> flight, for texts queued or being scored
+        self._in_flight: Dict[tuple, _Flight] = {}
+        self.priority_weights = dict(priority_weights or DEFAULT_PRIORITY_WEIGHTS)
+        if any(weight <= 0 for weight in self.priority_weights.values()):
+            raise ValueError("Priority weights must be positive")
+        self.bulk_chunk_size = bulk_chunk_size or max_batch_size
+        self._lanes = {
+            priority: _Lane(weight, INFERENCE_QUEUE_WAIT.labels(name, priority))
+            for priority, weight in self.priority_weights.items()
+        }
+        self._virtual_clock = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closed = False
+    
+    def _ensure_worker(self):
+        """Start the worker task on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._in_flight = {}
+            for lane in self._lanes.values():
+                lane.items.clear()
+            self._worker = loop.create_task(self._run())
+    
+    def _check_priority(self, priority: str):
+        if priority not in self._lanes:
+            raise ValueError(
+                f"Unknown priority '{priority}'. Available priorities: {', '.join(self._lanes)}"
+            )
+    
+    async def submit(
+        self,
+        text: str,
+        return_all_scores: bool = False,
+        priority: str = INTERACTIVE,
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyze one text, batched with other concurrent requests
+        
+        If the same text is already queued or being scored, the request
+        waits for that result instead of running inference again (moving
+        it to this request's queue if that one has the higher weight).
+        
+        Args:
+            text: Text to analyze
+            return_all_scores: Return scores for all labels
+            priority: Priority class
+            deadline: time.perf_counter() value after which the result is
+                no longer wanted; the text is dropped from the queue if it
+                has not been scored by then
+        
+        Returns:
+            Same dictionary as SentimentAnalyzer.analyze_batch produces per text
+        
+        Raises:
+            ValueError: If the text is empty or the priority is unknown
+            DeadlineExceeded: If the deadline passes first
+        """
+        if self._closed:
+            raise RuntimeError("Batcher is closed")
+        if not text or text.isspace():
+            raise ValueError("Text cannot be empty")
+        self._check_priority(priority)
+        if deadline is not None and time.perf_counter() >= deadline:
+            self._skipped_expired.inc()
+            raise DeadlineExceeded("Deadline exceeded before inference")
+        
+        with get_tracer().start_span("batcher.submit", {"model": self.name, "priority": priority}) as span:
+            key = (text, return_all_scores)
+            if self.cache is not None:
+                cached = self.cache.get(key)
+                span.set_attribute("cache.hit", cached is not None)
+                if cached is not None:
+                    return dict(cached)
+            
+            self._ensure_worker()
+            flight = self._in_flight.get(key)
+            span.set_attribute("coalesced", flight is not None)
+            if flight is None:
+                flight = self._start_flight(key, span.context if span.recording else None, priority, deadline)
+            else:
+                self._in_flight_coalesced.inc()
+                flight.extend_deadline(deadline)
+                self._promote(flight.item, priority)
+            return dict(await flight.wait(deadline))
+    
+    def _start_flight(self, key: tuple, span_context, priority: str, deadline: Optional[float]) -> _Flight:
+        """Queue a text and register it as in flight until it resolves"""
+        text, return_all_scores = key
+        future = self._loop.create_future()
+        item = _PendingItem(text, return_all_scores, future, span_context, priority, deadline)
+        flight = _Flight(item)
+        self._in_flight[key] = flight
+        
+        def forget(_):
+            if self._in_flight.get(key) is flight:
+                del self._in_flight[key]
+            if future.cancelled():
+                # Everyone went away: take the text out of the queue now
+                self._discard_queued(item)
+            else:
+                # Waiters that timed out never read the exception
+                future.exception()
+        
+        future.add_done_callback(forget)
+        self._enqueue(item)
+        return flight
+    
+    def _enqueue(self, item: _PendingItem):
+        lane = self._lanes[item.priority]
+        if not lane.items:
+            # A lane that was idle does not get credit for the time it had nothing queued
+            lane.virtual_time = max(lane.virtual_time, self._virtual_clock)
+        lane.items.append(item)
+        self._wakeup.set()
+    
+    def _discard_queued(self, item: _PendingItem):
+        try:
+            self._lanes[item.priority].items.remove(item)
+        except ValueError:
+            # Already in a batch; counted there if still not started
+            return
+        self._skipped_cancelled.inc()
+    
+    def _drop(self, item: _PendingItem, now: float) -> bool:
+        """Whether an item taken for a batch no longer needs scoring, counting the work saved"""
+        if item.future.cancelled():
+            self._skipped_cancelled.inc()
+            return True
+        if item.deadline is not None and now >= item.deadline and not item.future.done():
+            item.future.set_exception(DeadlineExceeded("Deadline exceeded in the batch queue"))
+            self._skipped_expired.inc()
+            return True
+        return item.future.done()
+    
+    def _promote(self, item: _PendingItem, priority: str):
+        """Move a still-queued item to a lane with a higher weight"""
+        if self._lanes[priority].weight <= self._lanes[item.priority].weight:
+            return
+        try:
+            self._lanes[item.priority].items.remove(item)
+        except ValueError:
+            # Already taken into a batch
+            return
+        item.priority = priority
+        self._enqueue(item)
+    
+    def _pop(self) -> _PendingItem:
+        """Take the next item: the lane with the earliest virtual start time goes first"""
+        lane = min(
+            (lane for lane in self._lanes.values() if lane.items),
+            key=lambda lane: (lane.virtual_time, -lane.weight)
+        )
+        self._virtual_clock = lane.virtual_time
+        lane.virtual_time += 1.0 / lane.weight
+        return lane.items.popleft()
+    
+    async def submit_many(
+        self,
+        texts: List[str],
+        return_all_scores: bool = False,
+        priority: str = BULK,
+        deadline: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Analyze several texts; empty texts are skipped like in analyze_batch
+        
+        Duplicate texts are scored once and the result is copied to each
+        position. Texts are queued bulk_chunk_size at a time, so a large
+        call yields to other requests between chunks, and stops there once
+        the deadline has passed or the caller is cancelled.
+        
+        Raises:
+            ValueError: If the list is empty, every text is empty or the
+                priority is unknown
+            DeadlineExceeded: If the deadline passes first
+        """
+        if not texts:
+            raise ValueError("Texts list cannot be empty")
+        valid_texts = [t for t in texts if t and not t.isspace()]
+        if not valid_texts:
+            raise ValueError("All texts are empty")
+        self._check_priority(priority)
+        
+        unique_texts = list(dict.fromkeys(valid_texts))
+        if len(unique_texts) < len(valid_texts):
+            self._batch_coalesced.inc(len(valid_texts) - len(unique_texts))
+        
+        results = []
+        for start in range(0, len(unique_texts), self.bulk_chunk_size):
+            if deadline is not None and time.perf_counter() >= deadline:
+                self._skipped_expired.inc(len(unique_texts) - start)
+                raise DeadlineExceeded("Deadline exceeded between chunks")
+            chunk = unique_texts[start:start + self.bulk_chunk_size]
+            try:
+                results.extend(await asyncio.gather(
+                    *(self.submit(text, return_all_scores, priority, deadline) for text in chunk)
+                ))
+            except DeadlineExceeded:
+                # Later chunks are never queued
+                self._skipped_expired.inc(len(unique_texts) - start - len(chunk))
+                raise
+        by_text = dict(zip(unique_texts, results))
+        return [dict(by_text[text]) for text in valid_texts]
+    
+    async def _collect_batch(self) -> List[_PendingItem]:
+        """Wait for the first live item, then gather more until full or timed out"""
+        batch = []
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            if self.queue_depth:
+                item = self._pop()
+                if not self._drop(item, time.perf_counter()):
+                    batch.append(item)
+                continue
+            if not batch:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                deadline = time.perf_counter() + self.max_wait_ms / 1000
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    async def _run(self):
+        """Worker loop: collect a batch, run it off the event loop, resolve futures"""
+        # The task inherited the context of the request that started it
+        clear_current_span()
+        tracer = get_tracer()
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+            now = time.perf_counter()
+            batch = [item for item in batch if not self._drop(item, now)]
+            
+            started_at = time.perf_counter()
+            started_ns = time.time_ns()
+            for item in batch:
+                wait = started_at - item.enqueued_at
+                self._lanes[item.priority].queue_wait_histogram.observe(wait)
+                tracer.record_span(
+                    "batcher.queue_wait",
+                    started_ns - int(wait * 1e9),
+                    started_ns,
+                    parent=item.span_context
+                )
+            
+            for return_all_scores in (False, True):
+                # Re-checked per model call: the first one may outlive later deadlines
+                now = time.perf_counter()
+                items = [
+                    item for item in batch
+                    if item.return_all_scores == return_all_scores and not self._drop(item, now)
+                ]
+                if not items:
+                    continue
+                texts = [item.text for item in items]
+                self._batch_size_histogram.observe(len(texts))
+                
+                # The batch joins the first sampled trace and links the others
+                contexts = [item.span_context for item in items if item.span_context is not None]
+                batch_span = tracer.start_span(
+                    "inference.batch",
+                    {"model": self.name, "batch.size": len(texts)},
+                    parent=contexts[0],
+                    links=contexts[1:]
+                ) if contexts else nullcontext()
+                try:
+                    with batch_span:
+                        # Run in a copy of this context so analyzer spans nest under the batch
+                        context = contextvars.copy_context()
+                        results = await loop.run_in_executor(
+                            self._executor,
+                            lambda: context.run(
+                                self.analyzer.analyze_batch,
+                                texts,
+                                batch_size=len(texts),
+                                return_all_scores=return_all_scores
+                            )
+                        )
+                except Exception as e:
+                    logger.error(f"Error in batched inference: {str(e)}")
+                    for item in items:
+                        if not item.future.done():
+                            item.future.set_exception(e)
+                    continue
+                
+                for item, result in zip(items, results):
+                    if self.cache is not None:
+                        self.cache.put((item.text, return_all_scores), result)
+                    if not item.future.done():
+                        item.future.set_result(result)
+    
+    async def run_in_worker(self, func, *args):
+        """Run a function on the inference thread, between batches"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+    
+    def close(self):
+        """Stop the worker and release the inference thread"""
+        self._closed = True
+        if self._worker is not None and not self._worker.done():
+            try:
+                self._loop.call_soon_threadsafe(self._worker.cancel)
+            except RuntimeError:
+                # Event loop already closed
+                pass
+        self._executor.shutdown(wait=False)
+    
+    @property
+    def queue_depth(self) -> int:
+        """Number of texts waiting for a batch"""
+        return sum(len(lane.items) for lane in self._lanes.values())
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue and cache statistics"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": self.queue_depth,
+            "queue_depth_by_priority": {
+                priority: len(lane.items) for priority, lane in self._lanes.items()
+            },
+            "priority_weights": self.priority_weights,
+            "in_flight": len(self._in_flight),
+            "cache": self.cache.get_stats() if self.cache is not None else None
+        }
@@ -0,0 +1,86 @@
+"""
+In-memory LRU cache for sentiment analysis results
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from utils.metrics import RESULT_CACHE_REQUESTS
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of analysis results
+    
+    Keys are (text, return_all_scores) tuples; each model has its own
+    cache so results of different models never mix.
+    """
+    
+    def __init__(self, max_size: int = 1024, name: str = "default"):
+        """
+        Initialize the cache
+        
+        Args:
+            max_size: Maximum number of cached results (0 disables caching)
+            name: Model name used as the metrics label
+        """
+        self.max_size = max_size
+        self.name = name
+        self._hit_counter = RESULT_CACHE_REQUESTS.labels(name, "hit")
+        self._miss_counter = RESULT_CACHE_REQUESTS.labels(name, "miss")
+        self._data: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Return the cached result for `key`, or None"""
+        with self._lock:
+            result = self._data.get(key)
+            if result is None:
+                self.misses += 1
+                self._miss_counter.inc()
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        self._hit_counter.inc()
+        return result
+    
+    def put(self, key: Hashable, result: Dict[str, Any]):
+        """Store a result, evicting the least recently used one if full"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = result
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+    
+    def clear(self):
+        """Drop all cached results"""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        """Check for a result without counting a lookup or refreshing it"""
+        return key in self._data
+    
+    @property
+    def hit_ratio(self) -> float:
+        """Fraction of lookups served from the cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache size and hit ratio"""
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hit_ratio, 4)
+        }
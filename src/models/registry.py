@@ -0,0 +1,467 @@
+"""
+Model registry
+Serves several sentiment models side by side, loading them on first use
+and unloading idle ones (least recently used first) under a memory budget;
+the default model stays loaded
+"""
+
+import asyncio
+import gc
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+from models.batcher import MicroBatcher
+from models.cache import ResultCache
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ModelEntry:
+    """A loaded model together with its own batcher and result cache"""
+    
+    def __init__(self, name: str, analyzer, batcher: MicroBatcher, cache: ResultCache):
+        self.name = name
+        self.analyzer = analyzer
+        self.batcher = batcher
+        self.cache = cache
+        self.in_flight = 0
+        self.loaded_at = time.time()
+        self.last_used = time.time()
+        # Set when a newer version replaced this one; freed once idle
+        self.retired = False
+    
+    @property
+    def weights_mb(self) -> float:
+        """Memory taken by the model weights"""
+        return getattr(self.analyzer, "weights_mb", None) or 0.0
+    
+    def get_info(self) -> Dict[str, Any]:
+        """Get model, usage and batcher information"""
+        return {
+            "name": self.name,
+            "model_name": self.analyzer.model_name,
+            "weights_mb": self.weights_mb,
+            "in_flight": self.in_flight,
+            "loaded_at": self.loaded_at,
+            "last_used": self.last_used,
+            "batcher": self.batcher.get_stats()
+        }
+
+
+class ModelRegistry:
+    """
+    Registry of the sentiment models this process can serve
+    
+    Models are addressed by alias (e.g. 'en', 'es'). Each alias maps to a
+    HuggingFace model name or a prepared artifact directory.
+    """
+    
+    def __init__(
+        self,
+        models: Dict[str, str],
+        default_model: str,
+        memory_budget_mb: Optional[float] = None,
+        analyzer_kwargs: Optional[Dict[str, Any]] = None,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        cache_size: int = 1024,
+        priority_weights: Optional[Dict[str, float]] = None,
+        bulk_chunk_size: Optional[int] = None,
+        loader: Optional[Callable[..., Any]] = None
+    ):
+        """
+        Initialize the registry (no model is loaded yet)
+        
+        Args:
+            models: Alias -> model name or artifact directory
+            default_model: Alias used when a request does not pick a model
+            memory_budget_mb: Total weight size allowed in memory; idle
+                models other than the default are unloaded LRU-first when
+                it is exceeded
+            analyzer_kwargs: Extra SentimentAnalyzer arguments (device,
+                warmup, mmap_weights, ...) used for every model
+            max_batch_size: Micro-batch size of each model's batcher
+            max_wait_ms: Micro-batch wait time of each model's batcher
+            cache_size: Result cache size of each model
+            priority_weights: Batch share per priority class of each
+                model's batcher
+            bulk_chunk_size: Texts of a bulk request queued at a time
+            loader: Factory creating an analyzer from a model spec
+                (defaults to SentimentAnalyzer)
+        """
+        if default_model not in models:
+            raise ValueError(f"Default model '{default_model}' is not in the registry")
+        
+        self.models = dict(models)
+        self.default_model = default_model
+        self.memory_budget_mb = memory_budget_mb
+        self.analyzer_kwargs = analyzer_kwargs or {}
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.cache_size = cache_size
+        self.priority_weights = priority_weights
+        self.bulk_chunk_size = bulk_chunk_size
+        self._loader = loader or self._default_loader
+        self._entries: "OrderedDict[str, ModelEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_locks: Dict[str, threading.Lock] = {name: threading.Lock() for name in self.models}
+        self._previous: Dict[str, str] = {}
+        self.evictions = 0
+        self.swaps = 0
+    
+    def _default_loader(self, spec: str, **kwargs):
+        """Load a SentimentAnalyzer from a model name or artifact directory"""
+        from models.artifact import is_model_artifact
+        from models.sentiment_model import SentimentAnalyzer
+        
+        if is_model_artifact(spec):
+            return SentimentAnalyzer(artifact_dir=spec, **kwargs)
+        return SentimentAnalyzer(model_name=spec, **kwargs)
+    
+    def resolve(self, name: Optional[str] = None) -> str:
+        """
+        Map a requested model to its alias
+        
+        Accepts an alias or the underlying model name.
+        
+        Raises:
+            ValueError: If the model is not served by this registry
+        """
+        if not name:
+            return self.default_model
+        if name in self.models:
+            return name
+        for alias, spec in self.models.items():
+            if spec == name:
+                return alias
+        raise ValueError(
+            f"Unknown model '{name}'. Available models: {', '.join(self.models)}"
+        )
+    
+    def get(self, name: Optional[str] = None) -> ModelEntry:
+        """
+        Get a model entry, loading the model if needed
+        
+        Blocks while loading; use `acquire` from async code.
+        """
+        alias = self.resolve(name)
+        with self._lock:
+            entry = self._entries.get(alias)
+            if entry is not None:
+                self._entries.move_to_end(alias)
+                entry.last_used = time.time()
+                return entry
+        
+        # Load outside the registry lock so other models stay available
+        with self._load_locks[alias]:
+            with self._lock:
+                entry = self._entries.get(alias)
+            if entry is None:
+                entry = self._load(alias)
+        return entry
+    
+    def _create_entry(self, alias: str, analyzer) -> ModelEntry:
+        """Wrap an analyzer with a fresh batcher and result cache"""
+        analyzer.metrics_label = alias
+        cache = ResultCache(max_size=self.cache_size, name=alias)
+        batcher = MicroBatcher(
+            analyzer,
+            max_batch_size=self.max_batch_size,
+            max_wait_ms=self.max_wait_ms,
+            cache=cache,
+            name=alias,
+            priority_weights=self.priority_weights,
+            bulk_chunk_size=self.bulk_chunk_size
+        )
+        return ModelEntry(alias, analyzer, batcher, cache)
+    
+    def _load(self, alias: str) -> ModelEntry:
+        """Load a model and register it, then enforce the memory budget"""
+        logger.info(f"Loading model '{alias}' ({self.models[alias]})")
+        analyzer = self._loader(self.models[alias], **self.analyzer_kwargs)
+        entry = self._create_entry(alias, analyzer)
+        
+        with self._lock:
+            self._entries[alias] = entry
+            evicted = self._enforce_budget(keep=alias)
+        self._release_all(evicted)
+        return entry
+    
+    def _enforce_budget(self, keep: str) -> List[ModelEntry]:
+        """
+        Unload idle models, least recently used first, until within budget (never the default)
+        
+        Returns:
+            The unloaded entries, for the caller to release outside the lock
+        """
+        evicted = []
+        if not self.memory_budget_mb:
+            return evicted
+        for alias in list(self._entries):
+            if self.loaded_memory_mb() <= self.memory_budget_mb:
+                break
+            entry = self._entries[alias]
+            if alias in (keep, self.default_model) or entry.in_flight > 0:
+                continue
+            evicted.append(self._unload(alias))
+        
+        if self.loaded_memory_mb() > self.memory_budget_mb:
+            logger.warning(
+                f"Loaded models use {self.loaded_memory_mb():.0f}MB, "
+                f"above the {self.memory_budget_mb:.0f}MB budget (default model or models in use)"
+            )
+        return evicted
+    
+    def _unload(self, alias: str) -> ModelEntry:
+        """Remove a model from the registry; the caller releases it outside the lock"""
+        entry = self._entries.pop(alias)
+        logger.info(f"Unloading model '{alias}' ({entry.weights_mb:.0f}MB)")
+        self.evictions += 1
+        return entry
+    
+    def _release(self, entry: ModelEntry):
+        """
+        Stop an entry's batcher and drop references to its model
+        
+        Joins the batcher's worker and runs a full collection, so it is
+        called without the registry lock and off the event loop.
+        """
+        entry.batcher.close()
+        entry.cache.clear()
+        entry.analyzer = None
+        gc.collect()
+    
+    def _release_all(self, entries: List[ModelEntry]):
+        """Release entries taken out of the registry"""
+        for entry in entries:
+            self._release(entry)
+    
+    def swap(self, name: str, spec: str) -> ModelEntry:
+        """
+        Replace a model with a new version without downtime
+        
+        The new version is loaded, warmed up and checked with a probe
+        prediction while the current one keeps serving. The registry
+        reference is then swapped atomically: new requests use the new
+        version, in-flight requests finish on the old one, and the old
+        version is freed once its last request completes. If loading or
+        the probe fails, the current version stays in place.
+        
+        Args:
+            name: Alias (or model name) to replace
+            spec: Model name or artifact directory of the new version
+        
+        Returns:
+            The new model entry
+        """
+        alias = self.resolve(name)
+        with self._load_locks[alias]:
+            logger.info(f"Loading new version of '{alias}': {spec}")
+            analyzer = self._loader(spec, **{**self.analyzer_kwargs, "warmup": True})
+            probe = analyzer.analyze_batch(["Model swap probe: this works great."])
+            if not probe or "label" not in probe[0]:
+                raise RuntimeError(f"New version of '{alias}' returned an invalid prediction")
+            
+            new_entry = self._create_entry(alias, analyzer)
+            with self._lock:
+                old_entry = self._entries.get(alias)
+                self._previous[alias] = self.models[alias]
+                self.models[alias] = spec
+                self._entries[alias] = new_entry
+                self._entries.move_to_end(alias)
+                self.swaps += 1
+                released = self._enforce_budget(keep=alias)
+                if old_entry is not None and self._retire(old_entry):
+                    released.append(old_entry)
+            self._release_all(released)
+        
+        logger.info(f"Swapped '{alias}' to {spec} (previous: {self._previous[alias]})")
+        return new_entry
+    
+    def rollback(self, name: str) -> ModelEntry:
+        """
+        Swap a model back to the version it had before the last swap
+        
+        Raises:
+            ValueError: If the model was never swapped
+        """
+        alias = self.resolve(name)
+        previous = self._previous.get(alias)
+        if previous is None:
+            raise ValueError(f"Model '{alias}' has no previous version to roll back to")
+        return self.swap(alias, previous)
+    
+    def _retire(self, entry: ModelEntry) -> bool:
+        """
+        Mark a replaced entry for release once its requests have finished
+        
+        Returns:
+            True if it is idle already, and the caller releases it
+        """
+        entry.retired = True
+        return entry.in_flight == 0
+    
+    def unload(self, name: str) -> bool:
+        """
+        Unload a model if it is loaded and idle (the default model stays loaded)
+        
+        Returns:
+            True if the model was unloaded
+        """
+        alias = self.resolve(name)
+        with self._lock:
+            entry = self._entries.get(alias)
+            if entry is None or entry.in_flight > 0 or alias == self.default_model:
+                return False
+            self._unload(alias)
+        self._release(entry)
+        return True
+    
+    async def acquire(self, name: Optional[str] = None) -> ModelEntry:
+        """Get a model entry, loading it on a worker thread if needed"""
+        alias = self.resolve(name)
+        with self._lock:
+            entry = self._entries.get(alias)
+        if entry is not None:
+            return self.get(alias)
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, alias)
+    
+    @asynccontextmanager
+    async def use(self, name: Optional[str] = None):
+        """
+        Use a model for the duration of a request
+        
+        The model is not unloaded while requests are using it. A retired
+        version is released on a worker thread after its last request.
+        """
+        while True:
+            entry = await self.acquire(name)
+            with self._lock:
+                # A swap or eviction may have replaced the entry since the lookup
+                if self._entries.get(entry.name) is entry:
+                    entry.in_flight += 1
+                    break
+        try:
+            yield entry
+        finally:
+            with self._lock:
+                entry.in_flight -= 1
+                entry.last_used = time.time()
+                release = entry.retired and entry.in_flight == 0
+            if release:
+                await asyncio.get_running_loop().run_in_executor(None, self._release, entry)
+    
+    def loaded_memory_mb(self) -> float:
+        """Total weight size of the loaded models"""
+        return sum(entry.weights_mb for entry in self._entries.values())
+    
+    def is_loaded(self, name: Optional[str] = None) -> bool:
+        """Check whether a model is currently loaded"""
+        return self.resolve(name) in self._entries
+    
+    def get_info(self) -> Dict[str, Any]:
+        """Get available and loaded models"""
+        with self._lock:
+            loaded = {alias: entry.get_info() for alias, entry in self._entries.items()}
+        return {
+            "default_model": self.default_model,
+            "available_models": dict(self.models),
+            "loaded_models": loaded,
+            "loaded_memory_mb": round(self.loaded_memory_mb(), 2),
+            "memory_budget_mb": self.memory_budget_mb,
+            "previous_models": dict(self._previous),
+            "evictions": self.evictions,
+            "swaps": self.swaps
+        }
+    
+    def close(self):
+        """Unload every model"""
+        with self._lock:
+            entries = [self._unload(alias) for alias in list(self._entries)]
+        self._release_all(entries)
+
+
+# Process-wide registry used by the API
+_registry_instance: Optional[ModelRegistry] = None
+
+
+def get_registry() -> Optional[ModelRegistry]:
+    """Get the process-wide model registry, if one was set"""
+    return _registry_instance
+
+
+def set_registry(registry: Optional[ModelRegistry]):
+    """Set the process-wide model registry"""
+    global _registry_instance
+    _registry_instance = registry
+
+
+def _cache_hit_ratios() -> Dict[tuple, float]:
+    """Result cache hit ratio of every loaded model"""
+    registry = get_registry()
+    if registry is None:
+        return {}
+    with registry._lock:
+        entries = list(registry._entries.items())
+    return {(alias,): entry.cache.hit_ratio for alias, entry in entries}
+
+
+def _queue_depths() -> Dict[tuple, int]:
+    """Micro-batch queue depth of every loaded model"""
+    registry = get_registry()
+    if registry is None:
+        return {}
+    with registry._lock:
+        entries = list(registry._entries.items())
+    return {(alias,): entry.batcher.queue_depth for alias, entry in entries}
+
+
+metrics.gauge(
+    "result_cache_hit_ratio",
+    "Fraction of result cache lookups served from the cache",
+    _cache_hit_ratios,
+    ("model",)
+)
+metrics.gauge(
+    "inference_queue_depth",
+    "Texts waiting in the micro-batch queue",
+    _queue_depths,
+    ("model",)
+)
+
+
+def create_registry_from_settings(settings) -> ModelRegistry:
+    """
+    Build a registry from application settings
+    
+    Without MODELS configured, the registry serves MODEL_NAME (or
+    MODEL_ARTIFACT_DIR) under the alias 'default'.
+    """
+    models = dict(settings.MODELS or {})
+    if not models:
+        models = {"default": settings.MODEL_ARTIFACT_DIR or settings.MODEL_NAME}
+    default_model = settings.DEFAULT_MODEL or next(iter(models))
+    
+    return ModelRegistry(
+        models=models,
+        default_model=default_model,
+        memory_budget_mb=settings.MODEL_MEMORY_BUDGET_MB,
+        analyzer_kwargs={
+            "cache_dir": settings.MODEL_CACHE_DIR,
+            "mmap_weights": settings.MODEL_MMAP_WEIGHTS,
+            "warmup": settings.MODEL_WARMUP_ENABLED,
+            "warmup_seq_lengths": settings.MODEL_WARMUP_SEQ_LENGTHS,
+            "warmup_batch_sizes": settings.MODEL_WARMUP_BATCH_SIZES,
+            "compile_mode": settings.MODEL_COMPILE_MODE
+        },
+        max_batch_size=settings.BATCH_MAX_SIZE,
+        max_wait_ms=settings.BATCH_MAX_WAIT_MS,
+        cache_size=settings.RESULT_CACHE_SIZE,
+        priority_weights=settings.BATCH_PRIORITY_WEIGHTS,
+        bulk_chunk_size=settings.BATCH_BULK_CHUNK_SIZE
+    )
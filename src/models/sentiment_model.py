@@ -4,17 +4,68 @@ Uses pre-trained transformer models for sentiment classification
 """
 
 import os
-from typing import Dict, List, Union
+import time
+from typing import Any, Dict, List, Optional, Sequence, Union
 import torch
 from transformers import (
     AutoTokenizer,
     AutoModelForSequenceClassification,
     pipeline
 )
+from transformers.modeling_outputs import SequenceClassifierOutput
 import logging
 
+from models.artifact import load_manifest
+from models.weights import load_model_mmap
+from utils.metrics import INFERENCE_STAGE_DURATION
+from utils.tracing import get_tracer, traced
+
 logger = logging.getLogger(__name__)
 
+# Default shapes exercised during warmup
+DEFAULT_WARMUP_SEQ_LENGTHS = (16, 64, 128)
+DEFAULT_WARMUP_BATCH_SIZES = (1, 8)
+
+COMPILE_MODES = ("none", "trace", "compile")
+
+# Pipeline methods timed for the inference stage histogram
+PIPELINE_STAGES = (
+    ("preprocess", "tokenize"),
+    ("_forward", "forward"),
+    ("postprocess", "postprocess"),
+)
+
+
+class _TracedSequenceClassifier(torch.nn.Module):
+    """
+    Wrap a TorchScript-traced classifier so the pipeline can call it
+    exactly like the original HuggingFace model
+    """
+    
+    def __init__(self, model: torch.nn.Module, example_inputs: Dict[str, torch.Tensor]):
+        super().__init__()
+        self.config = model.config
+        self._dtype = model.dtype
+        self._device = model.device
+        self.traced = torch.jit.trace(
+            model,
+            example_kwarg_inputs=example_inputs,
+            strict=False
+        )
+    
+    @property
+    def dtype(self) -> torch.dtype:
+        return self._dtype
+    
+    @property
+    def device(self) -> torch.device:
+        return self._device
+    
+    def forward(self, input_ids=None, attention_mask=None, **kwargs):
+        outputs = self.traced(input_ids=input_ids, attention_mask=attention_mask)
+        logits = outputs["logits"] if isinstance(outputs, dict) else outputs[0]
+        return SequenceClassifierOutput(logits=logits)
+
 
 class SentimentAnalyzer:
     """
@@ -25,7 +76,13 @@ class SentimentAnalyzer:
         self,
         model_name: str = "distilbert-base-uncased-finetuned-sst-2-english",
         device: str = None,
-        cache_dir: str = None
+        cache_dir: str = None,
+        warmup: bool = False,
+        warmup_seq_lengths: Optional[Sequence[int]] = None,
+        warmup_batch_sizes: Optional[Sequence[int]] = None,
+        compile_mode: Optional[str] = None,
+        artifact_dir: Optional[str] = None,
+        mmap_weights: bool = False
     ):
         """
         Initialize the sentiment analyzer
@@ -34,9 +91,40 @@ class SentimentAnalyzer:
             model_name: Name of the pre-trained model from HuggingFace
             device: Device to run the model on ('cuda', 'cpu', or None for auto)
             cache_dir: Directory to cache the model
+            warmup: Run synthetic batches after loading so the first real
+                request does not pay for allocator growth and kernel selection
+            warmup_seq_lengths: Sequence lengths (in tokens) used for warmup
+            warmup_batch_sizes: Batch sizes used for warmup
+            compile_mode: 'none', 'trace' (torch.jit.trace) or 'compile'
+                (torch.compile). Falls back to eager mode on failure.
+            artifact_dir: Directory created by `prepare-model`. When set, the
+                model is loaded from it without any hub lookups and
+                `model_name` is taken from the artifact manifest.
+            mmap_weights: Load safetensors weights through a copy-on-write
+                memory map so pages are file-backed, lazily loaded and shared
+                between worker processes
         """
+        self.artifact_dir = artifact_dir
+        self.artifact_manifest = load_manifest(artifact_dir) if artifact_dir else None
+        if self.artifact_manifest:
+            model_name = self.artifact_manifest["model_name"]
         self.model_name = model_name
+        # Label of the stage metrics; the registry replaces it with the alias
+        self.metrics_label = model_name
         self.cache_dir = cache_dir or os.getenv("MODEL_CACHE_DIR", "./models")
+        self.warmup = warmup
+        self.warmup_seq_lengths = list(warmup_seq_lengths or DEFAULT_WARMUP_SEQ_LENGTHS)
+        self.warmup_batch_sizes = list(warmup_batch_sizes or DEFAULT_WARMUP_BATCH_SIZES)
+        self.compile_mode = (compile_mode or "none").lower()
+        if self.compile_mode not in COMPILE_MODES:
+            raise ValueError(
+                f"Invalid compile_mode '{compile_mode}', expected one of {COMPILE_MODES}"
+            )
+        self.warmup_stats: Dict[str, Any] = {}
+        self.load_time_ms: Optional[float] = None
+        self.mmap_weights = mmap_weights
+        self.weights_mb: Optional[float] = None
+        self._weight_mappings = []
         
         # Determine device
         if device is None:
@@ -45,6 +133,8 @@ class SentimentAnalyzer:
             self.device = 0 if device == "cuda" and torch.cuda.is_available() else -1
         
         logger.info(f"Initializing model: {model_name}")
+        if artifact_dir:
+            logger.info(f"Loading from prepared artifact: {artifact_dir}")
         logger.info(f"Using device: {'GPU' if self.device == 0 else 'CPU'}")
         
         # Load model and create pipeline
@@ -52,32 +142,249 @@ class SentimentAnalyzer:
     
     def _load_model(self):
         """Load the model and tokenizer with memory optimization"""
+        start_time = time.perf_counter()
         try:
             import gc
             
-            # Create sentiment analysis pipeline with memory optimization
-            self.pipeline = pipeline(
-                "sentiment-analysis",
-                model=self.model_name,
-                tokenizer=self.model_name,
-                device=self.device,
-                model_kwargs={
-                    "cache_dir": self.cache_dir,
-                    "torch_dtype": torch.float32,
-                    "low_cpu_mem_usage": True
-                }
-            )
+            if self.artifact_dir or self.mmap_weights:
+                # Local safetensors (prepared artifact and/or mmap), no hub lookups
+                model, tokenizer = self._load_local_model()
+                self.pipeline = pipeline(
+                    "sentiment-analysis",
+                    model=model,
+                    tokenizer=tokenizer,
+                    device=self.device
+                )
+            else:
+                # Create sentiment analysis pipeline with memory optimization
+                self.pipeline = pipeline(
+                    "sentiment-analysis",
+                    model=self.model_name,
+                    tokenizer=self.model_name,
+                    device=self.device,
+                    model_kwargs={
+                        "cache_dir": self.cache_dir,
+                        "torch_dtype": torch.float32,
+                        "low_cpu_mem_usage": True
+                    }
+                )
             
             # Clear memory after loading
             gc.collect()
             if torch.cuda.is_available():
                 torch.cuda.empty_cache()
             
+            self.load_time_ms = round((time.perf_counter() - start_time) * 1000, 2)
+            self.weights_mb = round(sum(
+                tensor.numel() * tensor.element_size()
+                for tensor in self.pipeline.model.state_dict().values()
+                if torch.is_tensor(tensor)
+            ) / (1024 * 1024), 2)
             logger.info("Model loaded successfully with memory optimization")
         except Exception as e:
             logger.error(f"Error loading model: {str(e)}")
             raise
+        
+        if self.compile_mode != "none":
+            self._compile_model()
+        
+        if self.warmup:
+            self._run_warmup()
+        
+        self._instrument_pipeline()
+    
+    def _instrument_pipeline(self):
+        """
+        Time the tokenize, forward and postprocess stages of every call
+        
+        Wrapped after warmup so synthetic batches stay out of the metrics.
+        Tokenize and postprocess are timed per text, forward per batch.
+        """
+        for method_name, stage in PIPELINE_STAGES:
+            method = getattr(self.pipeline, method_name)
+            setattr(self.pipeline, method_name, self._timed_stage(method, stage))
+    
+    def _timed_stage(self, method, stage: str):
+        """Wrap a pipeline method to record its duration and a tracing span"""
+        span_name = f"analyzer.{stage}"
+        
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                with get_tracer().start_span(span_name):
+                    return method(*args, **kwargs)
+            finally:
+                INFERENCE_STAGE_DURATION.labels(self.metrics_label, stage).observe(
+                    time.perf_counter() - start
+                )
+        return timed
+    
+    def _resolve_model_dir(self) -> str:
+        """Local directory holding the model files, downloading them if needed"""
+        if self.artifact_dir:
+            return self.artifact_dir
+        if os.path.isdir(self.model_name):
+            return self.model_name
+        from huggingface_hub import snapshot_download
+        return snapshot_download(self.model_name, cache_dir=self.cache_dir)
+    
+    def _load_local_model(self):
+        """
+        Load tokenizer and weights from a local model directory
+        
+        Safetensors files are memory-mapped by transformers, and
+        `local_files_only` guarantees no network access. With `mmap_weights`
+        the parameters keep pointing into the mapping instead of being
+        copied into private memory.
+        """
+        model_dir = self._resolve_model_dir()
+        tokenizer = AutoTokenizer.from_pretrained(model_dir, local_files_only=True)
+        
+        model = None
+        if self.mmap_weights:
+            try:
+                model, self._weight_mappings = load_model_mmap(model_dir)
+            except FileNotFoundError as e:
+                logger.warning(f"Memory-mapped loading unavailable, using a regular load: {str(e)}")
+                self.mmap_weights = False
+        
+        if model is None:
+            model = AutoModelForSequenceClassification.from_pretrained(
+                model_dir,
+                local_files_only=True,
+                use_safetensors=True,
+                torch_dtype=torch.float32,
+                low_cpu_mem_usage=True
+            )
+            model.eval()
+        
+        if self.artifact_manifest and self.artifact_manifest.get("quantize") == "dynamic-int8":
+            # Quantized Linear weights live in private memory, even with mmap
+            model = torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            logger.info("Applied dynamic int8 quantization from artifact manifest")
+        
+        return model, tokenizer
+    
+    def _synthetic_text(self, seq_len: int) -> str:
+        """Build a text that tokenizes to roughly `seq_len` tokens"""
+        # Leave room for the special tokens added by the tokenizer
+        return " ".join(["good"] * max(1, seq_len - 2))
+    
+    def _warmup_seq_lengths(self) -> List[int]:
+        """Warmup sequence lengths clamped to what the tokenizer accepts"""
+        max_len = getattr(self.pipeline.tokenizer, "model_max_length", 512)
+        if not isinstance(max_len, int) or max_len > 100_000:
+            max_len = 512
+        return sorted({min(seq_len, max_len) for seq_len in self.warmup_seq_lengths})
+    
+    def _model_inputs(self, texts: List[str], device) -> Dict[str, torch.Tensor]:
+        """Padded input_ids and attention_mask for `texts`"""
+        inputs = self.pipeline.tokenizer(texts, padding=True, return_tensors="pt")
+        return {
+            key: value.to(device)
+            for key, value in inputs.items()
+            if key in ("input_ids", "attention_mask")
+        }
+    
+    def _validate_traced(self, eager: torch.nn.Module, traced: torch.nn.Module, seq_len: int):
+        """
+        Compare a traced model with the eager one at another sequence length
+        
+        Tracing records the shapes of its example, so a graph that only
+        works at that length is caught here rather than by the first
+        request of a different length (warmup may be disabled).
+        
+        Raises:
+            RuntimeError: If the traced model fails or disagrees with eager
+        """
+        inputs = self._model_inputs([self._synthetic_text(seq_len)] * 2, eager.device)
+        with torch.inference_mode():
+            expected = eager(**inputs).logits
+            actual = traced(**inputs).logits
+        if actual.shape != expected.shape or not torch.allclose(actual, expected, atol=1e-4):
+            raise RuntimeError(f"traced model output differs from eager at sequence length {seq_len}")
     
+    def _compile_model(self):
+        """
+        Replace the pipeline model with a traced or compiled version
+        
+        Any failure leaves the eager model in place.
+        """
+        model = self.pipeline.model
+        try:
+            if self.compile_mode == "trace":
+                seq_lengths = self._warmup_seq_lengths()
+                example = self._model_inputs([self._synthetic_text(seq_lengths[-1])], model.device)
+                with torch.inference_mode():
+                    traced = _TracedSequenceClassifier(model, example)
+                # Check at a shorter length (and another batch size) than the example
+                check_len = seq_lengths[0] if len(seq_lengths) > 1 else max(1, seq_lengths[0] // 2)
+                self._validate_traced(model, traced, check_len)
+                self.pipeline.model = traced
+            elif self.compile_mode == "compile":
+                self.pipeline.model = torch.compile(model, dynamic=True)
+            logger.info(f"Model prepared with compile mode: {self.compile_mode}")
+        except Exception as e:
+            logger.warning(
+                f"Model {self.compile_mode} failed, using eager mode: {str(e)}"
+            )
+            self.pipeline.model = model
+            self.compile_mode = "none"
+    
+    def _run_warmup(self):
+        """
+        Run synthetic batches over the configured sequence lengths and batch sizes
+        
+        The same probe text is timed before and after warmup so the
+        first-request improvement can be reported in get_model_info.
+        """
+        start_time = time.perf_counter()
+        seq_lengths = self._warmup_seq_lengths()
+        probe = self._synthetic_text(seq_lengths[0])
+        
+        try:
+            cold_latency = self._time_inference([probe])
+        except Exception as e:
+            if self.compile_mode == "none":
+                raise
+            # Lazy compilation (torch.compile) fails on the first call
+            logger.warning(
+                f"Compiled model failed during warmup, using eager mode: {str(e)}"
+            )
+            self.pipeline.model = getattr(self.pipeline.model, "_orig_mod", self.pipeline.model)
+            self.compile_mode = "none"
+            cold_latency = self._time_inference([probe])
+        
+        for seq_len in seq_lengths:
+            text = self._synthetic_text(seq_len)
+            for batch_size in self.warmup_batch_sizes:
+                self.pipeline([text] * batch_size, batch_size=batch_size)
+        
+        warm_latency = self._time_inference([probe])
+        warmup_time = (time.perf_counter() - start_time) * 1000
+        
+        self.warmup_stats = {
+            "warmup_time_ms": round(warmup_time, 2),
+            "cold_latency_ms": round(cold_latency, 2),
+            "warm_latency_ms": round(warm_latency, 2),
+            "first_request_speedup": round(cold_latency / warm_latency, 2) if warm_latency > 0 else None,
+            "seq_lengths": seq_lengths,
+            "batch_sizes": list(self.warmup_batch_sizes)
+        }
+        logger.info(
+            f"Warmup finished in {warmup_time:.0f}ms "
+            f"(first request {cold_latency:.1f}ms -> {warm_latency:.1f}ms)"
+        )
+    
+    def _time_inference(self, texts: List[str]) -> float:
+        """Run one inference and return its latency in milliseconds"""
+        start_time = time.perf_counter()
+        self.pipeline(texts, batch_size=len(texts))
+        return (time.perf_counter() - start_time) * 1000
+    
+    @traced("analyzer.analyze")
     def analyze(self, text: str, return_all_scores: bool = False) -> Dict[str, Union[str, float, List]]:
         """
         Analyze sentiment of a single text
@@ -111,6 +418,7 @@ class SentimentAnalyzer:
             logger.error(f"Error analyzing text: {str(e)}")
             raise
     
+    @traced("analyzer.analyze_batch")
     def analyze_batch(
         self,
         texts: List[str],
@@ -131,8 +439,8 @@ class SentimentAnalyzer:
         if not texts:
             raise ValueError("Texts list cannot be empty")
         
-        # Filter empty texts
-        valid_texts = [t for t in texts if t and t.strip()]
+        # Filter empty texts (isspace() checks without copying each text)
+        valid_texts = [t for t in texts if t and not t.isspace()]
         
         if not valid_texts:
             raise ValueError("All texts are empty")
@@ -165,7 +473,7 @@ class SentimentAnalyzer:
             logger.error(f"Error in batch analysis: {str(e)}")
             raise
     
-    def get_model_info(self) -> Dict[str, str]:
+    def get_model_info(self) -> Dict[str, Any]:
         """
         Get information about the loaded model
         
@@ -175,26 +483,42 @@ class SentimentAnalyzer:
         return {
             "model_name": self.model_name,
             "device": "GPU" if self.device == 0 else "CPU",
-            "cache_dir": self.cache_dir
+            "cache_dir": self.cache_dir,
+            "artifact_dir": self.artifact_dir,
+            "load_time_ms": self.load_time_ms,
+            "mmap_weights": self.mmap_weights,
+            "weights_mb": self.weights_mb,
+            "compile_mode": self.compile_mode,
+            "warmup": self.warmup_stats or None
         }
 
 
-# Singleton instance for the API
+# Fallback singleton, used when no model registry is set
 _analyzer_instance = None
 
 
 def get_analyzer(
     model_name: str = None,
     device: str = None,
-    cache_dir: str = None
+    cache_dir: str = None,
+    **kwargs
 ) -> SentimentAnalyzer:
     """
-    Get or create a singleton instance of SentimentAnalyzer
+    Get the analyzer for a model
     
-    This ensures we only load the model once for the entire application
+    When the process-wide ModelRegistry is set (the API sets it on
+    startup), the model is looked up there and `model_name` may be an
+    alias or a registered model name. Otherwise a single instance is
+    created on first call and reused. Extra keyword arguments (warmup,
+    compile_mode, ...) are passed to SentimentAnalyzer on creation.
     """
     global _analyzer_instance
     
+    from models.registry import get_registry
+    registry = get_registry()
+    if registry is not None:
+        return registry.get(model_name).analyzer
+    
     if _analyzer_instance is None:
         model_name = model_name or os.getenv(
             "MODEL_NAME",
@@ -203,7 +527,8 @@ def get_analyzer(
         _analyzer_instance = SentimentAnalyzer(
             model_name=model_name,
             device=device,
-            cache_dir=cache_dir
+            cache_dir=cache_dir,
+            **kwargs
         )
     
     return _analyzer_instance
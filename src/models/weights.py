@@ -0,0 +1,162 @@
+"""
+Memory-mapped safetensors weight loading
+Parameters point straight into a copy-on-write mapping of the weights file,
+so pages are file-backed, loaded lazily and shared between worker processes
+"""
+
+import json
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+import torch
+import logging
+
+logger = logging.getLogger(__name__)
+
+SAFETENSORS_FILE = "model.safetensors"
+SAFETENSORS_INDEX_FILE = "model.safetensors.index.json"
+
+# safetensors dtype codes -> torch dtypes
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def find_safetensors_files(model_dir: str) -> List[str]:
+    """
+    List the safetensors weight files of a model directory
+    
+    Returns an empty list when the model only ships pickle weights.
+    """
+    index_path = os.path.join(model_dir, SAFETENSORS_INDEX_FILE)
+    if os.path.isfile(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            weight_map = json.load(f)["weight_map"]
+        return [os.path.join(model_dir, name) for name in sorted(set(weight_map.values()))]
+    
+    single_path = os.path.join(model_dir, SAFETENSORS_FILE)
+    return [single_path] if os.path.isfile(single_path) else []
+
+
+def mmap_safetensors(path: str) -> Tuple[Dict[str, torch.Tensor], mmap.mmap]:
+    """
+    Map a safetensors file and build tensors that view the mapping
+    
+    The mapping uses ACCESS_COPY (MAP_PRIVATE): pages stay shared with the
+    page cache until written, which inference never does.
+    
+    Returns:
+        Tuple of (state dict, mapping). The tensors keep the mapping alive.
+    """
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    
+    data_start = 8 + header_size
+    state_dict = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = SAFETENSORS_DTYPES[info["dtype"]]
+        shape = info["shape"]
+        begin, end = info["data_offsets"]
+        if end == begin:
+            state_dict[name] = torch.empty(shape, dtype=dtype)
+            continue
+        numel = (end - begin) // torch.empty((), dtype=dtype).element_size()
+        state_dict[name] = torch.frombuffer(
+            mapping,
+            dtype=dtype,
+            count=numel,
+            offset=data_start + begin
+        ).reshape(shape)
+    
+    return state_dict, mapping
+
+
+@contextmanager
+def empty_parameters():
+    """
+    Create module parameters on the meta device
+    
+    Buffers are still materialized, since many of them (position ids,
+    token type ids) are not saved in the weights file.
+    """
+    original_register = torch.nn.Module.register_parameter
+    
+    def register_parameter(module, name, param):
+        original_register(module, name, param)
+        if param is not None:
+            param = module._parameters[name]
+            module._parameters[name] = type(param)(
+                param.to("meta"), requires_grad=param.requires_grad
+            )
+    
+    torch.nn.Module.register_parameter = register_parameter
+    try:
+        yield
+    finally:
+        torch.nn.Module.register_parameter = original_register
+
+
+def load_model_mmap(model_dir: str, dtype: torch.dtype = torch.float32):
+    """
+    Load a sequence classification model with memory-mapped weights
+    
+    Args:
+        model_dir: Local directory with config.json and safetensors weights
+        dtype: Compute dtype. Weights stored in another dtype are converted,
+            which copies them into private memory.
+    
+    Returns:
+        Tuple of (model, list of mappings backing its parameters)
+    
+    Raises:
+        FileNotFoundError: If the directory has no safetensors weights
+        RuntimeError: If the weights do not cover every model parameter
+    """
+    from transformers import AutoConfig, AutoModelForSequenceClassification
+    
+    files = find_safetensors_files(model_dir)
+    if not files:
+        raise FileNotFoundError(f"No safetensors weights found in {model_dir}")
+    
+    config = AutoConfig.from_pretrained(model_dir, local_files_only=True)
+    with empty_parameters():
+        model = AutoModelForSequenceClassification.from_config(config)
+    
+    state_dict = {}
+    mappings = []
+    for path in files:
+        tensors, mapping = mmap_safetensors(path)
+        state_dict.update(tensors)
+        mappings.append(mapping)
+    
+    if dtype is not None:
+        state_dict = {
+            name: tensor.to(dtype) if tensor.is_floating_point() and tensor.dtype != dtype else tensor
+            for name, tensor in state_dict.items()
+        }
+    
+    model.load_state_dict(state_dict, strict=False, assign=True)
+    model.tie_weights()
+    
+    missing = [name for name, param in model.named_parameters() if param.is_meta]
+    if missing:
+        raise RuntimeError(f"Weights missing from {model_dir}: {', '.join(missing)}")
+    
+    model.eval()
+    logger.info(f"Memory-mapped {len(files)} safetensors file(s) from {model_dir}")
+    return model, mappings
@@ -0,0 +1,135 @@
+"""
+Score distribution summaries and drift measures from histograms
+
+Histograms are lists of bin counts of width 1 / len(histogram) over
+[0, 1], as kept in the score_histograms table, so quantiles are exact to
+within one bin.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Sequence
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# Population stability index bins (merged from the finer histogram bins)
+PSI_BINS = 10
+
+
+def merge(histograms: Iterable[Sequence[int]]) -> List[int]:
+    """Sum histograms bin by bin (an empty list if there are none)"""
+    return [sum(counts) for counts in zip(*histograms)]
+
+
+def quantile(histogram: Sequence[int], q: float) -> Optional[float]:
+    """Score below which a fraction `q` of the analyses fall, interpolated within a bin"""
+    total = sum(histogram)
+    if not total:
+        return None
+    width = 1 / len(histogram)
+    target = q * total
+    seen = 0
+    for index, count in enumerate(histogram):
+        if count and seen + count >= target:
+            return round((index + (target - seen) / count) * width, 4)
+        seen += count
+    return 1.0
+
+
+def low_confidence_rate(histogram: Sequence[int], threshold: float) -> float:
+    """Fraction of analyses scored below `threshold` (rounded down to a bin edge)"""
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    return sum(histogram[:int(threshold * len(histogram))]) / total
+
+
+def summarize(histogram: Sequence[int], threshold: float) -> Dict:
+    """Count, quantiles and low-confidence rate of one histogram"""
+    return {
+        "count": sum(histogram),
+        "quantiles": {
+            f"p{round(q * 100):02d}": value
+            for q in QUANTILES
+            if (value := quantile(histogram, q)) is not None
+        },
+        "low_confidence_rate": round(low_confidence_rate(histogram, threshold), 4)
+    }
+
+
+def _cdf(histogram: Sequence[int]) -> List[float]:
+    total = sum(histogram)
+    cdf, seen = [], 0
+    for count in histogram:
+        seen += count
+        cdf.append(seen / total)
+    return cdf
+
+
+def ks_statistic(current: Sequence[int], baseline: Sequence[int]) -> Optional[float]:
+    """Largest gap between the two cumulative score distributions (Kolmogorov-Smirnov)"""
+    if not sum(current) or not sum(baseline):
+        return None
+    return round(max(abs(a - b) for a, b in zip(_cdf(current), _cdf(baseline))), 4)
+
+
+def psi(current: Sequence[int], baseline: Sequence[int], bins: int = PSI_BINS, epsilon: float = 1e-4) -> Optional[float]:
+    """
+    Population stability index of the current distribution against the baseline
+    
+    Computed over `bins` equal-width score bins; empty bins count as
+    `epsilon`. Values above about 0.2 are usually read as a significant shift.
+    """
+    total_current, total_baseline = sum(current), sum(baseline)
+    if not total_current or not total_baseline:
+        return None
+    step = len(current) // bins
+    value = 0.0
+    for start in range(0, len(current), step):
+        p = max(sum(current[start:start + step]) / total_current, epsilon)
+        q = max(sum(baseline[start:start + step]) / total_baseline, epsilon)
+        value += (p - q) * math.log(p / q)
+    return round(value, 4)
+
+
+def compare(current: Sequence[int], baseline: Sequence[int], threshold: float) -> Dict:
+    """Shift of the score distribution between two windows"""
+    medians = quantile(current, 0.5), quantile(baseline, 0.5)
+    return {
+        "median_shift": round(medians[0] - medians[1], 4) if None not in medians else None,
+        "low_confidence_rate_change": round(
+            low_confidence_rate(current, threshold) - low_confidence_rate(baseline, threshold), 4
+        ),
+        "psi": psi(current, baseline),
+        "ks": ks_statistic(current, baseline)
+    }
+
+
+def _label_mix(by_label: Dict[str, Sequence[int]]) -> Dict[str, float]:
+    total = sum(sum(counts) for counts in by_label.values())
+    return {label: round(sum(counts) / total, 4) for label, counts in sorted(by_label.items())}
+
+
+def describe(by_label: Dict[str, Sequence[int]], threshold: float) -> Dict:
+    """Total, label mix and score summaries of a window's per-label histograms"""
+    return {
+        "total": sum(sum(counts) for counts in by_label.values()),
+        "label_mix": _label_mix(by_label),
+        "scores": summarize(merge(by_label.values()), threshold),
+        "labels": {label: summarize(counts, threshold) for label, counts in sorted(by_label.items())}
+    }
+
+
+def compare_windows(current: Dict[str, Sequence[int]], baseline: Dict[str, Sequence[int]], threshold: float) -> Dict:
+    """Label mix change and score shifts, overall and per label, between two windows"""
+    current_mix, baseline_mix = _label_mix(current), _label_mix(baseline)
+    labels = sorted(current.keys() | baseline.keys())
+    empty = [0] * next((len(counts) for counts in (*current.values(), *baseline.values())), 0)
+    return {
+        "label_mix_change": {
+            label: round(current_mix.get(label, 0.0) - baseline_mix.get(label, 0.0), 4) for label in labels
+        },
+        "scores": compare(merge(current.values()) or empty, merge(baseline.values()) or empty, threshold),
+        "labels": {
+            label: compare(current.get(label, empty), baseline.get(label, empty), threshold) for label in labels
+        }
+    }
@@ -5,6 +5,7 @@ For deployment on platforms with limited memory (512MB)
 
 import os
 import gc
+from typing import Dict, Optional
 
 
 def optimize_memory():
@@ -38,6 +39,80 @@ def get_optimized_pipeline_kwargs():
     }
 
 
+def _read_proc_kb(path: str, fields) -> Optional[Dict[str, int]]:
+    """Read `Field:   123 kB` style lines from a /proc file"""
+    try:
+        values = {}
+        with open(path, "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in fields:
+                    values[key] = int(rest.split()[0])
+        return values
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def get_memory_usage() -> Dict[str, Optional[float]]:
+    """
+    Get memory usage of the current process in MB
+    
+    On Linux this reads /proc/self/smaps_rollup, which reports PSS
+    (proportional share of pages shared with other workers) and splits
+    RSS into shared and private, file-backed and anonymous pages.
+    Elsewhere only the peak RSS is available.
+    
+    Returns:
+        Dictionary with rss_mb, pss_mb, shared_mb, private_mb,
+        anonymous_mb, file_backed_mb and peak_rss_mb
+    """
+    usage = {
+        "rss_mb": None,
+        "pss_mb": None,
+        "shared_mb": None,
+        "private_mb": None,
+        "anonymous_mb": None,
+        "file_backed_mb": None,
+        "peak_rss_mb": None
+    }
+    
+    rollup = _read_proc_kb(
+        "/proc/self/smaps_rollup",
+        ("Rss", "Pss", "Shared_Clean", "Shared_Dirty",
+         "Private_Clean", "Private_Dirty", "Anonymous")
+    )
+    if rollup:
+        usage["rss_mb"] = rollup["Rss"] / 1024
+        usage["pss_mb"] = rollup["Pss"] / 1024
+        usage["shared_mb"] = (rollup["Shared_Clean"] + rollup["Shared_Dirty"]) / 1024
+        usage["private_mb"] = (rollup["Private_Clean"] + rollup["Private_Dirty"]) / 1024
+        usage["anonymous_mb"] = rollup["Anonymous"] / 1024
+        usage["file_backed_mb"] = (rollup["Rss"] - rollup["Anonymous"]) / 1024
+    
+    status = _read_proc_kb("/proc/self/status", ("VmRSS", "VmHWM"))
+    if status:
+        usage["rss_mb"] = usage["rss_mb"] or status["VmRSS"] / 1024
+        usage["peak_rss_mb"] = status["VmHWM"] / 1024
+    else:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kB on Linux
+        usage["peak_rss_mb"] = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    
+    return {key: round(value, 2) if value is not None else None for key, value in usage.items()}
+
+
+def get_current_rss_mb() -> Optional[float]:
+    """Cheap current RSS reading in MB (from /proc/self/statm)"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
 # Set optimization flags on import
 os.environ['TRANSFORMERS_NO_ADVISORY_WARNINGS'] = '1'
 os.environ['TOKENIZERS_PARALLELISM'] = 'false'
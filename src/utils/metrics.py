@@ -0,0 +1,339 @@
+"""
+Prometheus-style metrics with low-overhead, lock-free recording
+
+Every metric keeps one shard per thread. A thread only ever writes to its
+own shard, so recording needs no locks; shards are summed when /metrics
+is scraped.
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow batches
+DEFAULT_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+_get_ident = threading.get_ident
+
+
+def _escape(value) -> str:
+    """Escape a label value"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Render a Prometheus label set"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    """Counter for one label set, sharded per thread"""
+    
+    __slots__ = ("_shards",)
+    
+    def __init__(self):
+        self._shards: Dict[int, List[float]] = {}
+    
+    def inc(self, amount: float = 1.0):
+        shard = self._shards.get(_get_ident())
+        if shard is None:
+            shard = self._shards[_get_ident()] = [0.0]
+        shard[0] += amount
+    
+    def get(self) -> float:
+        return sum(shard[0] for shard in list(self._shards.values()))
+
+
+class _HistogramChild:
+    """Histogram for one label set, sharded per thread"""
+    
+    __slots__ = ("_buckets", "_shards")
+    
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        self._shards: Dict[int, List[float]] = {}
+    
+    def observe(self, value: float):
+        shard = self._shards.get(_get_ident())
+        if shard is None:
+            # One slot per bucket plus +Inf, then sum and count
+            shard = self._shards[_get_ident()] = [0.0] * (len(self._buckets) + 3)
+        shard[bisect_left(self._buckets, value)] += 1
+        shard[-2] += value
+        shard[-1] += 1
+    
+    def get(self) -> List[float]:
+        totals = [0.0] * (len(self._buckets) + 3)
+        for shard in list(self._shards.values()):
+            for i, value in enumerate(shard):
+                totals[i] += value
+        return totals
+
+
+class _Metric:
+    """Base class: a named metric with optional labels"""
+    
+    type_name = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+    
+    def _new_child(self):
+        raise NotImplementedError
+    
+    def labels(self, *values: str):
+        """Get the child metric for a set of label values"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children.setdefault(values, self._new_child())
+        return child
+    
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+    
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}"
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+    
+    type_name = "counter"
+    
+    def _new_child(self):
+        return _CounterChild()
+    
+    def inc(self, amount: float = 1.0):
+        """Increment the unlabelled counter"""
+        self.labels().inc(amount)
+    
+    def get(self, *values: str) -> float:
+        """Current value of a label set"""
+        return self.labels(*values).get()
+    
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets"""
+    
+    type_name = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+    
+    def observe(self, value: float):
+        """Record a value in the unlabelled histogram"""
+        self.labels().observe(value)
+    
+    def get_count(self, *values: str) -> float:
+        """Number of observations of a label set"""
+        return self.labels(*values).get()[-1]
+    
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            totals = child.get()
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), totals):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {_format_value(cumulative)}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(totals[-2])}"
+            yield f"{self.name}_count{labels} {_format_value(totals[-1])}"
+
+
+class Gauge(_Metric):
+    """
+    Value computed when metrics are scraped
+    
+    The callback returns a number (no labels) or a dict mapping label
+    value tuples to numbers.
+    """
+    
+    type_name = "gauge"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], object],
+        labelnames: Sequence[str] = ()
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+    
+    def _samples(self):
+        try:
+            values = self.callback()
+        except Exception:
+            return
+        if values is None:
+            return
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in values.items():
+            if value is None:
+                continue
+            yield f"{self.name}{_format_labels(self.labelnames, label_values)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the text exposition format"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+    
+    def register(self, metric: _Metric) -> _Metric:
+        """Register a metric (registering the same name twice returns the first)"""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+    
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+    
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], object],
+        labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, callback, labelnames))
+    
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+    
+    def render(self) -> str:
+        """Render every metric in Prometheus text format"""
+        return "\n".join(metric.render() for metric in list(self._metrics.values())) + "\n"
+
+
+# Process-wide metrics registry
+metrics = MetricsRegistry()
+
+
+def _process_rss_bytes() -> Optional[float]:
+    from utils.memory_optimization import get_current_rss_mb
+    rss_mb = get_current_rss_mb()
+    return rss_mb * 1024 * 1024 if rss_mb is not None else None
+
+
+# HTTP
+HTTP_REQUESTS = metrics.counter(
+    "http_requests_total",
+    "HTTP requests by method, route and status code",
+    ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = metrics.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by method and route",
+    ("method", "route")
+)
+
+RATE_LIMITED_REQUESTS = metrics.counter(
+    "rate_limited_requests_total",
+    "Requests rejected with 429 by reason (rate or concurrency)",
+    ("reason",)
+)
+
+# Inference
+INFERENCE_STAGE_DURATION = metrics.histogram(
+    "inference_stage_duration_seconds",
+    "Time spent per inference stage (tokenize, forward, postprocess)",
+    ("model", "stage")
+)
+INFERENCE_BATCH_SIZE = metrics.histogram(
+    "inference_batch_size",
+    "Number of texts per model call",
+    ("model",),
+    buckets=BATCH_SIZE_BUCKETS
+)
+INFERENCE_QUEUE_WAIT = metrics.histogram(
+    "inference_queue_wait_seconds",
+    "Time texts wait in the micro-batch queue, by priority class",
+    ("model", "priority")
+)
+INFERENCE_COALESCED = metrics.counter(
+    "inference_coalesced_requests_total",
+    "Texts that reused another request's inference (in_flight or batch duplicate)",
+    ("model", "source")
+)
+INFERENCE_SKIPPED = metrics.counter(
+    "inference_skipped_texts_total",
+    "Texts dropped before inference because every request for them was cancelled or expired",
+    ("model", "reason")
+)
+RESULT_CACHE_REQUESTS = metrics.counter(
+    "result_cache_requests_total",
+    "Result cache lookups by outcome (hit or miss)",
+    ("model", "result")
+)
+
+# Database
+DB_WRITE_DURATION = metrics.histogram(
+    "db_write_duration_seconds",
+    "Database write latency by operation",
+    ("operation",)
+)
+DB_READ_SESSIONS = metrics.counter(
+    "db_read_sessions_total",
+    "Sessions opened for read-only endpoints, by database (replica or primary)",
+    ("database",)
+)
+
+# Process
+metrics.gauge(
+    "process_resident_memory_bytes",
+    "Resident set size of this worker",
+    _process_rss_bytes
+)
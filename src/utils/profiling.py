@@ -0,0 +1,201 @@
+"""
+On-demand CPU and memory profiling
+Nothing here runs until a profile is requested
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (file name, function) of frames where threads sit idle
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("socket.py", "accept"),
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+def sample_stacks(
+    duration_s: float,
+    interval_ms: float = 5.0,
+    include_idle: bool = False
+) -> Dict[str, int]:
+    """
+    Sample the Python stacks of every thread, like py-spy
+    
+    Args:
+        duration_s: How long to sample
+        interval_ms: Time between samples
+        include_idle: Keep samples of threads blocked in waits and selects
+    
+    Returns:
+        Collapsed stacks ("thread;outer;...;inner") mapped to sample counts
+    """
+    counts: Counter = Counter()
+    own_id = threading.get_ident()
+    interval_s = interval_ms / 1000
+    deadline = time.perf_counter() + duration_s
+    
+    while time.perf_counter() < deadline:
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id or (not include_idle and _is_idle(frame)):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(thread_names.get(thread_id, str(thread_id)))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval_s)
+    
+    return dict(counts)
+
+
+def format_collapsed(counts: Dict[str, int]) -> str:
+    """Render collapsed stacks for flamegraph.pl, speedscope or inferno"""
+    return "".join(
+        f"{stack} {count}\n"
+        for stack, count in sorted(counts.items(), key=lambda item: -item[1])
+    )
+
+
+def format_pstats(profiler: cProfile.Profile, sort_by: str = "cumulative", limit: int = 50) -> str:
+    """Render a cProfile run as the usual pstats table"""
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.strip_dirs().sort_stats(sort_by).print_stats(limit)
+    return output.getvalue()
+
+
+def profile_inference(analyzer, texts: List[str], repeat: int = 1) -> Dict[str, Any]:
+    """
+    Run a batch under torch.profiler
+    
+    Args:
+        analyzer: SentimentAnalyzer to profile
+        texts: Batch to analyze
+        repeat: Number of times the batch is run
+    
+    Returns:
+        Chrome trace (open in chrome://tracing or Perfetto)
+    """
+    import torch
+    from torch.profiler import ProfilerActivity, profile
+    
+    activities = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(ProfilerActivity.CUDA)
+    
+    with profile(activities=activities, record_shapes=True) as prof:
+        for _ in range(repeat):
+            analyzer.analyze_batch(texts, batch_size=len(texts))
+    
+    fd, path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        prof.export_chrome_trace(path)
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.remove(path)
+
+
+class MemoryTracker:
+    """
+    tracemalloc snapshots compared against a baseline
+    
+    Tracing slows allocations down, so it only runs between start() and
+    stop().
+    """
+    
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._baseline_time: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def active(self) -> bool:
+        return tracemalloc.is_tracing()
+    
+    def start(self, frames: int = 10):
+        """Start tracing allocations and take the baseline snapshot"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._take_baseline()
+    
+    def _take_baseline(self):
+        self._baseline = tracemalloc.take_snapshot()
+        self._baseline_time = time.time()
+    
+    def diff(self, limit: int = 20, group_by: str = "lineno", reset: bool = False) -> Dict[str, Any]:
+        """
+        Compare the current allocations with the baseline
+        
+        Args:
+            limit: Number of allocation sites returned
+            group_by: 'lineno', 'filename' or 'traceback'
+            reset: Make the current snapshot the new baseline
+        
+        Raises:
+            ValueError: If tracing was not started
+        """
+        with self._lock:
+            if self._baseline is None or not tracemalloc.is_tracing():
+                raise ValueError("Memory tracing is not started")
+            snapshot = tracemalloc.take_snapshot()
+            stats = snapshot.compare_to(self._baseline, group_by)
+            current, peak = tracemalloc.get_traced_memory()
+            result = {
+                "baseline_time": self._baseline_time,
+                "elapsed_s": round(time.time() - self._baseline_time, 3),
+                "traced_current_mb": round(current / (1024 * 1024), 2),
+                "traced_peak_mb": round(peak / (1024 * 1024), 2),
+                "size_diff_mb": round(sum(stat.size_diff for stat in stats) / (1024 * 1024), 4),
+                "top": [
+                    {
+                        "location": str(stat.traceback),
+                        "size_diff_kb": round(stat.size_diff / 1024, 2),
+                        "size_kb": round(stat.size / 1024, 2),
+                        "count_diff": stat.count_diff,
+                        "count": stat.count
+                    }
+                    for stat in stats[:limit]
+                ]
+            }
+            if reset:
+                self._take_baseline()
+            return result
+    
+    def stop(self):
+        """Stop tracing and drop the baseline"""
+        with self._lock:
+            tracemalloc.stop()
+            self._baseline = None
+            self._baseline_time = None
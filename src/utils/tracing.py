@@ -0,0 +1,358 @@
+"""
+Lightweight OpenTelemetry-compatible tracing
+Spans carry W3C trace context IDs, propagate through contextvars and are
+handed to an exporter when they end
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXPORTERS = ("console", "memory", "none")
+
+
+class SpanContext(NamedTuple):
+    """Identity of a span, passed to children and across process boundaries"""
+    trace_id: str  # 32 hex characters
+    span_id: str  # 16 hex characters
+    sampled: bool
+
+
+class Span:
+    """A timed operation within a trace"""
+    
+    recording = True
+    
+    def __init__(
+        self,
+        name: str,
+        context: SpanContext,
+        parent_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        links: Optional[Sequence[SpanContext]] = None,
+        start_time_ns: Optional[int] = None
+    ):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.links = list(links or [])
+        self.start_time_ns = start_time_ns or time.time_ns()
+        self.end_time_ns: Optional[int] = None
+        self.status = "UNSET"
+        self.status_message: Optional[str] = None
+        # Bounds of the direct children, used to time the gaps around them
+        self.first_child_start_ns: Optional[int] = None
+        self.last_child_end_ns: Optional[int] = None
+    
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+    
+    def record_exception(self, exc: BaseException):
+        """Mark the span as failed"""
+        self.status = "ERROR"
+        self.status_message = str(exc)
+        self.attributes["exception.type"] = type(exc).__name__
+    
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_time_ns is None:
+            return None
+        return (self.end_time_ns - self.start_time_ns) / 1e6
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Span as a dictionary laid out like OTLP/JSON"""
+        return {
+            "name": self.name,
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start_time_ns,
+            "end_time_unix_nano": self.end_time_ns,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "links": [{"trace_id": link.trace_id, "span_id": link.span_id} for link in self.links],
+            "status": {"code": self.status, "message": self.status_message}
+        }
+
+
+class NonRecordingSpan:
+    """Carries the context of an unsampled trace so its children stay unsampled"""
+    
+    recording = False
+    
+    def __init__(self, context: Optional[SpanContext] = None):
+        self.context = context
+    
+    def set_attribute(self, key: str, value: Any):
+        pass
+    
+    def record_exception(self, exc: BaseException):
+        pass
+
+
+_INVALID_SPAN = NonRecordingSpan()
+_NOOP_SCOPE = nullcontext(_INVALID_SPAN)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def get_current_span() -> Optional[Union[Span, NonRecordingSpan]]:
+    """Span active in the current context, if any"""
+    return _current_span.get()
+
+
+def clear_current_span():
+    """Detach the current context from any trace (e.g. in long-lived tasks)"""
+    _current_span.set(None)
+
+
+def _new_id(bits: int) -> str:
+    return format(random.getrandbits(bits), f"0{bits // 4}x")
+
+
+# ============================================================================
+# EXPORTERS
+# ============================================================================
+
+class InMemorySpanExporter:
+    """Keep finished spans in memory (for tests)"""
+    
+    def __init__(self):
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+    
+    def export(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+    
+    def get_finished_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+    
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+class ConsoleSpanExporter:
+    """Log every finished span as one JSON line"""
+    
+    def export(self, span: Span):
+        logger.info(json.dumps(span.to_dict(), default=str))
+
+
+def create_exporter(name: str):
+    """
+    Create an exporter by name
+    
+    Raises:
+        ValueError: If the name is not one of EXPORTERS
+    """
+    name = (name or "none").lower()
+    if name not in EXPORTERS:
+        raise ValueError(f"Invalid tracing exporter '{name}', expected one of {EXPORTERS}")
+    if name == "console":
+        return ConsoleSpanExporter()
+    if name == "memory":
+        return InMemorySpanExporter()
+    return None
+
+
+# ============================================================================
+# TRACER
+# ============================================================================
+
+class Tracer:
+    """
+    Creates spans and decides which traces are sampled
+    
+    Sampling follows OpenTelemetry's parent-based trace-ID-ratio sampler:
+    a new trace is kept if the low 64 bits of its ID fall below the ratio,
+    and children inherit the decision. Unsampled and disabled spans only
+    cost a context variable lookup.
+    """
+    
+    def __init__(self, enabled: bool = False, sample_ratio: float = 1.0, exporter=None):
+        self.enabled = enabled and exporter is not None
+        self.sample_ratio = min(max(sample_ratio, 0.0), 1.0)
+        self.exporter = exporter
+        self._sample_bound = int(self.sample_ratio * (1 << 64))
+    
+    def _should_sample(self, trace_id: str) -> bool:
+        return int(trace_id[16:], 16) < self._sample_bound
+    
+    def start_span(
+        self,
+        name: str,
+        attributes: Optional[Dict[str, Any]] = None,
+        parent: Optional[SpanContext] = None,
+        links: Optional[Sequence[SpanContext]] = None
+    ):
+        """
+        Context manager running a span as the current span
+        
+        Args:
+            name: Span name
+            attributes: Initial span attributes
+            parent: Explicit parent context (e.g. from a `traceparent`
+                header); defaults to the current span
+            links: Contexts of related spans in other traces
+        """
+        if not self.enabled:
+            return _NOOP_SCOPE
+        parent_span = None
+        if parent is None:
+            parent_span = _current_span.get()
+            if parent_span is not None:
+                if not parent_span.recording:
+                    return _NOOP_SCOPE
+                parent = parent_span.context
+        return self._span_scope(name, attributes, parent, parent_span, links)
+    
+    @contextmanager
+    def _span_scope(self, name, attributes, parent, parent_span, links):
+        if parent is None:
+            trace_id = _new_id(128)
+            context = SpanContext(trace_id, _new_id(64), self._should_sample(trace_id))
+        else:
+            context = SpanContext(parent.trace_id, _new_id(64), parent.sampled)
+        
+        if context.sampled:
+            span = Span(name, context, parent.span_id if parent else None, attributes, links)
+            if parent_span is not None and parent_span.first_child_start_ns is None:
+                parent_span.first_child_start_ns = span.start_time_ns
+        else:
+            span = NonRecordingSpan(context)
+        
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            if span.recording:
+                self._end(span, parent_span)
+    
+    def record_span(
+        self,
+        name: str,
+        start_time_ns: int,
+        end_time_ns: int,
+        parent: Union[Span, SpanContext, None],
+        attributes: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Record an already finished span with explicit timestamps
+        
+        Used for intervals not wrapped by code, like time spent in a
+        queue. Nothing is recorded for missing or unsampled parents.
+        """
+        if not self.enabled or parent is None:
+            return
+        parent_context = parent.context if isinstance(parent, Span) else parent
+        if not parent_context.sampled:
+            return
+        span = Span(
+            name,
+            SpanContext(parent_context.trace_id, _new_id(64), True),
+            parent_context.span_id,
+            attributes,
+            start_time_ns=start_time_ns
+        )
+        span.end_time_ns = end_time_ns
+        self._export(span)
+    
+    def _end(self, span: Span, parent_span: Optional[Span]):
+        span.end_time_ns = time.time_ns()
+        if parent_span is not None:
+            parent_span.last_child_end_ns = span.end_time_ns
+        self._export(span)
+    
+    def _export(self, span: Span):
+        try:
+            self.exporter.export(span)
+        except Exception as e:
+            logger.warning(f"Failed to export span {span.name}: {str(e)}")
+
+
+# Process-wide tracer, disabled until configured
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Get the process-wide tracer"""
+    return _tracer
+
+
+def configure_tracing(enabled: bool, sample_ratio: float = 1.0, exporter: Any = "console") -> Tracer:
+    """
+    Replace the process-wide tracer
+    
+    Args:
+        enabled: Whether spans are recorded at all
+        sample_ratio: Fraction of new traces to record (0-1)
+        exporter: Exporter name (see EXPORTERS) or exporter object
+    
+    Returns:
+        The new tracer
+    """
+    global _tracer
+    if isinstance(exporter, str):
+        exporter = create_exporter(exporter)
+    _tracer = Tracer(enabled=enabled, sample_ratio=sample_ratio, exporter=exporter)
+    return _tracer
+
+
+def traced(name: str):
+    """Decorator running a function (sync or async) in a span"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with _tracer.start_span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _tracer.start_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ============================================================================
+# W3C TRACE CONTEXT
+# ============================================================================
+
+def format_traceparent(context: SpanContext) -> str:
+    """Format a W3C `traceparent` header value"""
+    return f"00-{context.trace_id}-{context.span_id}-{'01' if context.sampled else '00'}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    """Parse a W3C `traceparent` header value, returning None if invalid"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3][:2], 16)
+        if int(parts[1], 16) == 0 or int(parts[2], 16) == 0:
+            return None
+    except ValueError:
+        return None
+    return SpanContext(parts[1].lower(), parts[2].lower(), bool(flags & 1))
@@ -0,0 +1,68 @@
+"""
+Shared pytest fixtures
+"""
+
+import pytest
+
+
+# Small vocabulary used by the offline test model
+TINY_VOCAB = [
+    "[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]",
+    "i", "love", "this", "product", "it", "is", "amazing", "terrible",
+    "worst", "experience", "ever", "great", "bad", "good", "awful",
+    "okay", "service", "the", "a"
+]
+
+
+@pytest.fixture(scope="session")
+def tiny_model_dir(tmp_path_factory):
+    """
+    Build a tiny randomly initialised DistilBERT classifier on disk
+    
+    Lets tests exercise the real loading and inference code paths
+    without downloading weights from the HuggingFace hub.
+    """
+    import torch
+    from transformers import (
+        DistilBertConfig,
+        DistilBertForSequenceClassification,
+        DistilBertTokenizerFast
+    )
+    
+    model_dir = tmp_path_factory.mktemp("tiny-model")
+    vocab_file = model_dir / "vocab.txt"
+    vocab_file.write_text("\n".join(TINY_VOCAB))
+    
+    tokenizer = DistilBertTokenizerFast(vocab_file=str(vocab_file))
+    config = DistilBertConfig(
+        vocab_size=len(TINY_VOCAB),
+        dim=32,
+        hidden_dim=64,
+        n_layers=2,
+        n_heads=2,
+        max_position_embeddings=512,
+        id2label={0: "NEGATIVE", 1: "POSITIVE"},
+        label2id={"NEGATIVE": 0, "POSITIVE": 1}
+    )
+    torch.manual_seed(0)
+    model = DistilBertForSequenceClassification(config)
+    model.save_pretrained(str(model_dir))
+    tokenizer.save_pretrained(str(model_dir))
+    
+    return str(model_dir)
+
+
+@pytest.fixture
+def api_client(tiny_model_dir, monkeypatch):
+    """
+    Test client running the full app lifespan with the tiny offline model
+    """
+    from fastapi.testclient import TestClient
+    from api.config import settings
+    from api.main import app
+    
+    monkeypatch.setattr(settings, "MODEL_NAME", tiny_model_dir)
+    monkeypatch.setattr(settings, "MODEL_WARMUP_ENABLED", False)
+    
+    with TestClient(app) as client:
+        yield client
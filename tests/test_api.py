@@ -2,34 +2,62 @@
 API endpoint tests
 """
 
+import asyncio
+
 import pytest
 from fastapi.testclient import TestClient
 from api.main import app
 
-# Create test client
-client = TestClient(app)
+
+@pytest.fixture(scope="module")
+def pretrained_client():
+    """
+    Test client running the app lifespan with the configured model
+    
+    For tests that check the labels a real sentiment model gives.
+    """
+    with TestClient(app) as client:
+        yield client
 
 
 class TestRootEndpoint:
     """Tests for root endpoint"""
     
-    def test_root_endpoint(self):
+    def test_root_endpoint(self, api_client):
         """Test root endpoint returns welcome message"""
-        response = client.get("/")
+        response = api_client.get("/")
         assert response.status_code == 200
         
         data = response.json()
         assert "message" in data
         assert "version" in data
         assert "docs" in data
+    
+    def test_json_responses_use_orjson(self, api_client, monkeypatch):
+        """Test that routes without their own response class render with orjson"""
+        from api.responses import ORJSONResponse
+        
+        rendered = []
+        render = ORJSONResponse.render
+        
+        def recording_render(self, content):
+            rendered.append(content)
+            return render(self, content)
+        
+        monkeypatch.setattr(ORJSONResponse, "render", recording_render)
+        
+        assert api_client.get("/").status_code == 200
+        models = api_client.get("/api/v1/models")
+        assert models.headers["content-type"] == "application/json"
+        assert [content for content in rendered if "default_model" in content] == [models.json()]
 
 
 class TestHealthEndpoint:
     """Tests for health check endpoint"""
     
-    def test_health_check(self):
+    def test_health_check(self, api_client):
         """Test health check returns healthy status"""
-        response = client.get("/api/v1/health")
+        response = api_client.get("/api/v1/health")
         assert response.status_code == 200
         
         data = response.json()
@@ -38,9 +66,18 @@ class TestHealthEndpoint:
         assert "model_info" in data
         assert "timestamp" in data
     
-    def test_model_info_endpoint(self):
+    def test_registry_not_ready(self):
+        """Test that model routes are 503 while the lifespan has not set up the registry"""
+        client = TestClient(app)
+        for path in ("/api/v1/health", "/api/v1/model-info", "/api/v1/models"):
+            assert client.get(path).status_code == 503
+        response = client.post("/api/v1/analyze", json={"text": "great"})
+        assert response.status_code == 503
+        assert response.json()["detail"] == "Model registry is not ready"
+    
+    def test_model_info_endpoint(self, api_client):
         """Test model info endpoint"""
-        response = client.get("/api/v1/model-info")
+        response = api_client.get("/api/v1/model-info")
         assert response.status_code == 200
         
         data = response.json()
@@ -52,9 +89,9 @@ class TestHealthEndpoint:
 class TestAnalyzeEndpoint:
     """Tests for single text analysis endpoint"""
     
-    def test_analyze_positive_sentiment(self):
+    def test_analyze_positive_sentiment(self, pretrained_client):
         """Test analysis of positive text"""
-        response = client.post(
+        response = pretrained_client.post(
             "/api/v1/analyze",
             json={"text": "I love this product! It's amazing!"}
         )
@@ -68,9 +105,9 @@ class TestAnalyzeEndpoint:
         assert data["label"] == "POSITIVE"
         assert 0 <= data["score"] <= 1
     
-    def test_analyze_negative_sentiment(self):
+    def test_analyze_negative_sentiment(self, pretrained_client):
         """Test analysis of negative text"""
-        response = client.post(
+        response = pretrained_client.post(
             "/api/v1/analyze",
             json={"text": "This is terrible. Worst experience ever."}
         )
@@ -80,9 +117,9 @@ class TestAnalyzeEndpoint:
         assert data["label"] == "NEGATIVE"
         assert 0 <= data["score"] <= 1
     
-    def test_analyze_with_all_scores(self):
+    def test_analyze_with_all_scores(self, api_client):
         """Test analysis with return_all_scores=true"""
-        response = client.post(
+        response = api_client.post(
             "/api/v1/analyze",
             json={
                 "text": "This is great!",
@@ -96,43 +133,43 @@ class TestAnalyzeEndpoint:
         assert isinstance(data["predictions"], list)
         assert len(data["predictions"]) > 0
     
-    def test_analyze_empty_text(self):
+    def test_analyze_empty_text(self, api_client):
         """Test that empty text returns 422 validation error"""
-        response = client.post(
+        response = api_client.post(
             "/api/v1/analyze",
             json={"text": ""}
         )
         assert response.status_code == 422
     
-    def test_analyze_whitespace_only(self):
+    def test_analyze_whitespace_only(self, api_client):
         """Test that whitespace-only text returns 422 validation error"""
-        response = client.post(
+        response = api_client.post(
             "/api/v1/analyze",
             json={"text": "   "}
         )
         assert response.status_code == 422
     
-    def test_analyze_long_text(self):
+    def test_analyze_long_text(self, api_client):
         """Test analysis of long text (within limit)"""
         long_text = "This is a great product. " * 50  # ~150 chars
-        response = client.post(
+        response = api_client.post(
             "/api/v1/analyze",
             json={"text": long_text}
         )
         assert response.status_code == 200
     
-    def test_analyze_text_too_long(self):
+    def test_analyze_text_too_long(self, api_client):
         """Test that text exceeding max length returns 422 error"""
         too_long = "A" * 5001  # Exceeds 5000 char limit
-        response = client.post(
+        response = api_client.post(
             "/api/v1/analyze",
             json={"text": too_long}
         )
         assert response.status_code == 422
     
-    def test_analyze_missing_text_field(self):
+    def test_analyze_missing_text_field(self, api_client):
         """Test that missing text field returns 422 error"""
-        response = client.post(
+        response = api_client.post(
             "/api/v1/analyze",
             json={}
         )
@@ -142,9 +179,9 @@ class TestAnalyzeEndpoint:
 class TestBatchAnalyzeEndpoint:
     """Tests for batch analysis endpoint"""
     
-    def test_batch_analyze_multiple_texts(self):
+    def test_batch_analyze_multiple_texts(self, api_client):
         """Test batch analysis of multiple texts"""
-        response = client.post(
+        response = api_client.post(
             "/api/v1/batch-analyze",
             json={
                 "texts": [
@@ -170,34 +207,34 @@ class TestBatchAnalyzeEndpoint:
             assert "score" in result
             assert "timestamp" in result
     
-    def test_batch_analyze_single_text(self):
+    def test_batch_analyze_single_text(self, api_client):
         """Test batch analysis with single text"""
-        response = client.post(
+        response = api_client.post(
             "/api/v1/batch-analyze",
             json={"texts": ["This is amazing!"]}
         )
         assert response.status_code == 200
         assert response.json()["total_analyzed"] == 1
     
-    def test_batch_analyze_empty_list(self):
+    def test_batch_analyze_empty_list(self, api_client):
         """Test that empty list returns 422 error"""
-        response = client.post(
+        response = api_client.post(
             "/api/v1/batch-analyze",
             json={"texts": []}
         )
         assert response.status_code == 422
     
-    def test_batch_analyze_all_empty_texts(self):
+    def test_batch_analyze_all_empty_texts(self, api_client):
         """Test that all empty texts returns 422 error"""
-        response = client.post(
+        response = api_client.post(
             "/api/v1/batch-analyze",
             json={"texts": ["", "  ", "\n"]}
         )
         assert response.status_code == 422
     
-    def test_batch_analyze_mixed_sentiments(self):
+    def test_batch_analyze_mixed_sentiments(self, pretrained_client):
         """Test batch with mixed sentiment results"""
-        response = client.post(
+        response = pretrained_client.post(
             "/api/v1/batch-analyze",
             json={
                 "texts": [
@@ -217,18 +254,18 @@ class TestBatchAnalyzeEndpoint:
         assert "POSITIVE" in labels
         assert "NEGATIVE" in labels
     
-    def test_batch_analyze_too_many_texts(self):
+    def test_batch_analyze_too_many_texts(self, api_client):
         """Test that >100 texts returns 422 error"""
         too_many = ["text"] * 101
-        response = client.post(
+        response = api_client.post(
             "/api/v1/batch-analyze",
             json={"texts": too_many}
         )
         assert response.status_code == 422
     
-    def test_batch_analyze_processing_time(self):
+    def test_batch_analyze_processing_time(self, api_client):
         """Test that processing time is reasonable"""
-        response = client.post(
+        response = api_client.post(
             "/api/v1/batch-analyze",
             json={"texts": ["Test"] * 10}
         )
@@ -240,12 +277,475 @@ class TestBatchAnalyzeEndpoint:
         assert data["processing_time_ms"] < 10000
 
 
+class TestModelSelection:
+    """Tests for per-request model selection through the model registry"""
+    
+    def test_default_model_used(self, api_client, tiny_model_dir):
+        """Test that requests without a model use the default model"""
+        response = api_client.post("/api/v1/analyze", json={"text": "great service"})
+        assert response.status_code == 200
+        
+        models = api_client.get("/api/v1/models").json()
+        assert models["default_model"] == "default"
+        assert models["loaded_models"]["default"]["model_name"] == tiny_model_dir
+    
+    def test_select_model_by_alias(self, api_client):
+        """Test that a model can be picked with the model field"""
+        response = api_client.post(
+            "/api/v1/batch-analyze",
+            json={"texts": ["great", "awful"], "model": "default"}
+        )
+        assert response.status_code == 200
+        assert response.json()["total_analyzed"] == 2
+    
+    def test_unknown_model(self, api_client):
+        """Test that an unknown model returns 400"""
+        response = api_client.post(
+            "/api/v1/analyze",
+            json={"text": "great service", "model": "does-not-exist"}
+        )
+        assert response.status_code == 400
+        assert "Unknown model" in response.json()["detail"]
+    
+    def test_history_records_model(self, api_client, tiny_model_dir):
+        """Test that history rows record and filter by the model used"""
+        api_client.post("/api/v1/analyze", json={"text": "i love this product"})
+        
+        response = api_client.get(
+            "/api/v1/history",
+            params={"model_name": tiny_model_dir, "page_size": 5}
+        )
+        assert response.status_code == 200
+        analyses = response.json()["analyses"]
+        assert analyses
+        assert all(a["model_name"] == tiny_model_dir for a in analyses)
+
+
+class TestAdminModelSwap:
+    """Tests for the model hot-swap admin endpoints"""
+    
+    ADMIN_HEADERS = {"X-Admin-Key": "test-admin-key"}
+    
+    @pytest.fixture
+    def admin_client(self, api_client, monkeypatch):
+        from api.config import settings
+        monkeypatch.setattr(settings, "ADMIN_API_KEY", "test-admin-key")
+        return api_client
+    
+    def test_admin_disabled_without_key(self, api_client):
+        """Test that admin endpoints are off unless ADMIN_API_KEY is set"""
+        response = api_client.post("/api/v1/admin/models/default/rollback")
+        assert response.status_code == 403
+    
+    def test_admin_rejects_wrong_key(self, admin_client):
+        """Test that a wrong admin key is rejected"""
+        response = admin_client.post(
+            "/api/v1/admin/models/default/rollback",
+            headers={"X-Admin-Key": "wrong"}
+        )
+        assert response.status_code == 401
+    
+    def test_swap_and_rollback(self, admin_client, tiny_model_dir, tmp_path):
+        """Test swapping the default model to a new version and back"""
+        from models.artifact import prepare_model_artifact
+        
+        new_version = str(tmp_path / "v2")
+        prepare_model_artifact(tiny_model_dir, new_version)
+        
+        response = admin_client.post(
+            "/api/v1/admin/models/default/swap",
+            json={"model": new_version},
+            headers=self.ADMIN_HEADERS
+        )
+        assert response.status_code == 200
+        assert response.json()["previous_model"] == tiny_model_dir
+        
+        health = admin_client.get("/api/v1/health").json()
+        assert health["model_info"]["artifact_dir"] == new_version
+        assert admin_client.post("/api/v1/analyze", json={"text": "great"}).status_code == 200
+        
+        response = admin_client.post(
+            "/api/v1/admin/models/default/rollback",
+            headers=self.ADMIN_HEADERS
+        )
+        assert response.status_code == 200
+        health = admin_client.get("/api/v1/health").json()
+        assert health["model_info"]["artifact_dir"] is None
+    
+    def test_failed_swap_keeps_serving(self, admin_client, tmp_path):
+        """Test that a swap to a missing model fails without downtime"""
+        response = admin_client.post(
+            "/api/v1/admin/models/default/swap",
+            json={"model": str(tmp_path / "missing")},
+            headers=self.ADMIN_HEADERS
+        )
+        assert response.status_code == 500
+        assert admin_client.post("/api/v1/analyze", json={"text": "great"}).status_code == 200
+
+
+class TestMetricsEndpoint:
+    """Tests for the Prometheus /metrics endpoint"""
+    
+    def test_metrics_format(self, api_client):
+        """Test that requests and inference stages show up in /metrics"""
+        assert api_client.post("/api/v1/analyze", json={"text": "great"}).status_code == 200
+        
+        response = api_client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        
+        output = response.text
+        assert 'http_request_duration_seconds_bucket{method="POST",route="/api/v1/analyze"' in output
+        assert 'http_requests_total{method="POST",route="/api/v1/analyze",status="200"}' in output
+        for stage in ("tokenize", "forward", "postprocess"):
+            assert f'inference_stage_duration_seconds_count{{model="default",stage="{stage}"}}' in output
+        assert 'inference_batch_size_count{model="default"}' in output
+        assert 'result_cache_hit_ratio{model="default"}' in output
+        assert "process_resident_memory_bytes" in output
+
+
+class TestTracing:
+    """Tests for per-stage tracing of API requests"""
+    
+    @pytest.fixture
+    def exporter(self, api_client):
+        from utils.tracing import configure_tracing
+        tracer = configure_tracing(enabled=True, sample_ratio=1.0, exporter="memory")
+        yield tracer.exporter
+        configure_tracing(enabled=False)
+    
+    def test_analyze_trace_covers_every_stage(self, api_client, exporter):
+        """Test that one trace spans validation, inference, DB write and serialization"""
+        trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+        response = api_client.post(
+            "/api/v1/analyze",
+            json={"text": "great"},
+            headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"}
+        )
+        assert response.status_code == 200
+        assert response.headers["traceparent"].startswith(f"00-{trace_id}-")
+        
+        spans = exporter.get_finished_spans()
+        names = {span.name for span in spans if span.context.trace_id == trace_id}
+        assert {
+            "POST /api/v1/analyze",
+            "request.validate",
+            "analyze_sentiment",
+            "batcher.submit",
+            "batcher.queue_wait",
+            "inference.batch",
+            "analyzer.tokenize",
+            "analyzer.forward",
+            "analyzer.postprocess",
+            "db.create_analysis",
+            "response.serialize"
+        } <= names
+
+
+class TestProfiling:
+    """Tests for the admin profiling endpoints"""
+    
+    ADMIN_HEADERS = {"X-Admin-Key": "test-admin-key"}
+    
+    @pytest.fixture
+    def profiling_client(self, api_client, monkeypatch):
+        from api.config import settings
+        monkeypatch.setattr(settings, "ADMIN_API_KEY", "test-admin-key")
+        monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+        return api_client
+    
+    def test_disabled_by_default(self, api_client, monkeypatch):
+        """Test that profiling endpoints are hidden unless enabled"""
+        from api.config import settings
+        monkeypatch.setattr(settings, "ADMIN_API_KEY", "test-admin-key")
+        response = api_client.get("/api/v1/admin/profiling/cpu", headers=self.ADMIN_HEADERS)
+        assert response.status_code == 404
+    
+    def test_requires_admin_key(self, profiling_client):
+        """Test that profiling needs the admin key"""
+        response = profiling_client.get("/api/v1/admin/profiling/cpu?seconds=0.1")
+        assert response.status_code == 401
+    
+    def test_sampling_profile_returns_collapsed_stacks(self, profiling_client):
+        """Test that the sampler returns 'stack count' lines"""
+        response = profiling_client.get(
+            "/api/v1/admin/profiling/cpu?seconds=0.2&include_idle=true",
+            headers=self.ADMIN_HEADERS
+        )
+        assert response.status_code == 200
+        lines = response.text.strip().splitlines()
+        assert lines
+        stack, count = lines[0].rsplit(" ", 1)
+        assert ";" in stack and int(count) > 0
+    
+    def test_cprofile_mode(self, profiling_client):
+        """Test that cProfile mode returns a pstats table"""
+        response = profiling_client.get(
+            "/api/v1/admin/profiling/cpu?seconds=0.1&mode=cprofile",
+            headers=self.ADMIN_HEADERS
+        )
+        assert response.status_code == 200
+        assert "function calls" in response.text
+    
+    def test_duration_limit(self, profiling_client):
+        """Test that overly long profiles are rejected"""
+        response = profiling_client.get(
+            "/api/v1/admin/profiling/cpu?seconds=3600",
+            headers=self.ADMIN_HEADERS
+        )
+        assert response.status_code == 400
+    
+    def test_torch_profile_returns_chrome_trace(self, profiling_client):
+        """Test the torch.profiler capture of a synthetic batch"""
+        response = profiling_client.post(
+            "/api/v1/admin/profiling/torch",
+            json={"batch_size": 2, "seq_length": 16},
+            headers=self.ADMIN_HEADERS
+        )
+        assert response.status_code == 200
+        assert response.json()["traceEvents"]
+    
+    def test_memory_diff(self, profiling_client):
+        """Test tracemalloc start, diff and stop"""
+        base = "/api/v1/admin/profiling/memory"
+        assert profiling_client.get(f"{base}/diff", headers=self.ADMIN_HEADERS).status_code == 400
+        
+        assert profiling_client.post(f"{base}/start", headers=self.ADMIN_HEADERS).status_code == 200
+        try:
+            profiling_client.post("/api/v1/analyze", json={"text": "great"})
+            response = profiling_client.get(f"{base}/diff?limit=5", headers=self.ADMIN_HEADERS)
+            assert response.status_code == 200
+            assert len(response.json()["top"]) <= 5
+        finally:
+            profiling_client.post(f"{base}/stop", headers=self.ADMIN_HEADERS)
+
+
+class TestBatchResponse:
+    """Tests for the /batch-analyze fast serialization path"""
+    
+    def test_matches_response_model(self, api_client):
+        """Test that the orjson response still validates as BatchAnalysisResult"""
+        from api.schemas import BatchAnalysisResult
+        
+        response = api_client.post(
+            "/api/v1/batch-analyze",
+            json={"texts": ["good", "bad", "great"]}
+        )
+        assert response.status_code == 200
+        
+        result = BatchAnalysisResult.model_validate(response.json())
+        assert result.total_analyzed == 3
+        assert [r.text for r in result.results] == ["good", "bad", "great"]
+        assert len({r.timestamp for r in result.results}) == 1
+
+
+class TestCompactBatchResponse:
+    """Tests for the negotiated compact /batch-analyze formats"""
+    
+    def test_compact_json(self, api_client):
+        """Test that format=compact returns parallel arrays without the texts"""
+        full = api_client.post("/api/v1/batch-analyze", json={"texts": ["good", "bad", "great"]}).json()
+        response = api_client.post(
+            "/api/v1/batch-analyze?format=compact",
+            json={"texts": ["good", "bad", "great"]}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/vnd.sentiment.compact+json"
+        assert "Accept" in response.headers["vary"]
+        
+        body = response.json()
+        assert body["total_analyzed"] == 3
+        assert "results" not in body
+        assert [body["labels"][i] for i in body["label_ids"]] == [r["label"] for r in full["results"]]
+        assert body["scores"] == pytest.approx([r["score"] for r in full["results"]], abs=1e-6)
+    
+    def test_accept_header(self, api_client):
+        """Test that the highest-q supported Accept type is used"""
+        response = api_client.post(
+            "/api/v1/batch-analyze",
+            json={"texts": ["good"]},
+            headers={"Accept": "text/html, application/json;q=0.5, application/vnd.sentiment.compact+json;q=0.9"}
+        )
+        assert response.headers["content-type"] == "application/vnd.sentiment.compact+json"
+        
+        response = api_client.post("/api/v1/batch-analyze", json={"texts": ["good"]}, headers={"Accept": "*/*"})
+        assert "results" in response.json()
+    
+    def test_unknown_format(self, api_client):
+        """Test that an unsupported format is rejected before inference"""
+        response = api_client.post("/api/v1/batch-analyze?format=xml", json={"texts": ["good"]})
+        assert response.status_code == 406
+    
+    def test_unavailable_format(self, api_client, monkeypatch):
+        """Test that a format whose library is missing is refused"""
+        monkeypatch.setattr("api.responses.msgpack", None)
+        response = api_client.post("/api/v1/batch-analyze?format=msgpack", json={"texts": ["good"]})
+        assert response.status_code == 406
+        
+        # Accept falls back to full JSON instead
+        response = api_client.post(
+            "/api/v1/batch-analyze",
+            json={"texts": ["good"]},
+            headers={"Accept": "application/msgpack, application/json;q=0.1"}
+        )
+        assert response.status_code == 200
+        assert "results" in response.json()
+    
+    def test_msgpack(self, api_client):
+        """Test that MessagePack bodies carry raw little-endian buffers"""
+        msgpack = pytest.importorskip("msgpack")
+        import numpy as np
+        
+        response = api_client.post("/api/v1/batch-analyze?format=msgpack", json={"texts": ["good", "bad"]})
+        body = msgpack.unpackb(response.content)
+        assert np.frombuffer(body["scores"], dtype=body["score_dtype"]).shape == (2,)
+        assert np.frombuffer(body["label_ids"], dtype=body["label_dtype"]).max() < len(body["labels"])
+    
+    def test_arrow(self, api_client):
+        """Test that Arrow streams have a dictionary-encoded label column"""
+        pyarrow = pytest.importorskip("pyarrow")
+        
+        response = api_client.post(
+            "/api/v1/batch-analyze",
+            json={"texts": ["good", "bad"]},
+            headers={"Accept": "application/vnd.apache.arrow.stream"}
+        )
+        table = pyarrow.ipc.open_stream(response.content).read_all()
+        assert table.num_rows == 2
+        assert table.schema.metadata[b"total_analyzed"] == b"2"
+        assert pyarrow.types.is_dictionary(table.schema.field("label").type)
+
+
+class TestBatchRequestFormats:
+    """Tests for JSON, MessagePack and Arrow /batch-analyze request bodies"""
+    
+    def test_texts_are_stripped_once_and_empties_dropped(self):
+        """Test that validation strips texts and drops empty ones"""
+        from api.schemas import BatchAnalysisRequest
+        
+        request = BatchAnalysisRequest.model_validate({"texts": ["  good ", "", "   ", "bad"]})
+        assert request.texts == ["good", "bad"]
+    
+    def test_msgpack_body(self, api_client):
+        """Test that a MessagePack body is analyzed like JSON"""
+        msgpack = pytest.importorskip("msgpack")
+        
+        response = api_client.post(
+            "/api/v1/batch-analyze",
+            content=msgpack.packb({"texts": ["good", " ", "bad"], "priority": "bulk"}),
+            headers={"Content-Type": "application/msgpack"}
+        )
+        assert response.status_code == 200
+        assert [r["text"] for r in response.json()["results"]] == ["good", "bad"]
+    
+    def test_arrow_body(self, api_client):
+        """Test that an Arrow stream's texts column and metadata are read"""
+        pyarrow = pytest.importorskip("pyarrow")
+        
+        table = pyarrow.table(
+            {"texts": pyarrow.array(["good", None, "bad "])},
+            metadata={"timeout_ms": "10000"}
+        )
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        
+        response = api_client.post(
+            "/api/v1/batch-analyze",
+            content=sink.getvalue().to_pybytes(),
+            headers={"Content-Type": "application/vnd.apache.arrow.stream"}
+        )
+        assert response.status_code == 200
+        assert [r["text"] for r in response.json()["results"]] == ["good", "bad"]
+    
+    def test_invalid_fields_return_422(self, api_client):
+        """Test that field errors keep FastAPI's 422 shape"""
+        response = api_client.post("/api/v1/batch-analyze", json={"texts": ["good"], "timeout_ms": 0})
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["body", "timeout_ms"]
+    
+    def test_malformed_body(self, api_client):
+        """Test that undecodable bodies are rejected"""
+        response = api_client.post(
+            "/api/v1/batch-analyze",
+            content=b"{not json",
+            headers={"Content-Type": "application/json"}
+        )
+        assert response.status_code == 400
+    
+    def test_unsupported_media_type(self, api_client):
+        """Test that unknown body formats get 415"""
+        response = api_client.post(
+            "/api/v1/batch-analyze",
+            content=b"good",
+            headers={"Content-Type": "text/plain"}
+        )
+        assert response.status_code == 415
+
+
+class TestDeadlines:
+    """Tests for request deadlines and client disconnects"""
+    
+    def test_expired_deadline_returns_504(self, api_client):
+        """Test that a request whose deadline has passed is not scored"""
+        response = api_client.post(
+            "/api/v1/analyze",
+            json={"text": "good"},
+            headers={"X-Request-Timeout-Ms": "0.001"}
+        )
+        assert response.status_code == 504
+    
+    def test_deadline_field_on_batch(self, api_client):
+        """Test that a generous timeout_ms lets the batch through"""
+        response = api_client.post(
+            "/api/v1/batch-analyze",
+            json={"texts": ["good", "bad"], "timeout_ms": 10000}
+        )
+        assert response.status_code == 200
+    
+    def test_invalid_timeout_header(self, api_client):
+        """Test that a malformed deadline header is rejected"""
+        response = api_client.post(
+            "/api/v1/analyze",
+            json={"text": "good"},
+            headers={"X-Request-Timeout-Ms": "soon"}
+        )
+        assert response.status_code == 400
+    
+    def test_non_finite_timeout_header(self, api_client):
+        """Test that nan and infinite deadlines are rejected"""
+        for header in ("nan", "inf", "-inf", "Infinity"):
+            response = api_client.post(
+                "/api/v1/analyze",
+                json={"text": "good"},
+                headers={"X-Request-Timeout-Ms": header}
+            )
+            assert response.status_code == 400, header
+    
+    def test_disconnect_cancels_inference(self):
+        """Test that work is cancelled once the client goes away"""
+        from api.deadlines import ClientDisconnected, cancel_on_disconnect
+        
+        class DisconnectedRequest:
+            async def is_disconnected(self):
+                return True
+        
+        async def run():
+            work = asyncio.ensure_future(asyncio.sleep(10))
+            with pytest.raises(ClientDisconnected):
+                await cancel_on_disconnect(DisconnectedRequest(), work)
+            await asyncio.sleep(0)
+            return work.cancelled()
+        
+        assert asyncio.run(run())
+
+
 class TestAPIDocumentation:
     """Tests for API documentation endpoints"""
     
-    def test_openapi_json_available(self):
+    def test_openapi_json_available(self, api_client):
         """Test that OpenAPI JSON is available"""
-        response = client.get("/openapi.json")
+        response = api_client.get("/openapi.json")
         assert response.status_code == 200
         
         data = response.json()
@@ -253,23 +753,23 @@ class TestAPIDocumentation:
         assert "info" in data
         assert "paths" in data
     
-    def test_swagger_docs_available(self):
+    def test_swagger_docs_available(self, api_client):
         """Test that Swagger UI is available"""
-        response = client.get("/docs")
+        response = api_client.get("/docs")
         assert response.status_code == 200
     
-    def test_redoc_available(self):
+    def test_redoc_available(self, api_client):
         """Test that ReDoc is available"""
-        response = client.get("/redoc")
+        response = api_client.get("/redoc")
         assert response.status_code == 200
 
 
 class TestAPIHeaders:
     """Tests for API response headers"""
     
-    def test_process_time_header(self):
+    def test_process_time_header(self, api_client):
         """Test that X-Process-Time-Ms header is added"""
-        response = client.get("/api/v1/health")
+        response = api_client.get("/api/v1/health")
         assert "X-Process-Time-Ms" in response.headers
         
         # Should be a valid number
@@ -279,3 +779,185 @@ class TestAPIHeaders:
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
+
+
+class TestWebSocketStreaming:
+    """Tests for the /ws/analyze streaming endpoint"""
+    
+    def test_results_are_matched_by_id(self, api_client):
+        """Test that every message gets a result carrying its ID"""
+        with api_client.websocket_connect("/api/v1/ws/analyze") as ws:
+            hello = ws.receive_json()
+            assert hello["type"] == "hello" and hello["max_outstanding"] >= 1
+            
+            for i in range(10):
+                ws.send_json({"id": i, "text": f"good {i}"})
+            results = [ws.receive_json() for _ in range(10)]
+        
+        assert sorted(r["id"] for r in results) == list(range(10))
+        assert all(r["type"] == "result" and r["text"] == f"good {r['id']}" for r in results)
+        assert all(r["label"] in ("POSITIVE", "NEGATIVE") for r in results)
+    
+    def test_invalid_messages(self, api_client):
+        """Test that bad messages get an error reply and the connection stays open"""
+        with api_client.websocket_connect("/api/v1/ws/analyze") as ws:
+            ws.receive_json()
+            ws.send_json({"id": "a", "text": "   "})
+            assert ws.receive_json()["code"] == 422
+            ws.send_text("not json")
+            error = ws.receive_json()
+            assert (error["type"], error["id"], error["code"]) == ("error", None, 422)
+            ws.send_json({"id": "b", "text": "good", "timeout_ms": 0})
+            assert ws.receive_json()["id"] == "b"
+            
+            ws.send_json({"id": "c", "text": "good"})
+            assert ws.receive_json()["type"] == "result"
+    
+    def test_msgpack_frames(self, api_client):
+        """Test that binary MessagePack messages get MessagePack replies"""
+        msgpack = pytest.importorskip("msgpack")
+        
+        with api_client.websocket_connect("/api/v1/ws/analyze") as ws:
+            ws.receive_json()
+            ws.send_bytes(msgpack.packb({"id": 1, "text": "good"}))
+            result = msgpack.unpackb(ws.receive_bytes())
+            ws.send_bytes(msgpack.packb({"id": 2, "text": "  "}))
+            invalid = msgpack.unpackb(ws.receive_bytes())
+            ws.send_bytes(b"\xc1")
+            undecodable = msgpack.unpackb(ws.receive_bytes())
+            
+            # JSON text frames on the same connection still get JSON
+            ws.send_json({"id": 3, "text": "good"})
+            assert ws.receive_json()["id"] == 3
+        
+        assert (result["type"], result["id"]) == ("result", 1)
+        assert result["label"] in ("POSITIVE", "NEGATIVE")
+        assert (invalid["id"], invalid["code"]) == (2, 422)
+        assert (undecodable["id"], undecodable["code"]) == (None, 400)
+    
+    def test_arrow_frames(self, api_client):
+        """Test that with the arrow subprotocol every row of a binary frame is a message"""
+        pyarrow = pytest.importorskip("pyarrow")
+        
+        def arrow_frame(rows):
+            table = pyarrow.Table.from_pylist(rows)
+            sink = pyarrow.BufferOutputStream()
+            with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return sink.getvalue().to_pybytes()
+        
+        with api_client.websocket_connect("/api/v1/ws/analyze", subprotocols=["arrow"]) as ws:
+            assert ws.accepted_subprotocol == "arrow"
+            ws.receive_json()
+            ws.send_bytes(arrow_frame([{"id": i, "text": text} for i, text in enumerate(["good", " ", "bad"])]))
+            replies = sorted((ws.receive_json() for _ in range(3)), key=lambda reply: reply["id"])
+            ws.send_bytes(b"not arrow")
+            undecodable = ws.receive_json()
+        
+        assert [(reply["type"], reply["id"]) for reply in replies] == [("result", 0), ("error", 1), ("result", 2)]
+        assert replies[1]["code"] == 422
+        assert replies[2]["text"] == "bad"
+        assert (undecodable["id"], undecodable["code"]) == (None, 400)
+    
+    def test_unknown_model_closes_the_connection(self, api_client):
+        """Test that the connection is refused for a model that is not served"""
+        from starlette.websockets import WebSocketDisconnect
+        
+        with api_client.websocket_connect("/api/v1/ws/analyze?model=missing") as ws:
+            with pytest.raises(WebSocketDisconnect) as exc_info:
+                ws.receive_json()
+        assert exc_info.value.code == 1008
+    
+    def test_outstanding_messages_are_limited(self, api_client, monkeypatch):
+        """Test that no more than WS_MAX_OUTSTANDING messages are analyzed at once"""
+        from api.config import settings
+        
+        monkeypatch.setattr(settings, "WS_MAX_OUTSTANDING", 2)
+        batcher = api_client.app.state.registry.get().batcher
+        active = []
+        peak = []
+        
+        async def slow_submit(text, **kwargs):
+            active.append(text)
+            peak.append(len(active))
+            await asyncio.sleep(0.02)
+            active.remove(text)
+            return {"text": text, "label": "POSITIVE", "score": 0.9}
+        
+        monkeypatch.setattr(batcher, "submit", slow_submit)
+        with api_client.websocket_connect("/api/v1/ws/analyze") as ws:
+            assert ws.receive_json()["max_outstanding"] == 2
+            for i in range(8):
+                ws.send_json({"id": i, "text": f"good {i}"})
+            results = [ws.receive_json() for _ in range(8)]
+        
+        assert len({r["id"] for r in results}) == 8
+        assert max(peak) == 2
+    
+    def test_unsent_replies_hold_their_slots(self, api_client, monkeypatch):
+        """Test that a client not reading its replies stops the server from reading more"""
+        import time
+        from starlette.websockets import WebSocket
+        from api.config import settings
+        
+        monkeypatch.setattr(settings, "WS_MAX_OUTSTANDING", 2)
+        submitted = []
+        reading = []
+        
+        async def submit(text, **kwargs):
+            submitted.append(text)
+            return {"text": text, "label": "POSITIVE", "score": 0.9}
+        
+        send_text = WebSocket.send_text
+        
+        async def stalled_send_text(self, data):
+            # Replies (not the hello) wait until the client starts reading
+            while '"result"' in data and not reading:
+                await asyncio.sleep(0.01)
+            await send_text(self, data)
+        
+        monkeypatch.setattr(api_client.app.state.registry.get().batcher, "submit", submit)
+        monkeypatch.setattr(WebSocket, "send_text", stalled_send_text)
+        with api_client.websocket_connect("/api/v1/ws/analyze") as ws:
+            ws.receive_json()
+            for i in range(6):
+                ws.send_json({"id": i, "text": f"good {i}"})
+            time.sleep(0.3)
+            assert len(submitted) == 2
+            
+            reading.append(True)
+            results = [ws.receive_json() for _ in range(6)]
+        assert sorted(r["id"] for r in results) == list(range(6))
+    
+    def test_failed_writer_closes_the_connection(self, api_client, monkeypatch):
+        """Test that the connection is closed once replies cannot be sent"""
+        from starlette.websockets import WebSocket, WebSocketDisconnect
+        
+        send_text = WebSocket.send_text
+        
+        async def failing_send_text(self, data):
+            if '"hello"' not in data:
+                raise RuntimeError("Send failed")
+            await send_text(self, data)
+        
+        monkeypatch.setattr(WebSocket, "send_text", failing_send_text)
+        with api_client.websocket_connect("/api/v1/ws/analyze") as ws:
+            ws.receive_json()
+            ws.send_json({"id": 1, "text": "good"})
+            with pytest.raises(WebSocketDisconnect) as exc_info:
+                ws.receive_json()
+        assert exc_info.value.code == 1011
+    
+    def test_rate_limited_messages(self, api_client, monkeypatch):
+        """Test that messages over the rate limit get a 429 error with retry_after"""
+        from api.rate_limit import RateLimiter
+        
+        monkeypatch.setattr(api_client.app.state, "rate_limiter", RateLimiter(per_minute=1))
+        with api_client.websocket_connect("/api/v1/ws/analyze") as ws:
+            ws.receive_json()
+            ws.send_json({"id": 1, "text": "good"})
+            assert ws.receive_json()["type"] == "result"
+            ws.send_json({"id": 2, "text": "good"})
+            error = ws.receive_json()
+        assert (error["id"], error["code"]) == (2, 429)
+        assert error["retry_after"] >= 1
@@ -0,0 +1,200 @@
+"""
+Tests for the benchmark suite helpers
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import bench_crud  # noqa: E402
+import bench_export  # noqa: E402
+import bench_grpc  # noqa: E402
+import bench_ingest  # noqa: E402
+import bench_serialization  # noqa: E402
+import loadgen  # noqa: E402
+from common import compare, load_results, measure, result_document, write_results  # noqa: E402
+
+
+class TestCompare:
+    """Tests for regression detection between two result sets"""
+    
+    def test_latency_regression(self):
+        """Test that a slower median beyond the threshold is flagged"""
+        rows = compare(
+            {"a": {"median_ms": 10.0}, "b": {"median_ms": 10.0}, "gone": {"median_ms": 1.0}},
+            {"a": {"median_ms": 12.0}, "b": {"median_ms": 8.0}, "added": {"median_ms": 1.0}},
+            threshold_pct=10
+        )
+        status = {row["name"]: row["status"] for row in rows}
+        assert status == {"a": "regression", "b": "improved", "gone": "missing", "added": "new"}
+    
+    def test_throughput_regression(self):
+        """Test that lower throughput counts as a regression"""
+        rows = compare({"a": {"rps": 100.0}}, {"a": {"rps": 80.0}}, metric="rps", threshold_pct=10)
+        assert rows[0]["status"] == "regression"
+    
+    def test_result_file_round_trip(self, tmp_path):
+        """Test that results are keyed by suite and name when loaded"""
+        result = measure("noop", lambda: None, repeats=3, warmup=0)
+        path = str(tmp_path / "results.json")
+        write_results(path, result_document({"micro": [result]}, {}))
+        
+        loaded = load_results(path)
+        assert loaded["micro/noop"]["n"] == 3
+
+
+class TestCrudBenchmark:
+    """Tests for the seeded CRUD benchmark"""
+    
+    def test_seeding_is_deterministic_and_reused(self, tmp_path):
+        """Test a small run end to end, reusing the seeded database"""
+        db_path = str(tmp_path / "crud.db")
+        results = bench_crud.run(rows=200, db_path=db_path, repeats=2, warmup=0)
+        assert {result["name"] for result in results} >= {"crud.create_analysis", "crud.get_analyses[page]"}
+        
+        # Inserted rows are cleaned up, so the seeded database is reused as is
+        assert bench_crud.run(rows=200, db_path=db_path, repeats=1, warmup=0)
+
+
+class TestExportBenchmark:
+    """Tests for the history export benchmark"""
+    
+    def test_every_format_exports_all_rows(self, tmp_path):
+        """Test a small run over the seeded database"""
+        results = bench_export.run(rows=200, db_path=str(tmp_path / "crud.db"), chunk_size=64, repeats=1, warmup=0)
+        names = {result["name"] for result in results}
+        assert {"export.history[csv]", "export.history[ndjson]"} <= names
+        for result in results:
+            assert result["params"]["bytes"] > 0
+            assert result["params"]["peak_memory_mb"] > 0
+
+
+class TestSerializationBenchmark:
+    """Tests for the batch serialization benchmark"""
+    
+    def test_both_paths_produce_the_same_document(self):
+        """Test that the fast path encodes the same fields as the model path"""
+        batch = bench_serialization.make_results(3)
+        old = json.loads(bench_serialization.serialize_models(batch))
+        new = json.loads(bench_serialization.serialize_fast(batch))
+        
+        assert old.keys() == new.keys()
+        assert [(r["text"], r["label"], r["score"]) for r in old["results"]] == \
+            [(r["text"], r["label"], r["score"]) for r in new["results"]]
+        assert len({r["timestamp"] for r in new["results"]}) == 1
+        
+        results = bench_serialization.run(sizes=[3], repeats=2, warmup=0)
+        # msgpack and arrow follow when installed
+        assert [r["name"] for r in results][:3] == [
+            "serialize.batch_response[pydantic,n=3]",
+            "serialize.batch_response[orjson,n=3]",
+            "serialize.batch_response[compact,n=3]"
+        ]
+        assert results[2]["params"]["bytes"] < results[1]["params"]["bytes"]
+
+
+class TestIngestBenchmark:
+    """Tests for the batch request ingestion benchmark"""
+    
+    def test_every_format_parses_to_the_same_request(self):
+        """Test that each format yields the same validated texts"""
+        texts = bench_ingest.make_texts(3)
+        parsed = [parse(encode(texts)).texts for _, encode, parse in bench_ingest.variants()]
+        assert all(p == [t.strip() for t in texts] for p in parsed)
+        
+        results = bench_ingest.run(sizes=[3], repeats=2, warmup=0)
+        assert [r["name"] for r in results][:2] == [
+            "ingest.batch_request[json-stdlib,n=3]",
+            "ingest.batch_request[json,n=3]"
+        ]
+
+
+class TestGrpcBenchmark:
+    """Tests for the gRPC versus REST benchmark helpers"""
+    
+    def test_drive_calls_counts_errors(self):
+        """Test that failed calls are timed and counted as errors"""
+        async def call(i):
+            if i % 4 == 0:
+                raise RuntimeError("unavailable")
+        
+        result = asyncio.run(bench_grpc.drive_calls(call, requests=8, concurrency=2))
+        assert result["n"] == 8
+        assert result["error_rate"] == 0.25
+
+
+class _FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class _FakeClient:
+    """Async client answering every request after a fixed delay"""
+    
+    def __init__(self, delay_s=0.0, status_code=200):
+        self.delay_s = delay_s
+        self.status_code = status_code
+        self.calls = []
+    
+    async def request(self, method, path, json=None, headers=None):
+        self.calls.append((method, path, json))
+        await asyncio.sleep(self.delay_s)
+        return _FakeResponse(self.status_code)
+
+
+class TestLoadGenerator:
+    """Tests for the JSONL replay load generator"""
+    
+    def test_load_corpus_formats(self, tmp_path):
+        """Test explicit requests, text and texts lines, and --text-field"""
+        path = tmp_path / "corpus.jsonl"
+        path.write_text("\n".join([
+            json.dumps({"method": "get", "path": "/api/v1/health"}),
+            json.dumps({"text": "great"}),
+            "",
+            json.dumps({"texts": ["a", "b"]})
+        ]))
+        corpus = loadgen.load_corpus(str(path))
+        assert [(spec["method"], spec["path"]) for spec in corpus] == [
+            ("GET", "/api/v1/health"),
+            ("POST", "/api/v1/analyze"),
+            ("POST", "/api/v1/batch-analyze")
+        ]
+        
+        path.write_text(json.dumps({"request_id": "x", "body": "replay me"}))
+        corpus = loadgen.load_corpus(str(path), text_field="body")
+        assert corpus[0]["json"] == {"text": "replay me"}
+    
+    def test_closed_loop_respects_request_budget(self):
+        """Test that closed-loop workers stop after the requested count"""
+        client = _FakeClient(status_code=500)
+        recorder = loadgen.Recorder()
+        corpus = [{"method": "GET", "path": "/", "json": None, "headers": {}}]
+        asyncio.run(loadgen.closed_loop(client, corpus, recorder, 4, time.perf_counter() + 10, 10, 1.0))
+        
+        report = recorder.report("loadgen.test", {}, 1.0)
+        assert report["n"] == 10
+        assert report["error_rate"] == 1.0
+        assert report["status_codes"] == {"500": 10}
+    
+    def test_open_loop_does_not_wait_for_responses(self):
+        """Test that slow responses do not slow down the send schedule"""
+        client = _FakeClient(delay_s=0.2)
+        recorder = loadgen.Recorder()
+        corpus = [{"method": "GET", "path": "/", "json": None, "headers": {}}]
+        started = time.perf_counter()
+        asyncio.run(loadgen.open_loop(
+            client, corpus, recorder, rps=100, deadline=started + 10, max_requests=20,
+            timeout=1.0, poisson=False, max_outstanding=100, seed=0
+        ))
+        
+        # 20 sends at 100 rps take ~0.2s; waiting for each response would take 4s
+        assert time.perf_counter() - started < 1.5
+        report = recorder.report("loadgen.test", {}, time.perf_counter() - started)
+        assert report["n"] == 20
+        assert report["error_rate"] == 0.0
+        assert report["timeline"][0]["completed"] == 20
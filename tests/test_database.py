@@ -0,0 +1,555 @@
+"""
+Tests for the analysis history database layer
+"""
+
+import math
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, func, inspect, select, text, update
+from sqlalchemy.orm import Session
+
+from database import crud, export
+from database.database import ReplicaLagGuard, backfill_rollups, migrate_inline_texts, replica_lag
+from database.models import SCORE_BINS, AnalysisRollup, AnalyzedText, Base, SentimentAnalysis, hash_text
+from database.partitioning import HistoryMaintenance, next_period, partitioned_table, period_name, period_start, utc
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    with Session(engine) as session:
+        yield session
+
+
+class TestTextStore:
+    """Tests for storing each analyzed text once"""
+    
+    def test_duplicate_texts_are_stored_once(self, db):
+        """Test that repeated texts share one analyzed_texts row"""
+        crud.create_analysis(db, text="great product", label="POSITIVE", score=0.9, model_name="m")
+        created = crud.create_analyses_bulk(db, [
+            ("great product", "POSITIVE", 0.8),
+            ("awful service", "NEGATIVE", 0.7),
+            ("awful service", "NEGATIVE", 0.7)
+        ], processing_time_ms=1.0, model_name="m")
+        
+        assert created == 3
+        assert db.scalar(select(func.count()).select_from(SentimentAnalysis)) == 4
+        assert db.scalar(select(func.count()).select_from(AnalyzedText)) == 2
+        
+        # The text is still readable from the analysis
+        analyses = crud.get_analyses(db, limit=10)
+        assert sorted({analysis.text for analysis in analyses}) == ["awful service", "great product"]
+        assert [a.text for a in crud.search_analyses(db, "AWFUL")] == ["awful service", "awful service"]
+    
+    def test_stored_results_are_the_latest_per_model(self, db):
+        """Test that lookups return the newest result of the given model only"""
+        crud.create_analysis(db, text="okay", label="NEGATIVE", score=0.6, model_name="m")
+        crud.create_analysis(db, text="okay", label="POSITIVE", score=0.7, model_name="m")
+        crud.create_analysis(db, text="good", label="POSITIVE", score=0.9, model_name="other")
+        
+        stored = crud.get_stored_results(db, ["okay", "good", "unseen"], "m")
+        assert stored == {"okay": ("POSITIVE", 0.7)}
+        assert crud.get_stored_results(db, [], "m") == {}
+    
+    def test_migrate_inline_texts(self, engine, db):
+        """Test that a history with a text column is moved to the text store"""
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE sentiment_analyses"))
+            conn.execute(text(
+                "CREATE TABLE sentiment_analyses (id INTEGER PRIMARY KEY, text TEXT NOT NULL, "
+                "label VARCHAR(20) NOT NULL, score FLOAT NOT NULL, processing_time_ms FLOAT, "
+                "model_name VARCHAR(100), is_batch BOOLEAN, created_at DATETIME)"
+            ))
+            conn.execute(text(
+                "INSERT INTO sentiment_analyses (text, label, score, is_batch) VALUES "
+                "('good', 'POSITIVE', 0.9, 0), ('bad', 'NEGATIVE', 0.8, 0), ('good', 'POSITIVE', 0.9, 1)"
+            ))
+        
+        assert migrate_inline_texts(engine, chunk_size=2) == 3
+        columns = {column["name"] for column in inspect(engine).get_columns("sentiment_analyses")}
+        assert "text" not in columns
+        assert [a.text for a in db.query(SentimentAnalysis).order_by(SentimentAnalysis.id)] == ["good", "bad", "good"]
+        assert db.scalar(select(func.count()).select_from(AnalyzedText)) == 2
+        assert db.get(AnalyzedText, hash_text("bad")).text == "bad"
+        
+        # Migrated databases are left alone
+        assert migrate_inline_texts(engine) == 0
+
+
+class TestPersistentResultCache:
+    """Tests for answering from stored results after a restart"""
+    
+    def test_stored_result_is_served_from_the_cache(self, api_client, monkeypatch):
+        """Test that a stored result skips the model once the memory cache is gone"""
+        from api.config import settings
+        
+        monkeypatch.setattr(settings, "RESULT_CACHE_PERSISTENT", True)
+        first = api_client.post("/api/v1/analyze", json={"text": "the service is okay persistent"})
+        assert first.status_code == 200
+        
+        # Simulate a restart: the in-memory cache is empty, the history is not
+        entry = api_client.app.state.registry.get()
+        entry.cache.clear()
+        hits = entry.cache.hits
+        second = api_client.post("/api/v1/analyze", json={"text": "the service is okay persistent"})
+        
+        assert second.status_code == 200
+        assert entry.cache.hits == hits + 1
+        assert second.json()["label"] == first.json()["label"]
+        assert second.json()["score"] == pytest.approx(first.json()["score"])
+    
+    def test_lookup_runs_off_the_event_loop(self, api_client, monkeypatch):
+        """Test that the stored result query does not block the event loop"""
+        import asyncio
+        from api.config import settings
+        
+        monkeypatch.setattr(settings, "RESULT_CACHE_PERSISTENT", True)
+        on_loop = []
+        get_stored_results = crud.get_stored_results
+        
+        def lookup(*args):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return get_stored_results(*args)
+        
+        monkeypatch.setattr(crud, "get_stored_results", lookup)
+        assert api_client.post("/api/v1/analyze", json={"text": "never analyzed before"}).status_code == 200
+        assert on_loop == [False]
+
+
+class TestHistoryMaintenance:
+    """Tests for history partitioning and retention"""
+    
+    def _seed(self, db, moments):
+        crud.create_analyses_bulk(db, [(f"text {i}", "POSITIVE", 0.9) for i in range(len(moments))], model_name="m")
+        # Only old analyses have a unique text; "shared" is also analyzed recently
+        crud.create_analysis(db, text="shared", label="NEGATIVE", score=0.8, model_name="m")
+        crud.create_analysis(db, text="shared", label="NEGATIVE", score=0.8, model_name="m")
+        analyses = db.query(SentimentAnalysis).order_by(SentimentAnalysis.id).all()
+        for analysis, moment in zip(analyses, moments + [datetime(2026, 8, 2), datetime(2026, 10, 18)]):
+            analysis.created_at = moment
+        db.query(AnalyzedText).update({AnalyzedText.created_at: datetime(2026, 7, 1)})
+        db.commit()
+    
+    def test_periods(self):
+        """Test period boundaries and names"""
+        moment = datetime(2026, 12, 19, 13, 5)
+        assert period_start(moment, "monthly") == datetime(2026, 12, 1)
+        assert next_period(datetime(2026, 12, 1), "monthly") == datetime(2027, 1, 1)
+        assert next_period(period_start(moment, "daily"), "daily") == datetime(2026, 12, 20)
+        assert period_name(datetime(2026, 12, 1), "monthly") == "p202612"
+        assert period_name(datetime(2026, 12, 19), "daily") == "p20261219"
+    
+    def test_partitioned_table_ddl(self):
+        """Test that the PostgreSQL table is range-partitioned with created_at in the key"""
+        from sqlalchemy.dialects import postgresql
+        from sqlalchemy.schema import CreateTable
+        
+        ddl = str(CreateTable(partitioned_table()).compile(dialect=postgresql.dialect()))
+        assert "PRIMARY KEY (id, created_at)" in ddl
+        assert "PARTITION BY RANGE (created_at)" in ddl
+        # The model itself is unchanged
+        assert [c.name for c in SentimentAnalysis.__table__.primary_key] == ["id"]
+    
+    def test_partitions_take_rows_from_default(self, monkeypatch):
+        """Test that a period with rows in the DEFAULT partition is moved out of it, one transaction per partition"""
+        class PostgresBind:
+            """Records the SQL of each transaction; September already has rows in DEFAULT"""
+            class dialect:
+                name = "postgresql"
+            
+            def __init__(self):
+                self.transactions = []
+            
+            @contextmanager
+            def begin(self):
+                statements = []
+                self.transactions.append(statements)
+                
+                class Connection:
+                    def execute(self, statement, params=None):
+                        statements.append(str(statement))
+                        return type("Result", (), {"rowcount": 1})
+                    
+                    def scalar(self, statement, params):
+                        statements.append(str(statement))
+                        return params["start"] == utc(datetime(2026, 9, 1))
+                
+                yield Connection()
+        
+        bind = PostgresBind()
+        maintenance = HistoryMaintenance(bind, interval="monthly", partitions_ahead=1)
+        monkeypatch.setattr(maintenance, "_is_partitioned", lambda: True)
+        monkeypatch.setattr(maintenance, "_partitions", lambda: [])
+        
+        created = maintenance.ensure_partitions(now=datetime(2026, 9, 19))
+        assert created == ["sentiment_analyses_p202609", "sentiment_analyses_p202610"]
+        default, september, october = bind.transactions
+        assert "PARTITION OF sentiment_analyses DEFAULT" in default[0]
+        assert [statement.split()[0] for statement in september] == ["LOCK", "SELECT", "CREATE", "WITH", "ALTER"]
+        assert "(LIKE sentiment_analyses" in september[2]
+        assert "DELETE FROM sentiment_analyses_default" in september[3]
+        assert september[4].startswith("ALTER TABLE sentiment_analyses ATTACH PARTITION sentiment_analyses_p202609")
+        assert [statement.split()[0] for statement in october] == ["LOCK", "SELECT", "CREATE"]
+        assert "sentiment_analyses_p202610 PARTITION OF sentiment_analyses FOR VALUES" in october[2]
+    
+    def test_invalid_interval(self, engine):
+        """Test that unknown intervals are rejected"""
+        with pytest.raises(ValueError):
+            HistoryMaintenance(engine, interval="weekly")
+    
+    def test_expire_deletes_whole_periods(self, engine, db):
+        """Test chunked expiry of every period that ended before the retention window"""
+        self._seed(db, [datetime(2026, 7, 3), datetime(2026, 7, 30, 23), datetime(2026, 8, 31), datetime(2026, 9, 1)])
+        maintenance = HistoryMaintenance(engine, interval="monthly", retention_days=30, chunk_size=1)
+        
+        # 30 days before 2026-10-19 is in September: July and August expire
+        expired = maintenance.run(now=datetime(2026, 10, 19))
+        assert expired == {"p202607": 2, "p202608": 2}
+        assert db.scalar(select(func.count()).select_from(SentimentAnalysis)) == 2
+        # Texts of expired analyses go too, unless still referenced
+        assert sorted(db.scalars(select(AnalyzedText.text))) == ["shared", "text 3"]
+        
+        assert maintenance.run(now=datetime(2026, 10, 19)) == {}
+    
+    def test_orphan_sweep_excludes_text_writers(self, engine, db, monkeypatch):
+        """Test that writers take the text store lock shared and the orphan sweep exclusively"""
+        locks = []
+        monkeypatch.setattr(crud, "lock_text_store", lambda session, exclusive=False: locks.append(exclusive))
+        self._seed(db, [datetime(2026, 7, 3), datetime(2026, 9, 1)])
+        assert locks and not any(locks)
+        
+        locks.clear()
+        HistoryMaintenance(engine, interval="monthly", retention_days=30).run(now=datetime(2026, 10, 19))
+        assert locks and all(locks)
+    
+    def test_expired_periods_are_archived(self, engine, db, tmp_path):
+        """Test Parquet export of expired periods before they are deleted"""
+        pq = pytest.importorskip("pyarrow.parquet")
+        self._seed(db, [datetime(2026, 9, 1, 8), datetime(2026, 9, 1, 9), datetime(2026, 9, 3)])
+        maintenance = HistoryMaintenance(engine, retention_days=7, archive_dir=str(tmp_path / "archive"), chunk_size=2)
+        
+        assert maintenance.expire(now=datetime(2026, 10, 19)) == {"p20260901": 2, "p20260903": 1, "p20260802": 1}
+        archived = pq.read_table(tmp_path / "archive" / "sentiment_analyses_p20260901.parquet").to_pylist()
+        assert [(row["text"], row["label"]) for row in archived] == [("text 0", "POSITIVE"), ("text 1", "POSITIVE")]
+        assert archived[0]["created_at"].hour == 8
+        assert sorted(os.listdir(tmp_path / "archive")) == [
+            "sentiment_analyses_p20260802.parquet",
+            "sentiment_analyses_p20260901.parquet",
+            "sentiment_analyses_p20260903.parquet"
+        ]
+
+
+class TestTimelineRollups:
+    """Tests for the minute, hour and day rollups behind /stats/timeline"""
+    
+    def test_timestamps_are_utc(self, db, monkeypatch):
+        """Test that writes use aware UTC times and bucket them in UTC"""
+        written = []
+        add_to_rollups = crud._add_to_rollups
+        
+        def record(session, analyses):
+            written.extend(analyses)
+            add_to_rollups(session, analyses)
+        
+        monkeypatch.setattr(crud, "_add_to_rollups", record)
+        crud.create_analysis(db, text="aware", label="POSITIVE", score=0.9, model_name="m")
+        crud.create_analyses_bulk(db, [("aware bulk", "NEGATIVE", 0.8)], model_name="m")
+        assert [created_at.utcoffset() for created_at, *_ in written] == [timedelta(0), timedelta(0)]
+        
+        local = datetime(2026, 10, 19, 1, 30, tzinfo=timezone(timedelta(hours=2)))
+        assert crud.bucket_start(local, "hour") == datetime(2026, 10, 18, 23)
+        assert crud.bucket_start(local, "day") == datetime(2026, 10, 18)
+    
+    def _rollups(self, db):
+        return sorted(
+            (r.granularity, r.bucket, r.label, r.count, round(r.score_sum, 6))
+            for r in db.query(AnalysisRollup) if r.count
+        )
+    
+    def test_rollups_are_maintained_on_write(self, db):
+        """Test that inserts and deletes keep every granularity in step"""
+        now = datetime.utcnow()
+        first = crud.create_analysis(db, text="good", label="POSITIVE", score=0.9, model_name="m")
+        crud.create_analyses_bulk(db, [("good", "POSITIVE", 0.8), ("bad", "NEGATIVE", 0.7)], model_name="m")
+        
+        for granularity in ("minute", "hour", "day"):
+            timeline = crud.get_timeline(db, granularity, now - timedelta(minutes=5), datetime.utcnow())
+            assert sum(timeline.values()) == 3
+            positive = crud.get_timeline(db, granularity, now - timedelta(minutes=5), datetime.utcnow(), label="POSITIVE")
+            assert sum(positive.values()) == 2
+        
+        crud.delete_analysis(db, first.id)
+        assert sum(crud.get_timeline(db, "hour", now, datetime.utcnow()).values()) == 2
+    
+    def test_empty_buckets_are_filled(self, db):
+        """Test one key per bucket in range, formatted by granularity"""
+        timeline = crud.get_timeline(db, "hour", datetime(2026, 10, 19, 22, 30), datetime(2026, 10, 20, 1, 5))
+        assert timeline == {"2026-10-19T22:00": 0, "2026-10-19T23:00": 0, "2026-10-20T00:00": 0, "2026-10-20T01:00": 0}
+        assert list(crud.get_timeline(db, "minute", datetime(2026, 10, 19, 22, 30), datetime(2026, 10, 19, 22, 31))) == [
+            "2026-10-19T22:30", "2026-10-19T22:31"
+        ]
+        with pytest.raises(ValueError):
+            crud.get_timeline(db, "week", datetime(2026, 10, 1), datetime(2026, 10, 19))
+    
+    def test_rebuild_matches_incremental_rollups(self, engine, db):
+        """Test that backfilled rollups equal the ones maintained on write"""
+        crud.create_analyses_bulk(db, [("good", "POSITIVE", 0.8), ("bad", "NEGATIVE", 0.7)], model_name="m")
+        crud.create_analysis(db, text="fine", label="POSITIVE", score=0.6, model_name="m")
+        incremental = self._rollups(db)
+        
+        db.query(AnalysisRollup).delete()
+        db.commit()
+        assert backfill_rollups(engine) == 3
+        db.expire_all()
+        assert self._rollups(db) == incremental
+        # Nothing to do once rollups exist
+        assert backfill_rollups(engine) == 0
+    
+    def test_timeline_endpoint(self, api_client):
+        """Test granularity and label parameters of /stats/timeline"""
+        before = api_client.get("/api/v1/stats/timeline", params={"hours": 2, "granularity": "minute"}).json()
+        api_client.post("/api/v1/batch-analyze", json={"texts": ["great service", "awful service", "good"]})
+        
+        response = api_client.get("/api/v1/stats/timeline", params={"hours": 2, "granularity": "minute"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["granularity"] == "minute"
+        assert len(data["dates"]) in (120, 121)
+        assert data["total"] == before["total"] + 3
+        
+        hourly = api_client.get("/api/v1/stats/timeline", params={"days": 1, "granularity": "hour"}).json()
+        by_label = [
+            api_client.get("/api/v1/stats/timeline", params={"days": 1, "granularity": "hour", "label": label}).json()
+            for label in ("POSITIVE", "NEGATIVE")
+        ]
+        assert by_label[0]["label"] == "POSITIVE"
+        assert by_label[0]["total"] + by_label[1]["total"] == hourly["total"]
+        assert list(api_client.get("/api/v1/stats/timeline").json()["dates"])[0].count("-") == 2
+    
+    def test_timeline_limits(self, api_client):
+        """Test rejected granularities and ranges with too many buckets"""
+        assert api_client.get("/api/v1/stats/timeline", params={"granularity": "week"}).status_code == 422
+        response = api_client.get("/api/v1/stats/timeline", params={"days": 30, "granularity": "minute"})
+        assert response.status_code == 400
+
+
+class TestScoreHistograms:
+    """Tests for the score histograms behind /stats/drift"""
+    
+    def test_windows_merge_day_and_hour_buckets(self, db):
+        """Test that any hour-aligned window counts each analysis once"""
+        crud._add_to_rollups(db, [
+            (datetime(2026, 10, 17, 23, 30), "POSITIVE", 0.91, "m"),
+            (datetime(2026, 10, 18, 0, 10), "POSITIVE", 0.95, "m"),
+            (datetime(2026, 10, 18, 12, 0), "NEGATIVE", 0.55, "m"),
+            (datetime(2026, 10, 19, 1, 0), "POSITIVE", 0.99, "other")
+        ])
+        db.commit()
+        
+        def counts(start, end, **kwargs):
+            histograms = crud.get_score_histograms(db, start, end, **kwargs)
+            return {label: sum(bins) for label, bins in histograms.items()}
+        
+        assert counts(datetime(2026, 10, 17, 23), datetime(2026, 10, 19, 2)) == {"POSITIVE": 3, "NEGATIVE": 1}
+        assert counts(datetime(2026, 10, 18), datetime(2026, 10, 19)) == {"POSITIVE": 1, "NEGATIVE": 1}
+        assert counts(datetime(2026, 10, 18, 1), datetime(2026, 10, 18, 13)) == {"NEGATIVE": 1}
+        assert counts(datetime(2026, 10, 17), datetime(2026, 10, 20), model_name="other") == {"POSITIVE": 1}
+        
+        histograms = crud.get_score_histograms(db, datetime(2026, 10, 18), datetime(2026, 10, 19))
+        assert histograms["NEGATIVE"][55] == 1
+        assert len(histograms["NEGATIVE"]) == SCORE_BINS
+    
+    def test_drift_endpoint(self, api_client, tiny_model_dir):
+        """Test window summaries and comparison of /stats/drift"""
+        api_client.post("/api/v1/batch-analyze", json={"texts": ["great service drift", "awful drift", "good drift"]})
+        
+        response = api_client.get(
+            "/api/v1/stats/drift",
+            params={"hours": 1, "baseline_hours": 24, "model_name": tiny_model_dir, "low_confidence": 0.7}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["current"]["total"] >= 3
+        assert sum(data["current"]["label_mix"].values()) == pytest.approx(1.0, abs=1e-3)
+        assert data["current"]["scores"]["count"] == data["current"]["total"]
+        assert set(data["current"]["scores"]["quantiles"]) == {"p05", "p25", "p50", "p75", "p95"}
+        assert data["low_confidence_threshold"] == 0.7
+        assert set(data["scores"]) == {"median_shift", "low_confidence_rate_change", "psi", "ks"}
+        assert set(data["labels"]) == set(data["current"]["labels"]) | set(data["baseline"]["labels"])
+        
+        assert api_client.get("/api/v1/stats/drift", params={"low_confidence": 2}).status_code == 422
+
+
+class TestHistoryExport:
+    """Tests for the streaming history export"""
+    
+    def _seed(self, db):
+        crud.create_analyses_bulk(db, [
+            ("great, really", "POSITIVE", 0.95),
+            ('awful "service"\nreally', "NEGATIVE", 0.85),
+            ("fine", "POSITIVE", 0.55)
+        ], processing_time_ms=2.0, model_name="m")
+        crud.create_analysis(db, text="other model", label="POSITIVE", score=0.9, model_name="other")
+    
+    def test_csv_is_streamed_in_chunks(self, db):
+        """Test that every chunk is encoded separately and the CSV round-trips"""
+        import csv
+        import io
+        
+        self._seed(db)
+        chunks = list(export.stream_export(db, "csv", chunk_size=2))
+        assert len(chunks) == 2
+        rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+        assert list(rows[0]) == list(export.COLUMNS)
+        assert [row["text"] for row in rows] == ["great, really", 'awful "service"\nreally', "fine", "other model"]
+        assert rows[0]["model_name"] == "m"
+    
+    def test_filters(self, db):
+        """Test the /history filters on an NDJSON export"""
+        import json
+        
+        self._seed(db)
+        lines = b"".join(export.stream_export(db, "ndjson", label="POSITIVE", min_score=0.6, model_name="m"))
+        records = [json.loads(line) for line in lines.splitlines()]
+        assert [record["text"] for record in records] == ["great, really"]
+        assert set(records[0]) == set(export.COLUMNS)
+    
+    def test_parquet(self, db):
+        """Test that a streamed Parquet file has one row group per chunk"""
+        import io
+        
+        pq = pytest.importorskip("pyarrow.parquet")
+        self._seed(db)
+        data = b"".join(export.stream_export(db, "parquet", chunk_size=3))
+        parquet_file = pq.ParquetFile(io.BytesIO(data))
+        assert parquet_file.metadata.num_row_groups == 2
+        assert parquet_file.read().column("label").to_pylist() == ["POSITIVE", "NEGATIVE", "POSITIVE", "POSITIVE"]
+        
+        with pytest.raises(ValueError):
+            list(export.stream_export(db, "xlsx"))
+    
+    def test_export_endpoint(self, api_client):
+        """Test /history/export formats and headers"""
+        api_client.post("/api/v1/batch-analyze", json={"texts": ["great export", "awful export"]})
+        
+        response = api_client.get("/api/v1/history/export", params={"label": "NEGATIVE"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert 'filename="analyses.csv"' in response.headers["content-disposition"]
+        lines = response.text.splitlines()
+        assert lines[0].split(",") == list(export.COLUMNS)
+        assert all(",NEGATIVE," in line for line in lines[1:])
+        
+        response = api_client.get("/api/v1/history/export", params={"format": "ndjson"})
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert response.text.count("\n") >= 2
+        assert api_client.get("/api/v1/history/export", params={"format": "xlsx"}).status_code == 422
+    
+    def test_export_owns_its_session(self, api_client, monkeypatch):
+        """Test that the export session stays open until the last chunk has been streamed"""
+        api_client.post("/api/v1/batch-analyze", json={"texts": ["great export", "awful export"]})
+        events = []
+        stream_export = export.stream_export
+        close = Session.close
+        
+        def recording_stream_export(db, *args, **kwargs):
+            for chunk in stream_export(db, *args, chunk_size=1, **kwargs):
+                events.append(("chunk", db))
+                yield chunk
+        
+        def recording_close(self):
+            events.append(("close", self))
+            close(self)
+        
+        monkeypatch.setattr(export, "stream_export", recording_stream_export)
+        monkeypatch.setattr(Session, "close", recording_close)
+        assert api_client.get("/api/v1/history/export").status_code == 200
+        
+        chunks = [i for i, (event, db) in enumerate(events) if event == "chunk"]
+        db = events[chunks[0]][1]
+        closes = [i for i, event in enumerate(events) if event == ("close", db)]
+        assert len(chunks) >= 2 and len(closes) == 1
+        assert closes[0] > chunks[-1]
+    
+    def test_unavailable_format(self, api_client, monkeypatch):
+        """Test 406 when pyarrow is missing"""
+        monkeypatch.setattr(export, "pyarrow", None)
+        assert api_client.get("/api/v1/history/export", params={"format": "parquet"}).status_code == 406
+
+
+class TestReadReplica:
+    """Tests for routing read-only endpoints to a replica"""
+    
+    @pytest.fixture
+    def replica(self, tmp_path):
+        replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+        Base.metadata.create_all(bind=replica)
+        yield replica
+        replica.dispose()
+    
+    @staticmethod
+    def _add(bind, created_at):
+        with Session(bind) as session:
+            crud.create_analysis(session, text="replicated", label="POSITIVE", score=0.9, model_name="m")
+            session.execute(update(SentimentAnalysis).values(created_at=created_at))
+            session.commit()
+    
+    def test_replica_lag(self, engine, replica):
+        """Test lag from the newest analysis on each side"""
+        assert replica_lag(engine, replica) == 0.0
+        self._add(engine, datetime(2026, 10, 19, 12, 0))
+        assert replica_lag(engine, replica) == math.inf
+        
+        self._add(replica, datetime(2026, 10, 19, 11, 59))
+        assert replica_lag(engine, replica) == 60.0
+        self._add(replica, datetime(2026, 10, 19, 12, 1))
+        assert replica_lag(engine, replica) == 0.0
+    
+    def test_guard_falls_back_and_recovers(self, engine, replica):
+        """Test that a lagging or broken replica is skipped until it catches up"""
+        guard = ReplicaLagGuard(engine, replica, max_lag_s=30, check_interval_s=3600)
+        self._add(engine, datetime(2026, 10, 19, 12, 0))
+        self._add(replica, datetime(2026, 10, 19, 11, 0))
+        assert guard.use_replica() is False
+        assert guard.lag_s == 3600.0
+        
+        # Not re-checked before the interval
+        self._add(replica, datetime(2026, 10, 19, 12, 0))
+        assert guard.use_replica() is False
+        assert guard.check() is True
+        
+        broken = create_engine("sqlite:///file:missing?mode=ro&uri=true")
+        assert ReplicaLagGuard(engine, broken, max_lag_s=30).use_replica() is False
+    
+    def test_read_endpoints_use_the_replica(self, api_client, engine, replica, monkeypatch):
+        """Test that reads go to the replica and fall back to the primary while it lags"""
+        from sqlalchemy.orm import sessionmaker
+        from database import database
+        
+        monkeypatch.setattr(database, "read_engine", replica)
+        monkeypatch.setattr(database, "ReadSessionLocal", sessionmaker(bind=replica))
+        api_client.post("/api/v1/batch-analyze", json={"texts": ["written to the primary"]})
+        
+        response = api_client.get("/api/v1/history", params={"page_size": 1})
+        assert response.json()["total"] == 0
+        assert api_client.get("/api/v1/stats").json()["total_analyses"] == 0
+        
+        # The empty replica lags the primary, so reads fall back to it
+        monkeypatch.setattr(database, "read_guard", ReplicaLagGuard(database.engine, replica, max_lag_s=30))
+        response = api_client.get("/api/v1/history", params={"page_size": 1})
+        assert response.json()["total"] > 0
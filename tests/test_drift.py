@@ -0,0 +1,65 @@
+"""
+Tests for score distribution summaries and drift measures
+"""
+
+import pytest
+
+from utils import drift
+
+
+def histogram(**bins):
+    counts = [0] * 100
+    for index, count in bins.items():
+        counts[int(index[1:])] = count
+    return counts
+
+
+class TestScoreSummary:
+    """Tests for quantiles and low-confidence rates of one histogram"""
+    
+    def test_quantiles_interpolate_within_bins(self):
+        """Test quantiles of a uniform histogram and of a single bin"""
+        uniform = [1] * 100
+        assert drift.quantile(uniform, 0.5) == pytest.approx(0.5)
+        assert drift.quantile(uniform, 0.05) == pytest.approx(0.05)
+        assert 0.9 <= drift.quantile(histogram(b90=4), 0.5) <= 0.91
+        assert drift.quantile([0] * 100, 0.5) is None
+    
+    def test_summary(self):
+        """Test count, named quantiles and the low-confidence rate"""
+        summary = drift.summarize(histogram(b55=1, b58=1, b92=2), threshold=0.6)
+        assert summary["count"] == 4
+        assert list(summary["quantiles"]) == ["p05", "p25", "p50", "p75", "p95"]
+        assert summary["low_confidence_rate"] == 0.5
+        assert drift.summarize([], 0.6) == {"count": 0, "quantiles": {}, "low_confidence_rate": 0.0}
+
+
+class TestDrift:
+    """Tests for comparing two windows"""
+    
+    def test_identical_windows_do_not_drift(self):
+        """Test that equal distributions have no shift"""
+        scores = histogram(b70=3, b95=7)
+        shift = drift.compare(scores, scores, threshold=0.6)
+        assert shift == {"median_shift": 0.0, "low_confidence_rate_change": 0.0, "psi": 0.0, "ks": 0.0}
+    
+    def test_shifted_scores(self):
+        """Test that a move towards low confidence is measured by every statistic"""
+        baseline = histogram(b90=80, b95=20)
+        current = histogram(b55=50, b90=50)
+        shift = drift.compare(current, baseline, threshold=0.6)
+        assert shift["median_shift"] < -0.3
+        assert shift["low_confidence_rate_change"] == 0.5
+        assert shift["psi"] > 0.2
+        assert shift["ks"] == 0.5
+    
+    def test_compare_windows_per_label(self):
+        """Test label mix change and labels present in only one window"""
+        current = {"POSITIVE": histogram(b90=1), "NEGATIVE": histogram(b80=3)}
+        baseline = {"POSITIVE": histogram(b90=4)}
+        
+        result = drift.compare_windows(current, baseline, threshold=0.6)
+        assert result["label_mix_change"] == {"NEGATIVE": 0.75, "POSITIVE": -0.75}
+        assert result["labels"]["POSITIVE"]["ks"] == 0.0
+        assert result["labels"]["NEGATIVE"]["psi"] is None
+        assert drift.describe(current, 0.6)["label_mix"] == {"NEGATIVE": 0.75, "POSITIVE": 0.25}
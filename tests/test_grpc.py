@@ -0,0 +1,166 @@
+"""
+Tests for the gRPC inference service
+"""
+
+import asyncio
+
+import pytest
+
+grpc = pytest.importorskip("grpc")
+pytest.importorskip("grpc_health")
+
+from grpc_health.v1 import health_pb2, health_pb2_grpc  # noqa: E402
+
+from api.grpc_server import SERVICE_NAME, GrpcServer, SentimentServicer  # noqa: E402
+from api.proto import sentiment_pb2, sentiment_pb2_grpc  # noqa: E402
+from tests.test_registry import make_registry  # noqa: E402
+
+
+def run_with_server(test, **kwargs):
+    """Run `test(stub, channel)` against a server on a free local port"""
+    async def run():
+        registry = make_registry()
+        server = GrpcServer(registry, 0, host="127.0.0.1", **kwargs)
+        await server.start()
+        try:
+            async with grpc.aio.insecure_channel(f"127.0.0.1:{server.port}") as channel:
+                return await test(sentiment_pb2_grpc.SentimentServiceStub(channel), channel)
+        finally:
+            await server.stop(grace=0)
+            registry.close()
+    
+    return asyncio.run(run())
+
+
+class TestGrpcService:
+    """Tests for the SentimentService RPCs"""
+    
+    def test_analyze(self):
+        """Test that a unary call is scored by the registry's default model"""
+        async def test(stub, channel):
+            return await stub.Analyze(sentiment_pb2.AnalyzeRequest(text="  a bad day ", id="r1"))
+        
+        response = run_with_server(test)
+        assert (response.id, response.text, response.label) == ("r1", "a bad day", "NEGATIVE")
+        assert response.model_name == "model-en"
+        assert response.score == pytest.approx(0.9)
+    
+    def test_invalid_arguments(self):
+        """Test that empty texts and unknown models are INVALID_ARGUMENT"""
+        async def test(stub, channel):
+            codes = []
+            for request in (
+                sentiment_pb2.AnalyzeRequest(text="   "),
+                sentiment_pb2.AnalyzeRequest(text="good", model="missing")
+            ):
+                with pytest.raises(grpc.aio.AioRpcError) as exc_info:
+                    await stub.Analyze(request)
+                codes.append(exc_info.value.code())
+            return codes
+        
+        assert run_with_server(test) == [grpc.StatusCode.INVALID_ARGUMENT] * 2
+    
+    def test_batch_analyze(self):
+        """Test that batches skip empty texts and keep the order"""
+        async def test(stub, channel):
+            return await stub.BatchAnalyze(sentiment_pb2.BatchAnalyzeRequest(
+                texts=["good", " ", "bad", "good"],
+                model="es"
+            ))
+        
+        response = run_with_server(test)
+        assert response.total_analyzed == 3
+        assert [r.label for r in response.results] == ["POSITIVE", "NEGATIVE", "POSITIVE"]
+        assert response.model_name == "model-es"
+    
+    def test_batch_limits(self):
+        """Test that batches outside the REST limits are INVALID_ARGUMENT"""
+        async def test(stub, channel):
+            codes = []
+            for texts in (["good"] * 101, ["good", "a" * 5001], [" ", ""]):
+                with pytest.raises(grpc.aio.AioRpcError) as exc_info:
+                    await stub.BatchAnalyze(sentiment_pb2.BatchAnalyzeRequest(texts=texts))
+                codes.append(exc_info.value.code())
+            response = await stub.BatchAnalyze(sentiment_pb2.BatchAnalyzeRequest(texts=["a" * 5000] * 100))
+            return codes, response.total_analyzed
+        
+        codes, total_analyzed = run_with_server(test)
+        assert codes == [grpc.StatusCode.INVALID_ARGUMENT] * 3
+        assert total_analyzed == 100
+    
+    def test_analyze_stream(self):
+        """Test that every streamed request gets a response with its id"""
+        async def requests():
+            for i in range(20):
+                yield sentiment_pb2.AnalyzeRequest(text=f"good {i}" if i != 7 else "", id=str(i))
+        
+        async def test(stub, channel):
+            return [response async for response in stub.AnalyzeStream(requests())]
+        
+        responses = run_with_server(test, max_stream_outstanding=4)
+        assert sorted(int(r.id) for r in responses) == list(range(20))
+        errors = {r.id: r.error for r in responses if r.error}
+        assert list(errors) == ["7"]
+        assert all(r.text == f"good {r.id}" for r in responses if not r.error)
+    
+    def test_analyze_stream_stops_reading_for_a_slow_client(self):
+        """Test that a client that does not read holds the stream at max_stream_outstanding"""
+        consumed = 0
+        
+        async def requests():
+            nonlocal consumed
+            for i in range(20):
+                consumed += 1
+                yield sentiment_pb2.AnalyzeRequest(text="good", id=str(i))
+        
+        class Context:
+            def time_remaining(self):
+                return None
+        
+        async def run():
+            registry = make_registry()
+            servicer = SentimentServicer(registry, max_stream_outstanding=3)
+            stream = servicer.AnalyzeStream(requests(), Context())
+            try:
+                first = await stream.__anext__()
+                # The client never asks for the next response
+                await asyncio.sleep(0.2)
+                return first, consumed
+            finally:
+                await stream.aclose()
+                registry.close()
+        
+        first, consumed = asyncio.run(run())
+        assert first.label == "POSITIVE"
+        assert consumed == 3
+    
+    def test_health(self):
+        """Test that the server and the service report SERVING"""
+        async def test(stub, channel):
+            health = health_pb2_grpc.HealthStub(channel)
+            return [
+                (await health.Check(health_pb2.HealthCheckRequest(service=service))).status
+                for service in ("", SERVICE_NAME)
+            ]
+        
+        assert run_with_server(test) == [health_pb2.HealthCheckResponse.SERVING] * 2
+    
+    def test_served_from_the_api_process(self, tiny_model_dir, monkeypatch):
+        """Test that GRPC_ENABLED serves the API's registry alongside REST"""
+        from fastapi.testclient import TestClient
+        from api.config import settings
+        from api.main import app
+        
+        monkeypatch.setattr(settings, "MODEL_NAME", tiny_model_dir)
+        monkeypatch.setattr(settings, "MODEL_WARMUP_ENABLED", False)
+        monkeypatch.setattr(settings, "GRPC_ENABLED", True)
+        monkeypatch.setattr(settings, "GRPC_PORT", 0)
+        
+        with TestClient(app) as client:
+            port = client.app.state.grpc_server.port
+            with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+                response = sentiment_pb2_grpc.SentimentServiceStub(channel).Analyze(
+                    sentiment_pb2.AnalyzeRequest(text="good")
+                )
+            assert response.model_name == client.app.state.registry.get().analyzer.model_name
+            assert client.post("/api/v1/analyze", json={"text": "good"}).json()["label"] == response.label
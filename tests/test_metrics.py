@@ -0,0 +1,83 @@
+"""
+Tests for the Prometheus-style metrics
+"""
+
+import asyncio
+import threading
+
+from models.batcher import MicroBatcher
+from models.cache import ResultCache
+from utils.metrics import (
+    INFERENCE_BATCH_SIZE,
+    INFERENCE_QUEUE_WAIT,
+    RESULT_CACHE_REQUESTS,
+    MetricsRegistry
+)
+from tests.test_registry import FakeAnalyzer
+
+
+class TestMetricsRegistry:
+    """Tests for counters, histograms, gauges and text rendering"""
+    
+    def test_counter_sums_thread_shards(self):
+        """Test that increments from many threads are all counted"""
+        registry = MetricsRegistry()
+        counter = registry.counter("jobs_total", "Jobs", ("queue",))
+        
+        def work():
+            for _ in range(1000):
+                counter.labels("a").inc()
+        
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert counter.get("a") == 8000
+        assert 'jobs_total{queue="a"} 8000' in registry.render()
+    
+    def test_histogram_buckets_are_cumulative(self):
+        """Test bucket, sum and count lines of a histogram"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 2.0):
+            histogram.observe(value)
+        
+        output = registry.render()
+        assert "# TYPE latency_seconds histogram" in output
+        assert 'latency_seconds_bucket{le="0.1"} 1' in output
+        assert 'latency_seconds_bucket{le="1"} 2' in output
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in output
+        assert "latency_seconds_sum 2.55" in output
+        assert "latency_seconds_count 3" in output
+    
+    def test_gauge_and_label_escaping(self):
+        """Test callback gauges with labels that need escaping"""
+        registry = MetricsRegistry()
+        registry.gauge("depth", "Depth", lambda: {('q"1',): 3}, ("queue",))
+        
+        assert 'depth{queue="q\\"1"} 3' in registry.render()
+
+
+class TestInferenceMetrics:
+    """Tests for metrics recorded by the batcher and result cache"""
+    
+    def test_batcher_records_batch_size_and_queue_wait(self):
+        """Test that each batch is observed once with its size"""
+        batcher = MicroBatcher(FakeAnalyzer("model"), max_wait_ms=20, name="metrics-test")
+        asyncio.run(batcher.submit_many(["a", "b", "c"]))
+        batcher.close()
+        
+        assert INFERENCE_BATCH_SIZE.get_count("metrics-test") == 1
+        assert INFERENCE_QUEUE_WAIT.get_count("metrics-test", "bulk") == 3
+    
+    def test_cache_counts_hits_and_misses(self):
+        """Test that cache lookups are counted by outcome"""
+        cache = ResultCache(max_size=10, name="cache-test")
+        cache.put("a", {})
+        cache.get("a")
+        cache.get("b")
+        
+        assert RESULT_CACHE_REQUESTS.get("cache-test", "hit") == 1
+        assert RESULT_CACHE_REQUESTS.get("cache-test", "miss") == 1
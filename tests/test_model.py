@@ -4,6 +4,8 @@ Unit tests for the sentiment analysis model
 
 import pytest
 from models.sentiment_model import SentimentAnalyzer, get_analyzer
+from models.artifact import prepare_model_artifact, is_model_artifact, load_manifest
+from api.config import settings
 
 
 class TestSentimentAnalyzer:
@@ -94,6 +96,202 @@ class TestSentimentAnalyzer:
         assert info["model_name"] == "distilbert-base-uncased-finetuned-sst-2-english"
 
 
+class TestWarmup:
+    """Test suite for model warmup and compilation"""
+    
+    def test_warmup_disabled_by_default(self, tiny_model_dir):
+        """Test that no warmup stats are reported without warmup"""
+        analyzer = SentimentAnalyzer(model_name=tiny_model_dir)
+        info = analyzer.get_model_info()
+        
+        assert info["warmup"] is None
+        assert info["compile_mode"] == "none"
+    
+    def test_warmup_reports_stats(self, tiny_model_dir):
+        """Test that warmup timing is reported in model info"""
+        analyzer = SentimentAnalyzer(
+            model_name=tiny_model_dir,
+            warmup=True,
+            warmup_seq_lengths=[8, 32],
+            warmup_batch_sizes=[1, 4]
+        )
+        stats = analyzer.get_model_info()["warmup"]
+        
+        assert stats["warmup_time_ms"] > 0
+        assert stats["cold_latency_ms"] > 0
+        assert stats["warm_latency_ms"] > 0
+        assert stats["first_request_speedup"] > 0
+        assert stats["seq_lengths"] == [8, 32]
+        assert stats["batch_sizes"] == [1, 4]
+    
+    def test_trace_mode_matches_eager(self, tiny_model_dir):
+        """Test that a traced model gives the same predictions"""
+        texts = ["great service", "this is the worst experience ever"]
+        eager = SentimentAnalyzer(model_name=tiny_model_dir)
+        traced = SentimentAnalyzer(
+            model_name=tiny_model_dir,
+            warmup=True,
+            compile_mode="trace"
+        )
+        
+        assert traced.get_model_info()["compile_mode"] == "trace"
+        assert traced.analyze_batch(texts) == eager.analyze_batch(texts)
+    
+    def test_trace_failing_at_other_lengths_falls_back(self, tiny_model_dir, monkeypatch):
+        """Test that a traced graph tied to its example length is rejected without warmup"""
+        from models import sentiment_model
+        
+        traced_class = sentiment_model._TracedSequenceClassifier
+        init, forward = traced_class.__init__, traced_class.forward
+        
+        def recording_init(self, model, example_inputs):
+            init(self, model, example_inputs)
+            self.example_length = example_inputs["input_ids"].shape[1]
+        
+        def fixed_length_forward(self, input_ids=None, attention_mask=None, **kwargs):
+            if input_ids.shape[1] != self.example_length:
+                raise RuntimeError("shape mismatch")
+            return forward(self, input_ids=input_ids, attention_mask=attention_mask)
+        
+        monkeypatch.setattr(traced_class, "__init__", recording_init)
+        monkeypatch.setattr(traced_class, "forward", fixed_length_forward)
+        analyzer = SentimentAnalyzer(model_name=tiny_model_dir, warmup=False, compile_mode="trace")
+        
+        assert analyzer.get_model_info()["compile_mode"] == "none"
+        assert analyzer.analyze("a short text")["label"] in ("POSITIVE", "NEGATIVE")
+    
+    def test_invalid_compile_mode(self, tiny_model_dir):
+        """Test that an unknown compile mode raises ValueError"""
+        with pytest.raises(ValueError, match="Invalid compile_mode"):
+            SentimentAnalyzer(model_name=tiny_model_dir, compile_mode="fast")
+
+
+class TestModelArtifact:
+    """Test suite for prepared offline model artifacts"""
+    
+    def test_prepare_artifact(self, tiny_model_dir, tmp_path):
+        """Test that prepare_model_artifact writes safetensors and a manifest"""
+        output_dir = str(tmp_path / "artifact")
+        manifest = prepare_model_artifact(tiny_model_dir, output_dir)
+        
+        assert is_model_artifact(output_dir)
+        assert load_manifest(output_dir) == manifest
+        assert manifest["model_name"] == tiny_model_dir
+        assert manifest["format"] == "safetensors"
+        assert "model.safetensors" in manifest["files"]
+    
+    def test_load_artifact_offline(self, tiny_model_dir, tmp_path, monkeypatch):
+        """Test that an artifact loads without hub access and predicts the same"""
+        output_dir = str(tmp_path / "artifact")
+        prepare_model_artifact(tiny_model_dir, output_dir)
+        monkeypatch.setenv("HF_HUB_OFFLINE", "1")
+        
+        analyzer = SentimentAnalyzer(artifact_dir=output_dir)
+        reference = SentimentAnalyzer(model_name=tiny_model_dir)
+        texts = ["great product", "terrible service"]
+        
+        assert analyzer.model_name == tiny_model_dir
+        assert analyzer.get_model_info()["artifact_dir"] == output_dir
+        assert analyzer.get_model_info()["load_time_ms"] > 0
+        assert analyzer.analyze_batch(texts) == reference.analyze_batch(texts)
+    
+    def test_quantized_float16_artifact(self, tiny_model_dir, tmp_path):
+        """Test that a float16, int8-quantized artifact loads and runs"""
+        output_dir = str(tmp_path / "artifact")
+        manifest = prepare_model_artifact(
+            tiny_model_dir, output_dir, dtype="float16", quantize="dynamic-int8"
+        )
+        analyzer = SentimentAnalyzer(artifact_dir=output_dir)
+        result = analyzer.analyze("i love this product")
+        
+        assert manifest["dtype"] == "float16"
+        assert result["label"] in ("POSITIVE", "NEGATIVE")
+    
+    def test_invalid_artifact_dir(self, tmp_path):
+        """Test that a directory without a manifest is rejected"""
+        with pytest.raises(FileNotFoundError):
+            SentimentAnalyzer(artifact_dir=str(tmp_path))
+
+
+class TestMmapWeights:
+    """Test suite for memory-mapped weight loading"""
+    
+    @pytest.fixture(scope="class")
+    def large_model_dir(self, tiny_model_dir, tmp_path_factory):
+        """Model with a ~64MB embedding matrix, so load memory is measurable"""
+        import shutil
+        from transformers import DistilBertConfig, DistilBertForSequenceClassification
+        
+        model_dir = tmp_path_factory.mktemp("large-model")
+        for name in ("tokenizer.json", "tokenizer_config.json", "vocab.txt"):
+            shutil.copy(f"{tiny_model_dir}/{name}", model_dir / name)
+        config = DistilBertConfig(
+            vocab_size=64000,
+            dim=256,
+            hidden_dim=512,
+            n_layers=2,
+            n_heads=4,
+            id2label={0: "NEGATIVE", 1: "POSITIVE"},
+            label2id={"NEGATIVE": 0, "POSITIVE": 1}
+        )
+        DistilBertForSequenceClassification(config).save_pretrained(str(model_dir))
+        return str(model_dir)
+    
+    def test_mmap_predictions_match(self, tiny_model_dir):
+        """Test that mmap loading gives the same predictions"""
+        texts = ["great service", "i love this product", "worst experience"]
+        mapped = SentimentAnalyzer(model_name=tiny_model_dir, mmap_weights=True)
+        regular = SentimentAnalyzer(model_name=tiny_model_dir)
+        
+        assert mapped.get_model_info()["mmap_weights"] is True
+        assert mapped.analyze_batch(texts) == regular.analyze_batch(texts)
+    
+    def test_parameters_are_file_backed(self, tiny_model_dir):
+        """Test that every parameter points into the weights file mapping"""
+        import ctypes
+        
+        analyzer = SentimentAnalyzer(model_name=tiny_model_dir, mmap_weights=True)
+        ranges = []
+        for mapping in analyzer._weight_mappings:
+            start = ctypes.addressof(ctypes.c_char.from_buffer(mapping))
+            ranges.append((start, start + len(mapping)))
+        
+        for name, param in analyzer.pipeline.model.named_parameters():
+            pointer = param.data_ptr()
+            assert any(start <= pointer < end for start, end in ranges), name
+    
+    def test_peak_rss_during_load(self, large_model_dir):
+        """Test that RSS growth while loading stays below the configured ceiling"""
+        import threading
+        import time
+        from utils.memory_optimization import get_current_rss_mb
+        
+        if get_current_rss_mb() is None:
+            pytest.skip("RSS sampling requires /proc")
+        
+        baseline = get_current_rss_mb()
+        peak = [baseline]
+        done = threading.Event()
+        
+        def sample():
+            while not done.is_set():
+                peak[0] = max(peak[0], get_current_rss_mb())
+                time.sleep(0.001)
+        
+        sampler = threading.Thread(target=sample)
+        sampler.start()
+        try:
+            analyzer = SentimentAnalyzer(model_name=large_model_dir, mmap_weights=True)
+        finally:
+            done.set()
+            sampler.join()
+        
+        growth = peak[0] - baseline
+        assert growth < settings.MODEL_LOAD_RSS_CEILING_MB
+        # Weights are not copied: far less than a single copy of them is resident
+        assert growth < analyzer.weights_mb / 2
+
+
 class TestGetAnalyzer:
     """Test suite for get_analyzer singleton function"""
     
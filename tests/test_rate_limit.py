@@ -0,0 +1,127 @@
+"""
+Tests for rate limiting of inference endpoints
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from api.rate_limit import InMemoryBucketStore, RateLimiter, estimate_cost
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+def make_request(api_key=None, host="10.0.0.1"):
+    headers = [(b"x-api-key", api_key.encode())] if api_key else []
+    return Request({"type": "http", "headers": headers, "client": (host, 1234)})
+
+
+class TestTokenBucket:
+    """Tests for the in-memory token bucket"""
+    
+    def test_cost_is_weighted_by_text_length(self):
+        """Test that long texts and batches cost more than one short text"""
+        assert estimate_cost(["great"]) == 1
+        assert estimate_cost(["great"] * 100) == 100
+        assert estimate_cost(["x" * 2000], tokens_per_unit=128) == 4
+    
+    def test_bucket_refills_over_time(self):
+        """Test that a drained bucket reports when it refills"""
+        clock = FakeClock()
+        store = InMemoryBucketStore(clock=clock)
+        
+        async def run():
+            assert (await store.consume("a", 3, capacity=3, refill_per_s=1))[0]
+            allowed, retry_after = await store.consume("a", 2, capacity=3, refill_per_s=1)
+            assert not allowed and retry_after == pytest.approx(2.0)
+            clock.now = 2.0
+            assert (await store.consume("a", 2, capacity=3, refill_per_s=1))[0]
+            # Other clients have their own bucket
+            assert (await store.consume("b", 3, capacity=3, refill_per_s=1))[0]
+        
+        asyncio.run(run())
+    
+    def test_least_recently_used_buckets_are_dropped(self):
+        """Test that the store stays bounded"""
+        store = InMemoryBucketStore(max_keys=2)
+        
+        async def run():
+            for key in ("a", "b", "c"):
+                await store.consume(key, 1, capacity=1, refill_per_s=1)
+        
+        asyncio.run(run())
+        assert list(store._buckets) == ["b", "c"]
+
+
+class TestRateLimiter:
+    """Tests for request admission"""
+    
+    def test_rejects_with_retry_after(self):
+        """Test that an over-limit client gets 429 with Retry-After"""
+        limiter = RateLimiter(per_minute=60, burst=2)
+        
+        async def run():
+            await limiter.acquire(make_request(), ["a", "b"])
+            with pytest.raises(HTTPException) as exc_info:
+                await limiter.acquire(make_request(), ["a"])
+            return exc_info.value
+        
+        error = asyncio.run(run())
+        assert error.status_code == 429
+        assert error.headers["Retry-After"] == "1"
+    
+    def test_clients_are_keyed_by_api_key_then_ip(self):
+        """Test that API keys get their own bucket, separate from the IP"""
+        limiter = RateLimiter(per_minute=1)
+        
+        async def run():
+            await limiter.acquire(make_request(), ["a"])
+            await limiter.acquire(make_request(api_key="secret"), ["a"])
+            await limiter.acquire(make_request(host="10.0.0.2"), ["a"])
+        
+        asyncio.run(run())
+        assert RateLimiter.client_key(make_request(api_key="secret")).startswith("key:")
+        assert "secret" not in RateLimiter.client_key(make_request(api_key="secret"))
+    
+    def test_concurrency_limit(self):
+        """Test that the inference cap rejects without charging the client"""
+        limiter = RateLimiter(enabled=False, max_concurrent_inference=1)
+        
+        async def run():
+            slot = await limiter.acquire(make_request(), ["a"])
+            with pytest.raises(HTTPException):
+                await limiter.acquire(make_request(), ["a"])
+            slot.release()
+            slot.release()
+            assert limiter.in_flight == 0
+            await limiter.acquire(make_request(), ["a"])
+        
+        asyncio.run(run())
+
+
+class TestRateLimitedEndpoints:
+    """Tests for 429 responses from the API"""
+    
+    def test_batch_drains_the_bucket(self, api_client, monkeypatch):
+        """Test that a batch costs one unit per text"""
+        monkeypatch.setattr(api_client.app.state, "rate_limiter", RateLimiter(per_minute=3))
+        
+        response = api_client.post("/api/v1/batch-analyze", json={"texts": ["good", "bad", "great"]})
+        assert response.status_code == 200
+        
+        response = api_client.post("/api/v1/analyze", json={"text": "good"})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+    
+    def test_unlimited_by_default(self, api_client):
+        """Test that requests are not limited unless enabled"""
+        for _ in range(5):
+            assert api_client.post("/api/v1/analyze", json={"text": "good"}).status_code == 200
@@ -0,0 +1,523 @@
+"""
+Tests for the model registry, micro-batcher and result cache
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+
+from models.batcher import DeadlineExceeded, MicroBatcher
+from models.cache import ResultCache
+from models.registry import ModelRegistry
+from utils.metrics import INFERENCE_COALESCED, INFERENCE_QUEUE_WAIT, INFERENCE_SKIPPED
+
+
+class FakeAnalyzer:
+    """Stand-in for SentimentAnalyzer that records its batches"""
+    
+    def __init__(self, model_name, weights_mb=100.0, delay=0.0, **kwargs):
+        if model_name == "broken":
+            raise RuntimeError("Cannot load model")
+        self.model_name = model_name
+        self.weights_mb = weights_mb
+        self.delay = delay
+        self.batches = []
+    
+    def analyze_batch(self, texts, batch_size=8, return_all_scores=False):
+        self.batches.append(list(texts))
+        time.sleep(self.delay)
+        return [
+            {
+                "text": text,
+                "label": "NEGATIVE" if "bad" in text else "POSITIVE",
+                "score": 0.9,
+                "model_name": self.model_name
+            }
+            for text in texts
+        ]
+
+
+def make_registry(**kwargs):
+    """Registry over three fake models of 100MB each"""
+    options = {
+        "models": {"en": "model-en", "es": "model-es", "fr": "model-fr"},
+        "default_model": "en",
+        "loader": FakeAnalyzer
+    }
+    options.update(kwargs)
+    return ModelRegistry(**options)
+
+
+class TestResultCache:
+    """Tests for the LRU result cache"""
+    
+    def test_hit_and_miss(self):
+        """Test that hits and misses are counted"""
+        cache = ResultCache(max_size=2)
+        cache.put(("a", False), {"label": "POSITIVE"})
+        
+        assert cache.get(("a", False)) == {"label": "POSITIVE"}
+        assert cache.get(("b", False)) is None
+        assert cache.get_stats()["hit_ratio"] == 0.5
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used result is evicted"""
+        cache = ResultCache(max_size=2)
+        cache.put("a", {})
+        cache.put("b", {})
+        cache.get("a")
+        cache.put("c", {})
+        
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert len(cache) == 2
+
+
+class TestMicroBatcher:
+    """Tests for micro-batching of concurrent requests"""
+    
+    def test_concurrent_requests_share_a_batch(self):
+        """Test that concurrent submits are scored in one model call"""
+        analyzer = FakeAnalyzer("model")
+        batcher = MicroBatcher(analyzer, max_batch_size=8, max_wait_ms=20)
+        
+        async def run():
+            return await asyncio.gather(*(batcher.submit(f"text {i}") for i in range(5)))
+        
+        results = asyncio.run(run())
+        batcher.close()
+        
+        assert [r["text"] for r in results] == [f"text {i}" for i in range(5)]
+        assert len(analyzer.batches) == 1
+    
+    def test_batches_respect_max_size(self):
+        """Test that batches never exceed max_batch_size"""
+        analyzer = FakeAnalyzer("model")
+        batcher = MicroBatcher(analyzer, max_batch_size=3, max_wait_ms=20)
+        
+        results = asyncio.run(batcher.submit_many([f"text {i}" for i in range(7)]))
+        batcher.close()
+        
+        assert len(results) == 7
+        assert max(len(batch) for batch in analyzer.batches) <= 3
+    
+    def test_cache_skips_inference(self):
+        """Test that cached texts are not scored again"""
+        analyzer = FakeAnalyzer("model")
+        batcher = MicroBatcher(analyzer, cache=ResultCache(max_size=10))
+        
+        async def run():
+            await batcher.submit("great")
+            return await batcher.submit("great")
+        
+        result = asyncio.run(run())
+        batcher.close()
+        
+        assert result["label"] == "POSITIVE"
+        assert len(analyzer.batches) == 1
+        assert batcher.cache.hits == 1
+    
+    def test_submit_many_skips_empty_texts(self):
+        """Test that empty texts are filtered like in analyze_batch"""
+        batcher = MicroBatcher(FakeAnalyzer("model"))
+        
+        results = asyncio.run(batcher.submit_many(["good", "  ", "bad"]))
+        batcher.close()
+        
+        assert [r["text"] for r in results] == ["good", "bad"]
+        with pytest.raises(ValueError, match="All texts are empty"):
+            asyncio.run(batcher.submit_many(["", " "]))
+    
+    def test_identical_in_flight_requests_are_coalesced(self):
+        """Test that concurrent identical texts share one inference"""
+        analyzer = FakeAnalyzer("model", delay=0.05)
+        batcher = MicroBatcher(analyzer, max_batch_size=8, max_wait_ms=20, name="coalesce")
+        before = INFERENCE_COALESCED.get("coalesce", "in_flight")
+        
+        async def run():
+            return await asyncio.gather(*(batcher.submit("viral post") for _ in range(5)))
+        
+        results = asyncio.run(run())
+        batcher.close()
+        
+        assert analyzer.batches == [["viral post"]]
+        assert all(r["text"] == "viral post" for r in results)
+        assert len({id(r) for r in results}) == 5
+        assert INFERENCE_COALESCED.get("coalesce", "in_flight") - before == 4
+        assert batcher.get_stats()["in_flight"] == 0
+    
+    def test_submit_many_scores_duplicates_once(self):
+        """Test that duplicates within one batch are fanned back out"""
+        analyzer = FakeAnalyzer("model")
+        batcher = MicroBatcher(analyzer, name="dedup")
+        before = INFERENCE_COALESCED.get("dedup", "batch")
+        
+        results = asyncio.run(batcher.submit_many(["good", "bad", "good", "good"]))
+        batcher.close()
+        
+        assert [r["text"] for r in results] == ["good", "bad", "good", "good"]
+        assert sorted(text for batch in analyzer.batches for text in batch) == ["bad", "good"]
+        assert INFERENCE_COALESCED.get("dedup", "batch") - before == 2
+    
+    def test_cancelled_waiter_does_not_cancel_others(self):
+        """Test that a coalesced result survives one of its callers going away"""
+        analyzer = FakeAnalyzer("model", delay=0.05)
+        batcher = MicroBatcher(analyzer, max_wait_ms=1)
+        
+        async def run():
+            first = asyncio.ensure_future(batcher.submit("shared"))
+            second = asyncio.ensure_future(batcher.submit("shared"))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+        
+        result = asyncio.run(run())
+        batcher.close()
+        
+        assert result["text"] == "shared"
+        assert analyzer.batches == [["shared"]]
+
+
+class TestPriorityScheduling:
+    """Tests for priority classes in the micro-batcher"""
+    
+    def test_interactive_overtakes_queued_bulk_work(self):
+        """Test that an interactive text joins the next batch ahead of the bulk backlog"""
+        analyzer = FakeAnalyzer("model", delay=0.05)
+        batcher = MicroBatcher(analyzer, max_batch_size=4, max_wait_ms=1, bulk_chunk_size=16)
+        
+        async def run():
+            bulk = asyncio.ensure_future(batcher.submit_many([f"bulk {i}" for i in range(16)]))
+            await asyncio.sleep(0.02)
+            await batcher.submit("urgent")
+            await bulk
+        
+        asyncio.run(run())
+        batcher.close()
+        
+        assert "urgent" in analyzer.batches[1]
+        assert len(analyzer.batches) == 5
+    
+    def test_bulk_still_gets_its_share(self):
+        """Test that weighted fair queuing does not starve the bulk class"""
+        analyzer = FakeAnalyzer("model")
+        batcher = MicroBatcher(
+            analyzer,
+            max_batch_size=5,
+            max_wait_ms=20,
+            priority_weights={"interactive": 4, "bulk": 1}
+        )
+        
+        async def run():
+            await asyncio.gather(
+                *(batcher.submit(f"bulk {i}", priority="bulk") for i in range(10)),
+                *(batcher.submit(f"interactive {i}") for i in range(10))
+            )
+        
+        asyncio.run(run())
+        batcher.close()
+        
+        assert sum(text.startswith("bulk") for text in analyzer.batches[0]) == 1
+    
+    def test_bulk_requests_are_queued_in_chunks(self):
+        """Test that submit_many queues at most bulk_chunk_size texts at a time"""
+        analyzer = FakeAnalyzer("model")
+        batcher = MicroBatcher(analyzer, max_batch_size=8, max_wait_ms=20, bulk_chunk_size=2)
+        
+        results = asyncio.run(batcher.submit_many([f"text {i}" for i in range(6)]))
+        batcher.close()
+        
+        assert [r["text"] for r in results] == [f"text {i}" for i in range(6)]
+        assert [len(batch) for batch in analyzer.batches] == [2, 2, 2]
+    
+    def test_unknown_priority(self):
+        """Test that an unknown class is rejected"""
+        batcher = MicroBatcher(FakeAnalyzer("model"))
+        with pytest.raises(ValueError, match="Unknown priority"):
+            asyncio.run(batcher.submit("good", priority="urgent"))
+        batcher.close()
+    
+    def test_queue_wait_is_recorded_per_class(self):
+        """Test that queue wait is labelled with the priority class"""
+        batcher = MicroBatcher(FakeAnalyzer("model"), name="lanes")
+        
+        async def run():
+            await batcher.submit("one")
+            await batcher.submit_many(["two", "three"])
+        
+        asyncio.run(run())
+        batcher.close()
+        
+        assert INFERENCE_QUEUE_WAIT.get_count("lanes", "interactive") == 1
+        assert INFERENCE_QUEUE_WAIT.get_count("lanes", "bulk") == 2
+
+
+class TestDeadlines:
+    """Tests for dropping expired and cancelled work before inference"""
+    
+    def test_expired_texts_are_dropped_before_compute(self):
+        """Test that texts whose deadline passes in the queue are never scored"""
+        analyzer = FakeAnalyzer("model", delay=0.1)
+        batcher = MicroBatcher(analyzer, max_batch_size=1, max_wait_ms=1, name="deadline")
+        before = INFERENCE_SKIPPED.get("deadline", "expired")
+        
+        async def run():
+            busy = asyncio.ensure_future(batcher.submit("first"))
+            await asyncio.sleep(0.01)
+            with pytest.raises(DeadlineExceeded):
+                await batcher.submit("late", deadline=time.perf_counter() + 0.02)
+            await busy
+        
+        asyncio.run(run())
+        batcher.close()
+        
+        assert analyzer.batches == [["first"]]
+        assert INFERENCE_SKIPPED.get("deadline", "expired") - before == 1
+    
+    def test_submit_many_stops_between_chunks(self):
+        """Test that the remaining chunks are not queued after the deadline"""
+        analyzer = FakeAnalyzer("model", delay=0.05)
+        batcher = MicroBatcher(analyzer, max_wait_ms=1, bulk_chunk_size=2, name="chunks")
+        before = INFERENCE_SKIPPED.get("chunks", "expired")
+        
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(batcher.submit_many(
+                [f"text {i}" for i in range(6)],
+                deadline=time.perf_counter() + 0.03
+            ))
+        batcher.close()
+        
+        assert analyzer.batches == [["text 0", "text 1"]]
+        assert INFERENCE_SKIPPED.get("chunks", "expired") - before == 4
+    
+    def test_cancelled_requests_leave_the_queue(self):
+        """Test that a cancelled request's queued text is removed and counted"""
+        analyzer = FakeAnalyzer("model", delay=0.05)
+        batcher = MicroBatcher(analyzer, max_batch_size=1, max_wait_ms=1, name="cancel")
+        before = INFERENCE_SKIPPED.get("cancel", "cancelled")
+        
+        async def run():
+            busy = asyncio.ensure_future(batcher.submit("first"))
+            await asyncio.sleep(0.01)
+            abandoned = asyncio.ensure_future(batcher.submit("abandoned"))
+            await asyncio.sleep(0)
+            assert batcher.queue_depth == 1
+            abandoned.cancel()
+            await asyncio.sleep(0.01)
+            assert batcher.queue_depth == 0
+            await busy
+        
+        asyncio.run(run())
+        batcher.close()
+        
+        assert analyzer.batches == [["first"]]
+        assert INFERENCE_SKIPPED.get("cancel", "cancelled") - before == 1
+
+
+class TestModelRegistry:
+    """Tests for the multi-model registry"""
+    
+    def test_models_load_on_first_use(self):
+        """Test that nothing is loaded until a model is requested"""
+        registry = make_registry()
+        assert registry.get_info()["loaded_models"] == {}
+        
+        entry = registry.get("es")
+        
+        assert entry.analyzer.model_name == "model-es"
+        assert registry.is_loaded("es")
+        assert not registry.is_loaded("en")
+    
+    def test_default_and_model_name_resolution(self):
+        """Test that the default alias and full model names resolve"""
+        registry = make_registry()
+        
+        assert registry.get().name == "en"
+        assert registry.get("model-fr").name == "fr"
+        assert registry.get("fr") is registry.get("model-fr")
+    
+    def test_unknown_model(self):
+        """Test that an unknown model raises ValueError"""
+        with pytest.raises(ValueError, match="Unknown model"):
+            make_registry().get("de")
+    
+    def test_each_model_has_its_own_batcher_and_cache(self):
+        """Test that batchers and caches are not shared between models"""
+        registry = make_registry()
+        en, es = registry.get("en"), registry.get("es")
+        
+        assert en.batcher is not es.batcher
+        assert en.cache is not es.cache
+    
+    def test_lru_eviction_under_budget(self):
+        """Test that the least recently used model is unloaded first"""
+        registry = make_registry(memory_budget_mb=250)
+        registry.get("en")
+        registry.get("es")
+        registry.get("en")
+        registry.get("fr")
+        
+        assert registry.is_loaded("en")
+        assert registry.is_loaded("fr")
+        assert not registry.is_loaded("es")
+        assert registry.evictions == 1
+        assert registry.loaded_memory_mb() <= 250
+    
+    def test_models_in_use_are_not_evicted(self):
+        """Test that a model serving requests survives eviction"""
+        registry = make_registry(memory_budget_mb=150)
+        
+        async def run():
+            async with registry.use("es") as entry:
+                registry.get("fr")
+                assert registry.is_loaded("es")
+                return await entry.batcher.submit("good")
+        
+        result = asyncio.run(run())
+        
+        assert result["label"] == "POSITIVE"
+        # Once idle, the next load evicts it
+        registry.get("en")
+        assert not registry.is_loaded("es")
+    
+    def test_default_model_is_never_evicted(self):
+        """Test that the default model stays loaded above the budget"""
+        registry = make_registry(memory_budget_mb=150)
+        default = registry.get()
+        registry.get("es")
+        registry.get("fr")
+        
+        assert registry.get() is default
+        assert not registry.is_loaded("es")
+        assert registry.unload("en") is False
+        assert registry.unload("fr") is True
+    
+    def test_invalid_default_model(self):
+        """Test that the default model must be registered"""
+        with pytest.raises(ValueError, match="Default model"):
+            make_registry(default_model="de")
+
+
+class TestHotSwap:
+    """Tests for zero-downtime model swaps"""
+    
+    def test_swap_under_load_drops_no_requests(self):
+        """Test that every request succeeds while a model is swapped"""
+        registry = make_registry(
+            models={"en": "v1"},
+            analyzer_kwargs={"delay": 0.005}
+        )
+        old_entry = registry.get("en")
+        
+        async def client(i):
+            async with registry.use("en") as entry:
+                return await entry.batcher.submit(f"request {i}")
+        
+        async def run():
+            loop = asyncio.get_running_loop()
+            swap = loop.run_in_executor(None, registry.swap, "en", "v2")
+            results = []
+            for wave in range(20):
+                results += await asyncio.gather(
+                    *(client(wave * 10 + i) for i in range(10)),
+                    return_exceptions=True
+                )
+            await swap
+            results += await asyncio.gather(*(client(1000 + i) for i in range(10)))
+            return results
+        
+        results = asyncio.run(run())
+        
+        errors = [r for r in results if isinstance(r, Exception)]
+        assert errors == []
+        assert len(results) == 210
+        assert {r["model_name"] for r in results} == {"v1", "v2"}
+        assert all(r["model_name"] == "v2" for r in results[-10:])
+        # The old version is released once its last request finished
+        assert old_entry.retired
+        assert old_entry.analyzer is None
+        assert registry.get("en").analyzer.model_name == "v2"
+    
+    def test_swap_between_lookup_and_use(self):
+        """Test that a request whose entry is swapped out before it starts uses the new version"""
+        registry = make_registry(models={"en": "v1"})
+        old_entry = registry.get("en")
+        lookup = registry.acquire
+        
+        async def acquire_then_swap(name=None):
+            entry = await lookup(name)
+            if entry is old_entry:
+                registry.swap("en", "v2")
+            return entry
+        
+        registry.acquire = acquire_then_swap
+        
+        async def run():
+            async with registry.use("en") as entry:
+                return await entry.batcher.submit("good")
+        
+        result = asyncio.run(run())
+        
+        assert result["model_name"] == "v2"
+        assert old_entry.analyzer is None
+        assert registry.get("en").in_flight == 0
+    
+    def test_retired_version_is_released_off_the_loop(self):
+        """Test that the last request of a replaced version frees it on a worker thread, without the registry lock"""
+        registry = make_registry(models={"en": "v1"})
+        old_entry = registry.get("en")
+        close = old_entry.batcher.close
+        released = []
+        
+        def recording_close():
+            # Fails if another thread holds the registry lock
+            unlocked = registry._lock.acquire(blocking=False)
+            if unlocked:
+                registry._lock.release()
+            released.append((threading.get_ident(), unlocked))
+            close()
+        
+        old_entry.batcher.close = recording_close
+        
+        async def run():
+            async with registry.use("en") as entry:
+                await asyncio.get_running_loop().run_in_executor(None, registry.swap, "en", "v2")
+                assert released == []
+                return await entry.batcher.submit("good")
+        
+        result = asyncio.run(run())
+        
+        assert result["model_name"] == "v1"
+        assert len(released) == 1
+        thread, unlocked = released[0]
+        assert thread != threading.get_ident() and unlocked
+        assert old_entry.analyzer is None
+    
+    def test_failed_swap_keeps_current_version(self):
+        """Test that a failing new version never replaces the current one"""
+        registry = make_registry()
+        current = registry.get("en")
+        
+        with pytest.raises(RuntimeError):
+            registry.swap("en", "broken")
+        
+        assert registry.get("en") is current
+        assert registry.models["en"] == "model-en"
+    
+    def test_rollback(self):
+        """Test that rollback restores the previous version"""
+        registry = make_registry()
+        registry.get("en")
+        registry.swap("en", "model-en-v2")
+        
+        entry = registry.rollback("en")
+        
+        assert entry.analyzer.model_name == "model-en"
+        assert registry.get_info()["previous_models"]["en"] == "model-en-v2"
+        assert registry.swaps == 2
+    
+    def test_rollback_without_previous_version(self):
+        """Test that rollback needs a previous swap"""
+        with pytest.raises(ValueError, match="no previous version"):
+            make_registry().rollback("en")
@@ -0,0 +1,137 @@
+"""
+Tests for request tracing
+"""
+
+import asyncio
+import pytest
+
+from models.batcher import MicroBatcher
+from utils.tracing import (
+    SpanContext,
+    Tracer,
+    InMemorySpanExporter,
+    configure_tracing,
+    format_traceparent,
+    parse_traceparent
+)
+from tests.test_registry import FakeAnalyzer
+
+
+@pytest.fixture
+def exporter():
+    """Trace everything into memory, then switch tracing off again"""
+    tracer = configure_tracing(enabled=True, sample_ratio=1.0, exporter="memory")
+    yield tracer.exporter
+    configure_tracing(enabled=False)
+
+
+def spans_by_name(exporter):
+    return {span.name: span for span in exporter.get_finished_spans()}
+
+
+class TestTracer:
+    """Tests for span creation, sampling and propagation"""
+    
+    def test_child_spans_share_trace(self, exporter):
+        """Test that nested spans form one trace"""
+        tracer = configure_tracing(enabled=True, exporter=exporter)
+        with tracer.start_span("parent") as parent:
+            with tracer.start_span("child", {"key": "value"}):
+                pass
+        
+        spans = spans_by_name(exporter)
+        assert spans["child"].context.trace_id == parent.context.trace_id
+        assert spans["child"].parent_id == parent.context.span_id
+        assert spans["child"].attributes == {"key": "value"}
+        assert parent.first_child_start_ns is not None
+    
+    def test_sample_ratio_zero_records_nothing(self):
+        """Test that unsampled traces and their children are not exported"""
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(enabled=True, sample_ratio=0.0, exporter=exporter)
+        with tracer.start_span("parent") as parent:
+            with tracer.start_span("child"):
+                pass
+        
+        assert not parent.recording
+        assert exporter.get_finished_spans() == []
+    
+    def test_sampled_parent_overrides_ratio(self):
+        """Test that a sampled remote parent is always recorded"""
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(enabled=True, sample_ratio=0.0, exporter=exporter)
+        parent = SpanContext("a" * 32, "b" * 16, True)
+        with tracer.start_span("server", parent=parent):
+            pass
+        
+        span = exporter.get_finished_spans()[0]
+        assert span.context.trace_id == "a" * 32
+        assert span.parent_id == "b" * 16
+    
+    def test_exception_marks_span_failed(self, exporter):
+        """Test that errors are recorded on the span"""
+        tracer = configure_tracing(enabled=True, exporter=exporter)
+        with pytest.raises(RuntimeError):
+            with tracer.start_span("failing"):
+                raise RuntimeError("boom")
+        
+        assert spans_by_name(exporter)["failing"].status == "ERROR"
+    
+    def test_traceparent_round_trip(self):
+        """Test W3C traceparent formatting and parsing"""
+        context = SpanContext("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331", True)
+        header = format_traceparent(context)
+        
+        assert header == "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+        assert parse_traceparent(header) == context
+        assert parse_traceparent("garbage") is None
+        assert parse_traceparent("00-" + "0" * 32 + "-b7ad6b7169203331-01") is None
+
+
+class TestBatchTracing:
+    """Tests for trace propagation through the micro-batcher"""
+    
+    def test_trace_crosses_batch_boundary(self, exporter):
+        """Test that queue wait and the batch are recorded in the request's trace"""
+        from utils.tracing import get_tracer
+        batcher = MicroBatcher(FakeAnalyzer("model"), max_wait_ms=20)
+        
+        async def request(text):
+            with get_tracer().start_span("request") as span:
+                await batcher.submit(text)
+                return span.context.trace_id
+        
+        async def run():
+            return await asyncio.gather(request("first"), request("second"))
+        
+        trace_ids = asyncio.run(run())
+        batcher.close()
+        
+        spans = exporter.get_finished_spans()
+        queue_waits = [span for span in spans if span.name == "batcher.queue_wait"]
+        assert sorted(span.context.trace_id for span in queue_waits) == sorted(trace_ids)
+        
+        batch = spans_by_name(exporter)["inference.batch"]
+        assert batch.attributes["batch.size"] == 2
+        assert {batch.context.trace_id, batch.links[0].trace_id} == set(trace_ids)
+
+
+class TestRouteTemplate:
+    """Tests for labelling requests by route template"""
+    
+    def test_param_value_equal_to_a_literal_segment(self):
+        """Test that a path param value matching a literal segment is not mislabelled"""
+        from fastapi import APIRouter, FastAPI, Request
+        from fastapi.testclient import TestClient
+        from api.tracing import route_template
+        
+        app = FastAPI()
+        router = APIRouter()
+        
+        @router.get("/models/{name}")
+        async def model(name: str, request: Request):
+            return {"route": route_template(request)}
+        
+        app.include_router(router, prefix="/api/v1")
+        response = TestClient(app).get("/api/v1/models/models")
+        assert response.json() == {"route": "/api/v1/models/{name}"}